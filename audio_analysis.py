@@ -0,0 +1,484 @@
+"""
+Audio analysis helpers that work on decoded PCM rather than through pydub.
+
+Audio is decoded by ffmpeg to mono 16-bit PCM at ANALYSIS_SAMPLE_RATE.
+Each input is decoded once into a raw PCM file in PCM_CACHE_DIR and
+memory-mapped as a NumPy array (see pcm_array), which every analysis then
+reads in fixed-size blocks, so neither repeated analyses nor long
+recordings cost extra decodes or resident memory. pcm_blocks streams
+straight from ffmpeg for checks that can stop early.
+"""
+
+import os
+import wave
+import bisect
+import hashlib
+import logging
+import shutil
+import tempfile
+import threading
+import subprocess
+from collections import OrderedDict
+
+try:
+    import numpy as np
+except ImportError:  # Only the analysis features need NumPy
+    np = None
+
+# Speech recognisers work at 16 kHz mono, so that's all we decode.
+ANALYSIS_SAMPLE_RATE = 16000
+
+# Length of one RMS analysis window.
+WINDOW_MS = 20
+
+# Samples per block read from ffmpeg or the cache (about 4 seconds at 16 kHz).
+BLOCK_SAMPLES = 1 << 16
+
+# Decoded PCM is kept here between runs; the oldest files are removed once
+# the cache grows past PCM_CACHE_MAX_BYTES (a 3-hour file is about 350 MB).
+PCM_CACHE_DIR = os.path.join(tempfile.gettempdir(), "resolve-subtitle-pcm")
+PCM_CACHE_MAX_BYTES = 8 << 30
+
+# Arrays already mapped by this process, keyed by cache file path, least
+# recently used first. Only the last PCM_ARRAYS_MAX are kept, so a long
+# --watch run doesn't hold every file it has seen mapped (and unprunable).
+PCM_ARRAYS = OrderedDict()
+PCM_ARRAYS_MAX = 8
+PCM_ARRAYS_LOCK = threading.Lock()
+
+# Silence detection defaults: quieter than SILENCE_THRESHOLD_DB for at least
+# MIN_SILENCE_MS counts as silence; SILENCE_PAD_MS of it is kept either side
+# of speech so words aren't clipped and caption segmentation still sees a pause.
+SILENCE_THRESHOLD_DB = -45.0
+MIN_SILENCE_MS = 1000
+SILENCE_PAD_MS = 200
+
+# An input counts as empty when it's shorter than MIN_AUDIO_MS, never peaks
+# above EMPTY_PEAK_DB, or has no block louder than EMPTY_RMS_DB (RMS).
+EMPTY_PEAK_DB = -50.0
+EMPTY_RMS_DB = -45.0
+MIN_AUDIO_MS = 300
+
+
+class AudioAnalysisError(Exception):
+    """Raised when audio can't be decoded or analysed."""
+
+
+def require_numpy():
+    """Raise AudioAnalysisError if NumPy isn't installed."""
+    if np is None:
+        raise AudioAnalysisError("Audio analysis needs NumPy: pip install numpy")
+
+
+def pcm_blocks(path, sample_rate=ANALYSIS_SAMPLE_RATE, block_samples=BLOCK_SAMPLES):
+    """Decode path with ffmpeg and yield mono int16 NumPy blocks in order."""
+    require_numpy()
+    if shutil.which("ffmpeg") is None:
+        raise AudioAnalysisError("ffmpeg was not found on your PATH")
+    cmd = ["ffmpeg", "-v", "error", "-i", path, "-vn", "-ac", "1", "-ar", str(sample_rate),
+           "-f", "s16le", "-acodec", "pcm_s16le", "-"]
+    process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    try:
+        block_bytes = block_samples * 2
+        leftover = b""
+        while True:
+            data = process.stdout.read(block_bytes)
+            if not data:
+                break
+            data = leftover + data
+            usable = len(data) - len(data) % 2
+            leftover = data[usable:]
+            if usable:
+                yield np.frombuffer(data[:usable], dtype="<i2")
+        process.stdout.close()
+        stderr = process.stderr.read().decode(errors="replace")
+        if process.wait() != 0:
+            raise AudioAnalysisError(f"ffmpeg failed to decode {path}: {stderr.strip()}")
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def pcm_cache_path(path, sample_rate=ANALYSIS_SAMPLE_RATE, cache_dir=None):
+    """Return the cache file for path's decoded PCM.
+
+    The name depends on the file's absolute path, size and modification
+    time, so an edited file is decoded again rather than served stale.
+    """
+    info = os.stat(path)
+    key = f"{os.path.abspath(path)}|{info.st_size}|{info.st_mtime_ns}|{sample_rate}"
+    digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:20]
+    stem = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(cache_dir or PCM_CACHE_DIR, f"{stem}.{digest}.s16le")
+
+
+def decode_to_cache(path, cache_path, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Decode path with ffmpeg straight into a raw PCM file at cache_path."""
+    if shutil.which("ffmpeg") is None:
+        raise AudioAnalysisError("ffmpeg was not found on your PATH")
+    cache_dir = os.path.dirname(cache_path)
+    os.makedirs(cache_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(prefix=".decode.", suffix=".tmp", dir=cache_dir)
+    os.close(fd)
+    cmd = ["ffmpeg", "-v", "error", "-y", "-i", path, "-vn", "-ac", "1", "-ar", str(sample_rate),
+           "-f", "s16le", "-acodec", "pcm_s16le", tmp_path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise AudioAnalysisError(f"ffmpeg failed to decode {path}: {result.stderr.strip()}")
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    logging.info(f"Decoded {os.path.basename(path)} to {cache_path}")
+    prune_pcm_cache(cache_dir, keep=cache_path)
+
+
+def prune_pcm_cache(cache_dir=None, max_bytes=PCM_CACHE_MAX_BYTES, keep=None):
+    """Delete the least recently used cache files until the cache fits max_bytes."""
+    cache_dir = cache_dir or PCM_CACHE_DIR
+    entries = []
+    for entry in os.scandir(cache_dir):
+        if entry.name.endswith(".s16le") and entry.is_file():
+            info = entry.stat()
+            entries.append((max(info.st_atime, info.st_mtime), info.st_size, entry.path))
+    total = sum(size for _, size, _ in entries)
+    for _, size, cache_path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if cache_path == keep or cache_path in PCM_ARRAYS:
+            continue
+        try:
+            os.unlink(cache_path)
+            total -= size
+        except OSError:
+            pass
+
+
+def cached_pcm_array(path, sample_rate=ANALYSIS_SAMPLE_RATE, cache_dir=None):
+    """Return path's PCM as a read-only memory-mapped int16 array if it's already cached, else None."""
+    require_numpy()
+    cache_path = pcm_cache_path(path, sample_rate, cache_dir)
+    with PCM_ARRAYS_LOCK:
+        if cache_path in PCM_ARRAYS:
+            PCM_ARRAYS.move_to_end(cache_path)
+            return PCM_ARRAYS[cache_path]
+    if not os.path.exists(cache_path):
+        return None
+    if os.path.getsize(cache_path) < 2:
+        samples = np.zeros(0, dtype="<i2")
+    else:
+        samples = np.memmap(cache_path, dtype="<i2", mode="r")
+    os.utime(cache_path)  # Mark as recently used for prune_pcm_cache
+    with PCM_ARRAYS_LOCK:
+        PCM_ARRAYS[cache_path] = samples
+        # Callers still using an evicted array keep it; it's just no longer shared
+        while len(PCM_ARRAYS) > PCM_ARRAYS_MAX:
+            PCM_ARRAYS.popitem(last=False)
+    return samples
+
+
+def pcm_array(path, sample_rate=ANALYSIS_SAMPLE_RATE, cache_dir=None):
+    """Return path's PCM as a read-only memory-mapped int16 array, decoding it once if needed.
+
+    Pages are read from the cache file on demand, so even a multi-hour
+    recording costs next to no resident memory.
+    """
+    samples = cached_pcm_array(path, sample_rate, cache_dir)
+    if samples is None:
+        decode_to_cache(path, pcm_cache_path(path, sample_rate, cache_dir), sample_rate)
+        samples = cached_pcm_array(path, sample_rate, cache_dir)
+    return samples
+
+
+def forget_pcm(path, sample_rate=ANALYSIS_SAMPLE_RATE, cache_dir=None):
+    """Delete path's cached PCM, if any, before path itself is deleted (folders are ignored)."""
+    if not os.path.isfile(path):
+        return
+    cache_path = pcm_cache_path(path, sample_rate, cache_dir)
+    with PCM_ARRAYS_LOCK:
+        PCM_ARRAYS.pop(cache_path, None)
+    try:
+        os.unlink(cache_path)
+    except OSError:
+        pass
+
+
+def array_blocks(samples, block_samples=BLOCK_SAMPLES):
+    """Yield consecutive views of a PCM array, block_samples at a time (no copies)."""
+    for start in range(0, len(samples), block_samples):
+        yield samples[start:start + block_samples]
+
+
+def pcm_duration_ms(path, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Return the duration of path in milliseconds, from its cached PCM."""
+    return len(pcm_array(path, sample_rate)) * 1000 // sample_rate
+
+
+def window_levels_db(blocks, sample_rate=ANALYSIS_SAMPLE_RATE, window_ms=WINDOW_MS):
+    """Return the RMS level of each window_ms window in dBFS, as a NumPy array.
+
+    Blocks of any size are accepted; samples that don't fill a whole window
+    at the end are measured as a final, shorter window.
+    """
+    require_numpy()
+    window = sample_rate * window_ms // 1000
+    levels = []
+    carry = np.empty(0, dtype=np.int16)
+    for block in blocks:
+        samples = np.concatenate((carry, block)) if carry.size else block
+        whole = samples.size - samples.size % window
+        if whole:
+            frames = samples[:whole].astype(np.float64).reshape(-1, window)
+            levels.append(np.sqrt(np.mean(frames * frames, axis=1)))
+        carry = samples[whole:]
+    if carry.size:
+        tail = carry.astype(np.float64)
+        levels.append(np.sqrt(np.mean(tail * tail, keepdims=True)))
+    if not levels:
+        return np.empty(0)
+    rms = np.concatenate(levels)
+    return 20 * np.log10(np.maximum(rms, 1.0) / 32768.0)
+
+
+def find_silences(levels_db, window_ms=WINDOW_MS, threshold_db=SILENCE_THRESHOLD_DB,
+                  min_silence_ms=MIN_SILENCE_MS):
+    """Return [(start_ms, end_ms), ...] spans quieter than threshold_db for at least min_silence_ms."""
+    require_numpy()
+    quiet = np.concatenate(([False], levels_db < threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+    min_windows = -(-min_silence_ms // window_ms)
+    long_enough = (ends - starts) >= min_windows
+    return [(int(s) * window_ms, int(e) * window_ms) for s, e in zip(starts[long_enough], ends[long_enough])]
+
+
+def keep_segments(silences, duration_ms, pad_ms=SILENCE_PAD_MS):
+    """Invert silent spans into the [(start_ms, end_ms), ...] segments to keep.
+
+    Each silence gives up pad_ms at both ends, so a little quiet stays around
+    every stretch of speech.
+    """
+    segments = []
+    position = 0
+    for start, end in silences:
+        cut_start = start + pad_ms if start > 0 else 0
+        cut_end = end - pad_ms if end < duration_ms else duration_ms
+        if cut_end <= cut_start:
+            continue
+        if cut_start > position:
+            segments.append((position, cut_start))
+        position = cut_end
+    if position < duration_ms:
+        segments.append((position, duration_ms))
+    return segments
+
+
+class EditMap:
+    """Maps times in a condensed proxy back to times in the original file.
+
+    segments is a list of (proxy_start_ms, original_start_ms, duration_ms),
+    in order, one per stretch of the original that was kept.
+    """
+
+    def __init__(self, kept):
+        self.segments = []
+        proxy_position = 0
+        for start, end in kept:
+            self.segments.append((proxy_position, start, end - start))
+            proxy_position += end - start
+        self.proxy_starts = [segment[0] for segment in self.segments]
+        self.proxy_duration_ms = proxy_position
+
+    def removed_ms(self, duration_ms):
+        return duration_ms - self.proxy_duration_ms
+
+    def to_original(self, proxy_ms):
+        """Map a proxy time to the original file's timeline."""
+        if not self.segments:
+            return proxy_ms
+        index = max(0, bisect.bisect_right(self.proxy_starts, proxy_ms) - 1)
+        proxy_start, original_start, _ = self.segments[index]
+        return original_start + (proxy_ms - proxy_start)
+
+    def remap_cues(self, cues):
+        """Return cues with start/end moved to original-file times.
+
+        A cue's end is mapped as the end of its last segment, so a cue that
+        finishes exactly at a cut doesn't jump forward over the removed silence.
+        """
+        remapped = []
+        for cue in cues:
+            start = self.to_original(cue.start_ms)
+            end = self.to_original(max(cue.start_ms, cue.end_ms - 1)) + 1 if cue.end_ms > cue.start_ms else start
+            remapped.append(cue._replace(start_ms=start, end_ms=end))
+        return remapped
+
+
+def write_samples(out, samples, start, end, block_samples=BLOCK_SAMPLES):
+    """Append samples[start:end] to an open wave writer, a block at a time."""
+    for position in range(start, end, block_samples):
+        out.writeframes(samples[position:min(end, position + block_samples)].astype("<i2", copy=False).tobytes())
+
+
+def open_wav(path, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Open a 16-bit mono WAV file for writing."""
+    out = wave.open(path, "wb")
+    out.setnchannels(1)
+    out.setsampwidth(2)
+    out.setframerate(sample_rate)
+    return out
+
+
+def write_condensed_wav(path, samples, kept, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Write the samples inside the kept (start_ms, end_ms) segments to a WAV file."""
+    with open_wav(path, sample_rate) as out:
+        for start, end in kept:
+            write_samples(out, samples, start * sample_rate // 1000, min(len(samples), end * sample_rate // 1000))
+
+
+def strip_silence(path, output_dir, threshold_db=SILENCE_THRESHOLD_DB, min_silence_ms=MIN_SILENCE_MS,
+                  pad_ms=SILENCE_PAD_MS):
+    """Write a condensed 16 kHz mono proxy of path with long silences removed.
+
+    Returns (proxy_path, edit_map), or (None, None) when there is no silence
+    worth removing, in which case the original should be imported as-is.
+    """
+    samples = pcm_array(path)
+    levels = window_levels_db(array_blocks(samples))
+    duration_ms = len(levels) * WINDOW_MS
+    silences = find_silences(levels, WINDOW_MS, threshold_db, min_silence_ms)
+    kept = keep_segments(silences, duration_ms, pad_ms)
+    edit_map = EditMap(kept)
+    removed = edit_map.removed_ms(duration_ms)
+    if not silences or removed <= 0:
+        logging.info(f"No long silences found in {os.path.basename(path)}")
+        return None, None
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    os.makedirs(output_dir, exist_ok=True)
+    proxy_path = os.path.join(output_dir, f"{stem}.condensed.wav")
+    counter = 1
+    while os.path.exists(proxy_path):
+        proxy_path = os.path.join(output_dir, f"{stem}.condensed_{counter}.wav")
+        counter += 1
+    write_condensed_wav(proxy_path, samples, kept)
+    logging.info(f"Removed {removed / 1000:.1f}s of silence from {os.path.basename(path)} "
+                 f"({100 * removed / max(duration_ms, 1):.0f}%) -> {proxy_path}")
+    return proxy_path, edit_map
+
+
+# Chunking defaults: cut points are searched for in the last CHUNK_SEARCH_MS
+# before each chunk would reach its maximum length, using a level averaged
+# over CUT_SMOOTHING_MS so a single quiet window between words doesn't win.
+# Neighbouring chunks share CHUNK_OVERLAP_MS of audio either side of a cut.
+CHUNK_SEARCH_MS = 120000
+CUT_SMOOTHING_MS = 400
+CHUNK_OVERLAP_MS = 2000
+
+
+def plan_chunks(levels_db, max_chunk_ms, window_ms=WINDOW_MS, search_ms=CHUNK_SEARCH_MS):
+    """Split a recording into [(start_ms, end_ms), ...] chunks of at most max_chunk_ms.
+
+    Each cut is placed at the quietest point (by smoothed level) in the
+    search range before the chunk limit, so words are rarely split.
+    """
+    require_numpy()
+    duration_ms = len(levels_db) * window_ms
+    if duration_ms <= max_chunk_ms:
+        return [(0, duration_ms)]
+    smoothing = max(1, CUT_SMOOTHING_MS // window_ms)
+    smoothed = np.convolve(levels_db, np.ones(smoothing) / smoothing, mode="same")
+
+    chunks = []
+    start = 0
+    while duration_ms - start > max_chunk_ms:
+        hi = (start + max_chunk_ms) // window_ms
+        lo = max((start + max_chunk_ms // 2) // window_ms, hi - search_ms // window_ms)
+        cut = (lo + int(np.argmin(smoothed[lo:hi]))) * window_ms
+        chunks.append((start, cut))
+        start = cut
+    chunks.append((start, duration_ms))
+    return chunks
+
+
+def write_wav_segments(samples, segments, paths, sample_rate=ANALYSIS_SAMPLE_RATE):
+    """Write each (start_ms, end_ms) segment of samples to its own WAV file."""
+    for (start, end), path in zip(segments, paths):
+        with open_wav(path, sample_rate) as out:
+            write_samples(out, samples, start * sample_rate // 1000, min(len(samples), end * sample_rate // 1000))
+
+
+def split_for_chunking(path, output_dir, max_chunk_ms, overlap_ms=CHUNK_OVERLAP_MS):
+    """Cut path into overlapping 16 kHz mono WAV chunks at low-energy points.
+
+    Returns a list of (chunk_path, offset_ms, keep_from_ms, keep_to_ms): the
+    chunk file, where it starts in the original, and the span of original
+    time whose cues should come from this chunk. Returns [] when path is no
+    longer than max_chunk_ms.
+    """
+    samples = pcm_array(path)
+    levels = window_levels_db(array_blocks(samples))
+    chunks = plan_chunks(levels, max_chunk_ms)
+    if len(chunks) < 2:
+        return []
+    duration_ms = chunks[-1][1]
+    segments = [(max(0, start - overlap_ms), min(duration_ms, end + overlap_ms)) for start, end in chunks]
+
+    stem = os.path.splitext(os.path.basename(path))[0]
+    paths = [os.path.join(output_dir, f"{stem}.part{index:02d}.wav") for index in range(1, len(chunks) + 1)]
+    os.makedirs(output_dir, exist_ok=True)
+    write_wav_segments(samples, segments, paths)
+    logging.info(f"Split {os.path.basename(path)} into {len(chunks)} chunks in {output_dir}")
+    return [(chunk_path, segment[0], start, end)
+            for chunk_path, segment, (start, end) in zip(paths, segments, chunks)]
+
+
+def db_to_amplitude(db):
+    """Convert dBFS to a 16-bit sample amplitude."""
+    return 32768.0 * 10 ** (db / 20)
+
+
+def detect_empty_audio(path, peak_db=EMPTY_PEAK_DB, rms_db=EMPTY_RMS_DB, min_duration_ms=MIN_AUDIO_MS,
+                       full_decode=False):
+    """Return why path has nothing to caption, or None if it has audible content.
+
+    Peak and RMS are measured block by block and stop at the first block
+    that is clearly audible. Cached PCM is read when there is some; otherwise
+    the audio is streamed from ffmpeg, which is abandoned at that point, so
+    ordinary recordings cost a fraction of a second. Pass full_decode=True
+    when the file is going to be analysed further anyway, to decode it into
+    the cache once instead.
+    """
+    require_numpy()
+    peak_limit = db_to_amplitude(peak_db)
+    rms_limit = db_to_amplitude(rms_db)
+    samples = 0
+    peak = 0
+    loudest_rms = 0.0
+    cached = pcm_array(path) if full_decode else cached_pcm_array(path)
+    blocks = array_blocks(cached) if cached is not None else pcm_blocks(path)
+    try:
+        for block in blocks:
+            samples += block.size
+            block_peak = max(int(block.max()), -int(block.min()))
+            wide = block.astype(np.float64)
+            block_rms = float(np.sqrt(np.dot(wide, wide) / block.size))
+            peak = max(peak, block_peak)
+            loudest_rms = max(loudest_rms, block_rms)
+            if (peak >= peak_limit and loudest_rms >= rms_limit
+                    and samples * 1000 >= min_duration_ms * ANALYSIS_SAMPLE_RATE):
+                return None
+    finally:
+        blocks.close()
+
+    duration_ms = samples * 1000 // ANALYSIS_SAMPLE_RATE
+    if duration_ms < min_duration_ms:
+        return f"only {duration_ms} ms of audio"
+    if peak < peak_limit:
+        return f"peak level {20 * np.log10(max(peak, 1) / 32768.0):.0f} dBFS is below {peak_db:.0f} dBFS"
+    return f"RMS level {20 * np.log10(max(loudest_rms, 1.0) / 32768.0):.0f} dBFS is below {rms_db:.0f} dBFS"
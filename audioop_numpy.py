@@ -0,0 +1,344 @@
+"""
+NumPy implementation of the audioop functions pydub relies on.
+
+audioop was removed from the standard library in Python 3.13. When
+audioop-lts can't be installed, global_python_fix.py copies this file into
+site-packages as _audioop.py so pydub keeps working. Results match
+CPython's audioop bit for bit (run `python benchmark.py audioop` on a
+Python that still has it to check). Samples are signed, native-endian,
+1 to 4 bytes wide, as in audioop.
+
+Implemented: add, avg, bias, byteswap, cross, getsample, lin2lin, max,
+minmax, mul, ratecv, reverse, rms, tomono, tostereo. The codec and search
+functions (ulaw, alaw, adpcm, find*) raise error.
+"""
+
+import sys
+import math
+
+import numpy as np
+
+__all__ = [
+    "error", "add", "avg", "bias", "byteswap", "cross", "getsample", "lin2lin", "max", "minmax",
+    "mul", "ratecv", "reverse", "rms", "tomono", "tostereo",
+]
+
+# Built-in max(), kept because this module's own max() shadows it.
+builtin_max = max
+
+# Samples per block: temporaries stay in cache, which is what makes the
+# element-wise functions faster than audioop's C loops on long fragments.
+BLOCK_SAMPLES = 1 << 16
+
+SAMPLE_DTYPES = {1: np.int8, 2: np.int16, 4: np.int32}
+UNSIGNED_DTYPES = {1: np.uint8, 2: np.uint16, 4: np.uint32}
+
+
+class error(Exception):
+    pass
+
+
+def check_width(width):
+    if width not in (1, 2, 3, 4):
+        raise error("Size should be 1, 2, 3 or 4")
+
+
+def check_fragment(fragment, width):
+    check_width(width)
+    if len(fragment) % width:
+        raise error("not a whole number of frames")
+
+
+def sample_limits(width):
+    """Return (minval, maxval) for a sample width."""
+    bits = 8 * width
+    return -(1 << (bits - 1)), (1 << (bits - 1)) - 1
+
+
+def samples(fragment, width):
+    """Return the samples in fragment as a NumPy array.
+
+    Widths 1, 2 and 4 are a zero-copy view of the buffer; 24-bit samples
+    are assembled into int32.
+    """
+    check_fragment(fragment, width)
+    if width != 3:
+        return np.frombuffer(fragment, dtype=SAMPLE_DTYPES[width])
+    raw = np.frombuffer(fragment, dtype=np.uint8).reshape(-1, 3).astype(np.int32)
+    if sys.byteorder == "little":
+        value = raw[:, 0] | (raw[:, 1] << 8) | (raw[:, 2] << 16)
+    else:
+        value = (raw[:, 0] << 16) | (raw[:, 1] << 8) | raw[:, 2]
+    return np.where(value >= 1 << 23, value - (1 << 24), value).astype(np.int32)
+
+
+def to_bytes(values, width):
+    """Pack an array of in-range sample values into a fragment."""
+    if width != 3:
+        return values.astype(SAMPLE_DTYPES[width], copy=False).tobytes()
+    value = values.astype(np.int32, copy=False) & 0xFFFFFF
+    packed = np.empty((value.size, 3), dtype=np.uint8)
+    shifts = (0, 8, 16) if sys.byteorder == "little" else (16, 8, 0)
+    for column, shift in enumerate(shifts):
+        packed[:, column] = (value >> shift) & 0xFF
+    return packed.tobytes()
+
+
+def blocks(values):
+    for start in range(0, values.size, BLOCK_SAMPLES):
+        yield values[start:start + BLOCK_SAMPLES]
+
+
+def floor_clamped(count, width, compute, outputs_per_input=1):
+    """Build a fragment block by block from float results, as audioop rounds them.
+
+    compute(start, stop) returns values for input samples start:stop; they
+    are clamped to the sample range and floored (when they're floats) into a
+    preallocated output, outputs_per_input values per input sample.
+    """
+    minval, maxval = sample_limits(width)
+    out = np.empty(int(count * outputs_per_input), dtype=np.int32 if width == 3 else SAMPLE_DTYPES[width])
+    for start in range(0, count, BLOCK_SAMPLES):
+        result = compute(start, min(count, start + BLOCK_SAMPLES))
+        np.clip(result, minval, maxval, out=result)
+        if result.dtype.kind == "f":
+            np.floor(result, out=result)
+        offset = int(start * outputs_per_input)
+        out[offset:offset + result.size] = result
+    return to_bytes(out, width)
+
+
+def getsample(fragment, width, index):
+    values = samples(fragment, width)
+    if not 0 <= index < values.size:
+        raise error("Index out of range")
+    return int(values[index])
+
+
+def max(fragment, width):
+    values = samples(fragment, width)
+    if not values.size:
+        return 0
+    return builtin_max(int(values.max()), -int(values.min()))
+
+
+def minmax(fragment, width):
+    values = samples(fragment, width)
+    if not values.size:
+        return 0x7FFFFFFF, -0x7FFFFFFF - 1
+    return int(values.min()), int(values.max())
+
+
+def avg(fragment, width):
+    values = samples(fragment, width)
+    if not values.size:
+        return 0
+    total = sum(int(block.sum(dtype=np.int64)) for block in blocks(values))
+    return math.floor(total / values.size)
+
+
+def rms(fragment, width):
+    values = samples(fragment, width)
+    if not values.size:
+        return 0
+    if width <= 2:
+        # Each block's sum of squares is below 2**53, so it's exact in a
+        # double and the total is exact, as audioop's is at this width
+        total = 0
+        for block in blocks(values):
+            wide = block.astype(np.float64)
+            total += int(np.dot(wide, wide))
+    else:
+        total = 0.0
+        for block in blocks(values):
+            wide = block.astype(np.float64)
+            total += float(np.dot(wide, wide))
+    return int(math.sqrt(total / values.size))
+
+
+def cross(fragment, width):
+    values = samples(fragment, width)
+    if not values.size:
+        return -1  # audioop's answer for an empty fragment
+    negative = values < 0
+    return int(np.count_nonzero(negative[1:] != negative[:-1]))
+
+
+def add(fragment1, fragment2, width):
+    check_width(width)
+    if len(fragment1) != len(fragment2):
+        raise error("Lengths should be the same")
+    values1 = samples(fragment1, width)
+    values2 = samples(fragment2, width)
+    return floor_clamped(values1.size, width,
+                         lambda start, stop: np.add(values1[start:stop], values2[start:stop], dtype=np.int64))
+
+
+def bias(fragment, width, bias):
+    values = samples(fragment, width)
+    if width != 3:
+        # Unsigned arithmetic wraps around exactly as audioop's does
+        shifted = values.view(UNSIGNED_DTYPES[width]).copy()
+        shifted += UNSIGNED_DTYPES[width](bias & ((1 << (8 * width)) - 1))
+        return shifted.tobytes()
+    wrapped = (values.astype(np.int64) + bias) & 0xFFFFFF
+    return to_bytes(wrapped, width)
+
+
+def mul(fragment, width, factor):
+    values = samples(fragment, width)
+    factor = float(factor)
+    return floor_clamped(values.size, width, lambda start, stop: values[start:stop] * factor)
+
+
+def reverse(fragment, width):
+    check_fragment(fragment, width)
+    if width != 3:
+        return samples(fragment, width)[::-1].tobytes()
+    raw = np.frombuffer(fragment, dtype=np.uint8).reshape(-1, width)
+    return raw[::-1].tobytes()
+
+
+def byteswap(fragment, width):
+    check_fragment(fragment, width)
+    raw = np.frombuffer(fragment, dtype=np.uint8).reshape(-1, width)
+    return raw[:, ::-1].tobytes()
+
+
+def lin2lin(fragment, width, newwidth):
+    check_width(newwidth)
+    values = samples(fragment, width)
+    if width == newwidth:
+        return bytes(fragment)
+    # audioop goes through a 32-bit intermediate; shifting straight to the
+    # new width gives the same result, truncating when narrowing
+    out = np.empty(values.size, dtype=np.int32 if newwidth == 3 else SAMPLE_DTYPES[newwidth])
+    for start in range(0, values.size, BLOCK_SAMPLES):
+        block = values[start:start + BLOCK_SAMPLES].astype(np.int32)
+        if newwidth > width:
+            block <<= 8 * (newwidth - width)
+        else:
+            block >>= 8 * (width - newwidth)
+        out[start:start + block.size] = block
+    return to_bytes(out, newwidth)
+
+
+def tomono(fragment, width, lfactor, rfactor):
+    values = samples(fragment, width)
+    if values.size % 2:
+        raise error("not a whole number of frames")
+    lfactor, rfactor = float(lfactor), float(rfactor)
+
+    def mix(start, stop):
+        # BLOCK_SAMPLES is even, so blocks always hold whole frames
+        block = values[start:stop]
+        return block[0::2] * lfactor + block[1::2] * rfactor
+    return floor_clamped(values.size, width, mix, outputs_per_input=0.5)
+
+
+def tostereo(fragment, width, lfactor, rfactor):
+    values = samples(fragment, width)
+    lfactor, rfactor = float(lfactor), float(rfactor)
+
+    def spread(start, stop):
+        block = values[start:stop]
+        stereo = np.empty(2 * block.size)
+        np.multiply(block, lfactor, out=stereo[0::2])
+        np.multiply(block, rfactor, out=stereo[1::2])
+        return stereo
+    return floor_clamped(values.size, width, spread, outputs_per_input=2)
+
+
+def ratecv(fragment, width, nchannels, inrate, outrate, state, weightA=1, weightB=0):
+    """Convert the frame rate of fragment, linearly interpolating between input frames.
+
+    Follows audioop's algorithm (including its state tuple, so calls can be
+    chained) but computes every output frame's source position at once.
+    """
+    check_width(width)
+    if nchannels < 1:
+        raise error("# of channels should be >= 1")
+    if len(fragment) % (width * nchannels):
+        raise error("not a whole number of frames")
+    if inrate <= 0 or outrate <= 0:
+        raise error("sampling rate not > 0")
+    if weightA < 1 or weightB < 0:
+        raise error("weightA should be >= 1, weightB should be >= 0")
+
+    divisor = math.gcd(inrate, outrate)
+    inrate //= divisor
+    outrate //= divisor
+    divisor = math.gcd(weightA, weightB)
+    weightA //= divisor
+    weightB //= divisor
+
+    if state is None:
+        d = -outrate
+        prev = [0] * nchannels
+        cur = [0] * nchannels
+    else:
+        try:
+            d, channel_states = state
+            if len(channel_states) != nchannels:
+                raise error("illegal state argument")
+            prev = [int(channel[0]) for channel in channel_states]
+            cur = [int(channel[1]) for channel in channel_states]
+        except (TypeError, ValueError):
+            raise error("illegal state argument")
+
+    # History of 32-bit scaled frames, one row per frame. Rows 0 and 1 are
+    # the carried-over previous/current frames and input k is row k + 2.
+    # Doubles hold 32-bit samples exactly, and audioop does its maths in
+    # doubles too.
+    values = samples(fragment, width)
+    count = values.size // nchannels
+    shift = 32 - 8 * width
+    history = np.empty((count + 2, nchannels), dtype=np.float64)
+    history[0] = prev
+    history[1] = cur
+    np.multiply(values.reshape(-1, nchannels), float(1 << shift), out=history[2:])
+    if weightB:
+        # The filter feeds back on its own output, so it's applied frame by frame
+        last = list(cur)
+        total = weightA + weightB
+        for row in range(2, count + 2):
+            for channel in range(nchannels):
+                last[channel] = int((weightA * history[row, channel] + weightB * float(last[channel])) / total)
+                history[row, channel] = last[channel]
+
+    # Output j is made after consuming m_j inputs, the fewest that lift
+    # d + m * outrate - j * inrate to zero or above
+    limit = d + count * outrate
+    outputs = limit // inrate + 1 if limit >= 0 else 0
+    out = np.empty((outputs, nchannels), dtype=np.int32 if width == 3 else SAMPLE_DTYPES[width])
+    for first in range(0, outputs, BLOCK_SAMPLES):
+        j = np.arange(first, min(outputs, first + BLOCK_SAMPLES), dtype=np.int64)
+        consumed = np.maximum(0, -((d - j * inrate) // outrate))
+        phase = (d + consumed * outrate - j * inrate).astype(np.float64)[:, None]
+        mixed = history[consumed] * phase
+        mixed += history[consumed + 1] * (outrate - phase)
+        mixed /= outrate
+        np.trunc(mixed, out=mixed)
+        # Flooring a division by a power of two is audioop's arithmetic shift
+        mixed /= 1 << shift
+        np.floor(mixed, out=mixed)
+        out[first:first + j.size] = mixed
+    converted = to_bytes(out.reshape(-1), width)
+
+    new_state = (int(limit - outputs * inrate),
+                 tuple((int(history[count, channel]), int(history[count + 1, channel])) for channel in range(nchannels)))
+    return converted, new_state
+
+
+def unsupported(name):
+    def function(*args, **kwargs):
+        raise error(f"audioop.{name} is not available in this NumPy replacement")
+    function.__name__ = name
+    return function
+
+
+for unsupported_name in ("adpcm2lin", "alaw2lin", "avgpp", "findfactor", "findfit", "findmax", "lin2adpcm",
+                         "lin2alaw", "lin2ulaw", "maxpp", "ulaw2lin"):
+    globals()[unsupported_name] = unsupported(unsupported_name)
+    __all__.append(unsupported_name)
+del unsupported_name
@@ -0,0 +1,452 @@
+#!/usr/bin/env python
+"""
+Benchmark harness for the generate_srt pipeline.
+
+Runs the real pipeline against the in-memory fake from fake_resolve.py, so
+Resolve round trips and wall time can be compared between code paths without
+a running Resolve. Fixed waits in the pipeline (time.sleep) are skipped; use
+--latency-ms to simulate the cost of each scripting API call instead.
+
+Usage:
+    python benchmark.py rpc   [--clip-minutes N] [--latency-ms MS]
+    python benchmark.py clear [--clip-minutes N] [--latency-ms MS] [--tracks N]
+    python benchmark.py extract [--clip-minutes N] [--latency-ms MS]
+    python benchmark.py timecode [--frames N]
+    python benchmark.py audioop [--clip-minutes N]
+    python benchmark.py pool [--hosts N] [--files N] [--latency-ms MS]
+    python benchmark.py discovery [--files N]
+    python benchmark.py record [--cassette FILE] [--clip-minutes N] [--latency-ms MS]
+    python benchmark.py replay --cassette FILE [--speed X]
+
+'replay' runs the pipeline against a cassette recorded from a real Resolve
+session (generate_srt.py --record-cassette FILE) instead of the fake, with
+the recorded latencies and the pipeline's own waits, so the result is
+comparable to the recorded run. 'record' makes a cassette from the fake
+for trying it out.
+"""
+
+import os
+import io
+import sys
+import glob
+import ntpath
+import posixpath
+import time
+import logging
+import argparse
+import tempfile
+import warnings
+import contextlib
+from fractions import Fraction
+
+import cassette
+import discovery
+import fake_resolve
+import timecode
+
+
+class NoSleep:
+    """Stand-in for the time module that skips the pipeline's fixed waits."""
+
+    def __getattr__(self, name):
+        return getattr(time, name)
+
+    def sleep(self, seconds):
+        pass
+
+
+def load_pipeline(backend, verbose=False):
+    """Import generate_srt wired to the given fake backend."""
+    fake_resolve.install(backend)
+    # Configure logging first so generate_srt's basicConfig is a no-op and
+    # its path-validation chatter stays out of the results.
+    logging.basicConfig(level=logging.WARNING)
+    with contextlib.redirect_stdout(io.StringIO()), warnings.catch_warnings():
+        warnings.simplefilter("ignore")
+        import generate_srt
+    generate_srt.time = NoSleep()
+    logging.getLogger().setLevel(logging.INFO if verbose else logging.WARNING)
+    return generate_srt
+
+
+def make_backend(args):
+    return fake_resolve.FakeBackend(
+        clip_frames=int(args.clip_minutes * 60 * 24),
+        latency=args.latency_ms / 1000.0,
+    )
+
+
+def split_calls(counter):
+    """Return (total, per-item) call counts from a CallCounter."""
+    per_item = sum(n for name, n in counter.calls.items() if name.startswith("FakeTimelineItem."))
+    return counter.total, per_item
+
+
+def print_row(label, counter, elapsed):
+    total, per_item = split_calls(counter)
+    print(f"{label:<28} {total:>8} {total - per_item:>10} {per_item:>10} {elapsed * 1000:>10.1f}")
+
+
+def print_header():
+    print(f"{'path':<28} {'RPCs':>8} {'pipeline':>10} {'per-item':>10} {'wall ms':>10}")
+
+
+def bench_rpc(args):
+    """Compare RPCs per file with and without the TimelineState snapshot."""
+    print_header()
+    for label, paranoid in (("--paranoid", True), ("snapshot (default)", False)):
+        backend = make_backend(args)
+        pipeline = load_pipeline(backend, args.verbose)
+        with tempfile.TemporaryDirectory() as tmp:
+            srt_path = os.path.join(tmp, "bench.srt")
+            start = time.perf_counter()
+            ok = pipeline.generate_srt(["bench.wav"], "bench.wav", srt_path, paranoid=paranoid)
+            elapsed = time.perf_counter() - start
+        if not ok:
+            print(f"{label}: pipeline failed")
+            return 1
+        print_row(label, backend.counter, elapsed)
+    return 0
+
+
+def bench_clear(args):
+    """Compare the clear_subtitle_tracks strategies on a re-captioned timeline."""
+    print_header()
+    for strategy in ("per-item", "batch", "recreate"):
+        backend = make_backend(args)
+        pipeline = load_pipeline(backend, args.verbose)
+        timeline = backend.new_timeline()
+        backend.fill_subtitle_tracks(timeline, args.tracks)
+        backend.counter.reset()
+        start = time.perf_counter()
+        ok = pipeline.clear_subtitle_tracks(timeline, strategy=strategy)
+        elapsed = time.perf_counter() - start
+        print_row(strategy, backend.counter, elapsed)
+        leftover = sum(len(timeline.GetItemListInTrack("subtitle", i) or [])
+                       for i in range(1, timeline.GetTrackCount("subtitle") + 1))
+        if not ok or leftover:
+            print(f"{strategy}: clearing failed ({leftover} items left)")
+            return 1
+    return 0
+
+
+@contextlib.contextmanager
+def discard_logs(level):
+    """Route root logging to /dev/null at the given level, restoring it after.
+
+    Records are still formatted and written, so logging cost is measured
+    without flooding the terminal.
+    """
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    with open(os.devnull, "w") as sink:
+        root.handlers = [logging.StreamHandler(sink)]
+        root.setLevel(level)
+        try:
+            yield
+        finally:
+            root.handlers = saved_handlers
+            root.setLevel(saved_level)
+
+
+def bench_extract(args):
+    """Compare per-item subtitle extraction against the native bulk export."""
+    print_header()
+    paths = (
+        ("walk, per-item logging", False, logging.DEBUG),
+        ("walk, summary logging", False, logging.INFO),
+        ("native export", True, logging.INFO),
+    )
+    for label, native, level in paths:
+        backend = make_backend(args)
+        pipeline = load_pipeline(backend, args.verbose)
+        pipeline.NATIVE_SUBTITLE_EXPORT = None
+        timeline = backend.new_timeline()
+        backend.fill_subtitle_tracks(timeline, 1)
+        backend.counter.reset()
+        with discard_logs(level):
+            start = time.perf_counter()
+            items = pipeline.extract_subtitle_items(timeline, float(backend.fps), native=native)
+            elapsed = time.perf_counter() - start
+        print_row(label, backend.counter, elapsed)
+        if not items:
+            print(f"{label}: extraction failed")
+            return 1
+    return 0
+
+
+def reference_timecode(frame, fps, nearest=True):
+    """Slow but obviously correct SRT timecode from exact rational arithmetic.
+
+    nearest=False truncates instead, matching the legacy code's intent, so
+    the legacy column counts float error only and not the rounding change.
+    """
+    ms = Fraction(frame) * 1000 / timecode.parse_framerate(fps)
+    ms = int(ms + Fraction(1, 2)) if nearest else int(ms)  # ms is never negative here
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def legacy_timecode(frames, fps):
+    """The float-based format_timecode this engine replaced."""
+    total_seconds = frames / fps
+    hours = int(total_seconds // 3600)
+    minutes = int((total_seconds % 3600) // 60)
+    seconds = int(total_seconds % 60)
+    milliseconds = int((total_seconds * 1000) % 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+
+
+def bench_timecode(args):
+    """Check the batch timecode engine against a reference and time it."""
+    backend = "NumPy" if timecode.np is not None else "pure Python"
+    print(f"Checking {args.frames:,} frames per rate against the reference ({backend} batch path)")
+    print(f"{'fps':<8} {'mismatches':>10} {'float err':>10} {'batch ms':>10} {'legacy ms':>10}")
+    failed = False
+    for fps in ("23.976", "24", "25", "29.97", "30", "50", "59.94", "60"):
+        frames = range(args.frames)
+
+        start = time.perf_counter()
+        batch = timecode.format_timecodes(timecode.frames_to_ms_array(frames, fps))
+        batch_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        legacy = [legacy_timecode(f, float(fps)) for f in frames]
+        legacy_elapsed = time.perf_counter() - start
+
+        # The reference is slow, so check a stride through the range plus
+        # both ends rather than every frame when the range is huge
+        step = max(1, args.frames // 200000)
+        checked = list(range(0, args.frames, step)) + [args.frames - 1]
+        mismatches = sum(batch[f] != reference_timecode(f, fps) for f in checked)
+        legacy_off = sum(legacy[f] != reference_timecode(f, fps, nearest=False) for f in checked)
+        failed = failed or mismatches > 0
+        print(f"{fps:<8} {mismatches:>10} {legacy_off:>10} {batch_elapsed * 1000:>10.1f} {legacy_elapsed * 1000:>10.1f}")
+    return 1 if failed else 0
+
+
+def reference_audioop():
+    """Return CPython's audioop (or audioop-lts), or None when neither is installed."""
+    with warnings.catch_warnings():
+        warnings.simplefilter("ignore", DeprecationWarning)
+        try:
+            import audioop
+        except ImportError:
+            return None
+    if getattr(audioop, "__file__", "").endswith(".py"):
+        return None  # A pure-Python stand-in such as our own copy, not a reference
+    return audioop
+
+
+def bench_audioop(args):
+    """Check audioop_numpy against CPython's audioop on pydub's calls, and time both."""
+    import numpy as np
+    import audioop_numpy
+
+    reference = reference_audioop()
+    rate = 44100
+    rng = np.random.default_rng(0)
+    stereo = (rng.normal(0, 6000, int(args.clip_minutes * 60 * rate) * 2)).astype(np.int16).tobytes()
+    other = (rng.normal(0, 6000, len(stereo) // 2)).astype(np.int16).tobytes()
+    mono = stereo[:len(stereo) // 2]
+    calls = (
+        ("rms", (stereo, 2)),
+        ("max", (stereo, 2)),
+        ("minmax", (stereo, 2)),
+        ("avg", (stereo, 2)),
+        ("mul", (stereo, 2, 0.7)),
+        ("add", (stereo, other, 2)),
+        ("bias", (stereo, 2, 128)),
+        ("lin2lin", (stereo, 2, 4)),
+        ("tomono", (stereo, 2, 0.5, 0.5)),
+        ("tostereo", (mono, 2, 1, 1)),
+        ("reverse", (stereo, 2)),
+        ("ratecv", (stereo, 2, 2, rate, 16000, None)),
+    )
+    print(f"{args.clip_minutes:g} min of 16-bit stereo at {rate} Hz"
+          + ("" if reference else " (CPython audioop not available: timing only)"))
+    print(f"{'function':<10} {'match':>6} {'numpy ms':>10} {'audioop ms':>11} {'speedup':>8}")
+    failed = False
+    for name, call_args in calls:
+        start = time.perf_counter()
+        result = getattr(audioop_numpy, name)(*call_args)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            print(f"{name:<10} {'-':>6} {elapsed * 1000:>10.1f}")
+            continue
+        start = time.perf_counter()
+        expected = getattr(reference, name)(*call_args)
+        reference_elapsed = time.perf_counter() - start
+        match = result == expected
+        failed = failed or not match
+        print(f"{name:<10} {'yes' if match else 'NO':>6} {elapsed * 1000:>10.1f} {reference_elapsed * 1000:>11.1f} "
+              f"{reference_elapsed / max(elapsed, 1e-9):>7.1f}x")
+    return 1 if failed else 0
+
+
+def bench_pool(args):
+    """Compare batch wall time with the jobs shared between 1..N fake Resolve hosts."""
+    latency = args.latency_ms or 2.0
+    print(f"{'hosts':<8} {'files':>6} {'wall ms':>10} {'speedup':>8}  files per host")
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        sources = []
+        for index in range(args.files):
+            sources.append(os.path.join(tmp, f"clip{index}.wav"))
+            open(sources[-1], "wb").close()
+        host_counts = sorted({1, 2, args.hosts} | ({4} if args.hosts > 4 else set()))
+        for count in host_counts:
+            backends = {f"host{i}": fake_resolve.FakeBackend(latency=latency / 1000.0) for i in range(count)}
+            pipeline = load_pipeline(next(iter(backends.values())), args.verbose)
+            fake_resolve.install_hosts(backends)
+            options = pipeline.default_options()
+            options["no_silence_check"] = True
+            run = pipeline.RunState()
+            scheduled = (([pipeline.Job(source)], None) for source in sources)
+            start = time.perf_counter()
+            with contextlib.redirect_stdout(io.StringIO()):
+                pipeline.run_on_hosts(scheduled, list(backends), options, run)
+            elapsed = time.perf_counter() - start
+            if run.successful != len(sources):
+                print(f"{count} hosts: only {run.successful}/{len(sources)} files succeeded")
+                return 1
+            baseline = baseline or elapsed
+            spread = ", ".join(str(run.per_host.get(host, 0)) for host in backends)
+            print(f"{count:<8} {len(sources):>6} {elapsed * 1000:>10.1f} {baseline / elapsed:>7.2f}x  {spread}")
+    return 0
+
+
+# (path flavour, pattern, expected root, expected components) for split_pattern
+PATTERN_CASES = [
+    (ntpath, r"\\server\share\*.mp3", "\\\\server\\share\\", ["*.mp3"]),
+    (ntpath, r"\\server\share\talks\**\*.wav", r"\\server\share\talks", ["**", "*.wav"]),
+    (ntpath, r"C:\*.mp3", "C:\\", ["*.mp3"]),
+    (ntpath, r"C:*.mp3", "C:", ["*.mp3"]),
+    (ntpath, r"C:\Media\Day 1\*.mp3", r"C:\Media\Day 1", ["*.mp3"]),
+    (ntpath, "C:/Media/*.mp3", "C:/Media", ["*.mp3"]),
+    (ntpath, r"\*.mp3", "\\", ["*.mp3"]),
+    (ntpath, r"talks\*\*.mp3", "talks", ["*", "*.mp3"]),
+    (ntpath, "*.mp3", "", ["*.mp3"]),
+    (posixpath, "/*.mp3", "/", ["*.mp3"]),
+    (posixpath, "/srv/media/*.mp3", "/srv/media", ["*.mp3"]),
+    (posixpath, "talks/**/*.wav", "talks", ["**", "*.wav"]),
+    (posixpath, "*.mp3", "", ["*.mp3"]),
+    (posixpath, "talk.mp3", "talk.mp3", []),
+]
+
+
+def bench_discovery(args):
+    """Check how wildcard patterns are split, then time iter_pattern against glob on a temp tree."""
+    failed = False
+    for path, pattern, root, parts in PATTERN_CASES:
+        got = discovery.split_pattern(pattern, path)
+        if got != (root, parts):
+            print(f"{path.__name__} {pattern!r}: got {got!r}, expected {(root, parts)!r}")
+            failed = True
+    print(f"{len(PATTERN_CASES)} split_pattern cases, {'some failed' if failed else 'all passed'}")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for index in range(args.files):
+            folder = os.path.join(tmp, f"day{index % 10}")
+            os.makedirs(folder, exist_ok=True)
+            open(os.path.join(folder, f"clip{index}.mp3"), "wb").close()
+        # An absolute pattern, as a shell leaves it when nothing matches
+        pattern = os.path.join(tmp, "day*", "*.mp3")
+        start = time.perf_counter()
+        streamed = sorted(discovery.iter_pattern(pattern))
+        streamed_elapsed = time.perf_counter() - start
+        start = time.perf_counter()
+        globbed = sorted(glob.glob(pattern))
+        glob_elapsed = time.perf_counter() - start
+    if streamed != globbed:
+        print(f"iter_pattern found {len(streamed)} files, glob {len(globbed)}")
+        failed = True
+    print(f"{'files':>8} {'stream ms':>10} {'glob ms':>10}")
+    print(f"{len(streamed):>8} {streamed_elapsed * 1000:>10.1f} {glob_elapsed * 1000:>10.1f}")
+    return 1 if failed else 0
+
+
+def bench_record(args):
+    """Record one fake-backend run to a cassette."""
+    backend = make_backend(args)
+    pipeline = load_pipeline(backend, args.verbose)
+    # Keep the pipeline's waits so the cassette times a whole run
+    pipeline.time = time
+    recorder = pipeline.CASSETTE_RECORDER = cassette.Recorder(args.cassette, {"argv": ["benchmark.py", "record"]})
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ok = pipeline.generate_srt(["bench.wav"], "bench.wav", os.path.join(tmp, "bench.srt"))
+        elapsed = time.perf_counter() - start
+    recorder.close()
+    pipeline.CASSETTE_RECORDER = None
+    if not ok:
+        print("pipeline failed")
+        return 1
+    print(f"Recorded {recorder.count} calls and attribute reads in {elapsed * 1000:.1f} ms to {args.cassette} "
+          f"({os.path.getsize(args.cassette)} bytes)")
+    return 0
+
+
+def bench_replay(args):
+    """Run the pipeline against a recorded cassette and compare with the recorded run."""
+    if not args.cassette or not os.path.isfile(args.cassette):
+        print("replay needs --cassette FILE (record one with generate_srt.py --record-cassette)")
+        return 1
+    backend = cassette.ReplayBackend(args.cassette, speed=args.speed)
+    pipeline = load_pipeline(backend, args.verbose)
+    pipeline.time = time
+    # Reuse the recorded names so the pipeline's checks see what Resolve returned
+    timeline_args = backend.first_args("CreateTimelineFromClips")
+    timeline_name = timeline_args[0] if timeline_args else "replay"
+    import_args = backend.first_args("ImportMedia")
+    import_paths = import_args[0] if import_args else [timeline_name]
+    recorded = sum(1 for record in backend.records if record[0] == "c")
+    with tempfile.TemporaryDirectory() as tmp:
+        start = time.perf_counter()
+        ok = pipeline.generate_srt(import_paths, timeline_name, os.path.join(tmp, "replay.srt"))
+        elapsed = time.perf_counter() - start
+    print(f"{'':<10} {'calls':>8} {'API ms':>10} {'wall ms':>10}")
+    print(f"{'recorded':<10} {recorded:>8} {sum(r[5] for r in backend.records if r[0] == 'c') * 1000:>10.1f} "
+          f"{backend.recorded_span() * 1000:>10.1f}")
+    print(f"{'replayed':<10} {backend.calls:>8} {backend.latency * args.speed * 1000:>10.1f} {elapsed * 1000:>10.1f}")
+    if backend.misses:
+        print(f"{backend.misses} call(s) had no recorded answer and returned None")
+    if not ok:
+        print("pipeline failed against the cassette")
+        return 1
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=["rpc", "clear", "extract", "timecode", "audioop", "pool", "discovery",
+                                                     "record", "replay"],
+                        help="which benchmark to run")
+    parser.add_argument("--clip-minutes", type=float, default=10.0, help="length of the fake clip")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="simulated latency per API call")
+    parser.add_argument("--tracks", type=int, default=2, help="subtitle tracks to fill for 'clear'")
+    parser.add_argument("--frames", type=int, default=2000000, help="frames to convert for 'timecode'")
+    parser.add_argument("--hosts", type=int, default=3, help="most fake Resolve hosts for 'pool'")
+    parser.add_argument("--files", type=int, default=24, help="files in the batch for 'pool' or the tree for 'discovery'")
+    parser.add_argument("--cassette", help="cassette file to write for 'record' or read for 'replay'")
+    parser.add_argument("--speed", type=float, default=1.0, help="scale recorded latencies for 'replay' (0 skips them)")
+    parser.add_argument("--verbose", action="store_true", help="show pipeline INFO logging")
+    args = parser.parse_args()
+    if args.benchmark == "record" and not args.cassette:
+        args.cassette = "bench.cassette"
+
+    benchmarks = {
+        "rpc": bench_rpc,
+        "clear": bench_clear,
+        "extract": bench_extract,
+        "timecode": bench_timecode,
+        "audioop": bench_audioop,
+        "pool": bench_pool,
+        "discovery": bench_discovery,
+        "record": bench_record,
+        "replay": bench_replay,
+    }
+    return benchmarks[args.benchmark](args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
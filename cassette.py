@@ -0,0 +1,325 @@
+"""
+Record and replay DaVinci Resolve scripting sessions.
+
+A Recorder wraps the object returned by scriptapp() and writes every method
+call and attribute read made through it (and through every object it
+returns) to a cassette: the arguments, the result and how long Resolve
+took to answer. Cassettes are gzip-compressed JSON lines, with Resolve
+objects replaced by small numbers.
+
+ReplayBackend stands in for Resolve and answers from a cassette, sleeping
+for each recorded latency, so pipeline changes can be timed offline
+against a real session's latency profile (see `benchmark.py replay`).
+Calls are matched on object, method and arguments, and repeated calls get
+the recorded answers in order (so a poll that returned nothing three times
+before the subtitles appeared does the same on replay). When the arguments
+differ, as file paths will on another machine, the answers recorded for
+that object and method are used instead.
+"""
+
+import gzip
+import json
+import time
+import logging
+import threading
+from collections import defaultdict, deque
+
+CASSETTE_VERSION = 1
+# Object numbers for the scriptapp() entry point and the Resolve object it returns
+CONNECT_ID = -1
+ROOT_ID = 0
+# Methods that write a file, and which argument is its path; the file's
+# contents go in the cassette so replay can write them where it's asked to
+FILE_OUTPUTS = {"ExportSubtitles": 0}
+
+
+class Recorder:
+    """Writes the calls made through wrapped objects to a cassette file."""
+
+    def __init__(self, path, meta=None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.file = gzip.open(path, "wt", encoding="utf-8")
+        self.started = time.perf_counter()
+        # id(raw object) -> (number, raw object); holding the object keeps its id unique
+        self.objects = {}
+        self.next_number = ROOT_ID + 1
+        self.count = 0
+        header = {"cassette": CASSETTE_VERSION, "recorded": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        header.update(meta or {})
+        self.file.write(json.dumps(header) + "\n")
+
+    def connect(self, scriptapp, *args):
+        """Call scriptapp(*args) and return the Resolve object wrapped for recording.
+
+        Every connection is recorded as the same root object, so a run that
+        reconnects after a hang replays like one that didn't.
+        """
+        return Recorded(self, scriptapp, CONNECT_ID).scriptapp(*args)
+
+    def object_number(self, obj):
+        with self.lock:
+            entry = self.objects.get(id(obj))
+            if entry is None:
+                entry = self.objects[id(obj)] = (self.next_number, obj)
+                self.next_number += 1
+            return entry[0]
+
+    def encode(self, value):
+        """Encode an argument or result as JSON-friendly data."""
+        if isinstance(value, Recorded):
+            return {"$obj": value._number}
+        if isinstance(value, (str, int, float, bool, type(None))):
+            return value
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        if isinstance(value, dict):
+            if all(isinstance(key, str) for key in value):
+                return {key: self.encode(item) for key, item in value.items()}
+            return {"$dict": [[self.encode(key), self.encode(item)] for key, item in value.items()]}
+        return {"$obj": self.object_number(value)}
+
+    def encode_result(self, value):
+        """Wrap Resolve objects in a result (recursively) so calls on them are recorded too."""
+        if isinstance(value, (str, int, float, bool, type(None), Recorded)):
+            return value
+        if isinstance(value, (list, tuple)):
+            return type(value)(self.encode_result(item) for item in value)
+        if isinstance(value, dict):
+            return {key: self.encode_result(item) for key, item in value.items()}
+        return Recorded(self, value, self.object_number(value))
+
+    def write(self, record):
+        line = json.dumps(record, separators=(",", ":"))
+        with self.lock:
+            self.file.write(line + "\n")
+            self.count += 1
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+
+
+def output_path(name, args):
+    """The path a FILE_OUTPUTS method was asked to write, or None."""
+    index = FILE_OUTPUTS.get(name)
+    if index is None or len(args) <= index or not isinstance(args[index], str):
+        return None
+    return args[index]
+
+
+def read_output(name, args):
+    path = output_path(name, args)
+    if path is None:
+        return None
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+def raw(value):
+    """Strip Recorded wrappers from arguments before they reach Resolve."""
+    if isinstance(value, Recorded):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(raw(item) for item in value)
+    if isinstance(value, dict):
+        return {key: raw(item) for key, item in value.items()}
+    return value
+
+
+class Recorded:
+    """A Resolve object whose calls and attribute reads are written to a Recorder."""
+
+    __slots__ = ("_recorder", "_target", "_number")
+
+    def __init__(self, recorder, target, number):
+        self._recorder = recorder
+        self._target = target
+        self._number = number
+
+    def __getattr__(self, name):
+        recorder = self._recorder
+        attr = self._target if self._number == CONNECT_ID else getattr(self._target, name)
+        if not callable(attr):
+            recorder.write(["g", self._number, name, recorder.encode(attr)])
+            return recorder.encode_result(attr)
+
+        def method(*args):
+            at = time.perf_counter() - recorder.started
+            start = time.perf_counter()
+            try:
+                result = attr(*raw(args))
+            except Exception as e:
+                recorder.write(["c", self._number, name, recorder.encode(args), {"$error": str(e)},
+                                round(time.perf_counter() - start, 6), round(at, 6)])
+                raise
+            seconds = round(time.perf_counter() - start, 6)
+            if self._number == CONNECT_ID:
+                result = None if result is None else Recorded(recorder, result, ROOT_ID)
+            record = ["c", self._number, name, recorder.encode(args), recorder.encode(result),
+                      seconds, round(at, 6)]
+            written = read_output(name, args)
+            if written is not None:
+                record.append(written)
+            recorder.write(record)
+            return recorder.encode_result(result)
+        method.__name__ = name
+        return method
+
+    def __eq__(self, other):
+        return self._target == raw(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __bool__(self):
+        return bool(self._target)
+
+
+def load(path):
+    """Read a cassette; returns (header dict, list of records)."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        header = json.loads(f.readline())
+        if header.get("cassette") != CASSETTE_VERSION:
+            raise ValueError(f"{path} is not a version {CASSETTE_VERSION} cassette")
+        return header, [json.loads(line) for line in f if line.strip()]
+
+
+def args_key(args):
+    return json.dumps(args, sort_keys=True, separators=(",", ":"))
+
+
+class ReplayBackend:
+    """Answers scripting calls from a cassette, with the recorded latencies.
+
+    speed scales the latencies (0 skips them). scriptapp() has the same
+    signature as DaVinciResolveScript's, so it can be installed with
+    fake_resolve.install(). calls, misses and latency count what was served.
+    """
+
+    def __init__(self, path, speed=1.0):
+        self.header, records = load(path)
+        self.speed = speed
+        self.lock = threading.Lock()
+        self.exact = defaultdict(deque)  # (object, method, args) -> answers in order
+        self.loose = defaultdict(deque)  # (object, method) -> answers in order
+        self.last = {}  # either key -> the answer given most recently
+        self.attributes = {}
+        self.records = records
+        self.calls = 0
+        self.misses = 0
+        self.latency = 0.0
+        for record in records:
+            if record[0] == "g":
+                _, number, name, value = record
+                self.attributes[(number, name)] = value
+            else:
+                number, name, args, result, seconds = record[1:6]
+                written = record[7] if len(record) > 7 else None
+                # Shared by both queues; served is set once it has been answered
+                answer = [result, seconds, False, written]
+                self.exact[(number, name, args_key(args))].append(answer)
+                self.loose[(number, name)].append(answer)
+
+    def recorded_span(self):
+        """Seconds from the first recorded call starting to the last one finishing."""
+        calls = [record for record in self.records if record[0] == "c"]
+        if not calls:
+            return 0.0
+        return max(r[6] + r[5] for r in calls) - min(r[6] for r in calls)
+
+    def first_args(self, method):
+        """Arguments of the first recorded call to method, or None."""
+        for record in self.records:
+            if record[0] == "c" and record[2] == method:
+                return self.decode(record[3])
+        return None
+
+    def scriptapp(self, *args):
+        return ReplayObject(self, CONNECT_ID).scriptapp(*args)
+
+    def answer(self, number, name, args):
+        """Return the recorded [result, latency, served, written] for a call, or None if there is none."""
+        with self.lock:
+            self.calls += 1
+            for key, answers in (((number, name, args_key(args)), self.exact),
+                                 ((number, name), self.loose)):
+                queue = answers.get(key)
+                while queue and queue[0][2]:
+                    queue.popleft()
+                if queue:
+                    answer = self.last[key] = queue.popleft()
+                    answer[2] = True
+                    return answer
+                if key in self.last:
+                    # Called more often than recorded: repeat the last answer
+                    return self.last[key]
+            self.misses += 1
+            return None
+
+    def decode(self, value):
+        if isinstance(value, list):
+            return [self.decode(item) for item in value]
+        if isinstance(value, dict):
+            if "$obj" in value:
+                return ReplayObject(self, value["$obj"])
+            if "$dict" in value:
+                return {self.decode(key): self.decode(item) for key, item in value["$dict"]}
+            return {key: self.decode(item) for key, item in value.items()}
+        return value
+
+    def encode(self, value):
+        if isinstance(value, ReplayObject):
+            return {"$obj": value._number}
+        if isinstance(value, (list, tuple)):
+            return [self.encode(item) for item in value]
+        if isinstance(value, dict):
+            if all(isinstance(key, str) for key in value):
+                return {key: self.encode(item) for key, item in value.items()}
+            return {"$dict": [[self.encode(key), self.encode(item)] for key, item in value.items()]}
+        return value
+
+
+class ReplayObject:
+    """A Resolve object answered from a ReplayBackend's cassette."""
+
+    __slots__ = ("_backend", "_number")
+
+    def __init__(self, backend, number):
+        self._backend = backend
+        self._number = number
+
+    def __getattr__(self, name):
+        backend = self._backend
+        if (self._number, name) in backend.attributes:
+            return backend.decode(backend.attributes[(self._number, name)])
+
+        def method(*args):
+            answer = backend.answer(self._number, name, backend.encode(args))
+            if answer is None:
+                logging.warning(f"Cassette has no answer for {name}(); returning None")
+                return None
+            result, seconds, _, written = answer
+            if backend.speed:
+                time.sleep(seconds * backend.speed)
+            path = output_path(name, args)
+            if written is not None and path:
+                with open(path, "w", encoding="utf-8") as f:
+                    f.write(written)
+            with backend.lock:
+                backend.latency += seconds
+            if isinstance(result, dict) and "$error" in result:
+                raise Exception(result["$error"])
+            return backend.decode(result)
+        method.__name__ = name
+        return method
+
+    def __eq__(self, other):
+        return isinstance(other, ReplayObject) and other._number == self._number
+
+    def __hash__(self):
+        return hash(self._number)
@@ -0,0 +1,152 @@
+"""
+Streaming discovery of input files for wildcard and directory arguments.
+
+Matches are produced lazily with os.scandir, one directory at a time, so
+jobs can start before a large tree has been fully listed. Wildcards match
+case-insensitively; "**" matches any number of directories (including
+none), and a directory argument yields every file beneath it whose
+extension is in the given set. Each directory's entries are sorted, so
+output order is stable: files first, then subdirectories.
+"""
+
+import os
+import re
+import fnmatch
+
+WILDCARD_CHARS = "*?["
+
+
+def has_wildcard(text):
+    return any(ch in text for ch in WILDCARD_CHARS)
+
+
+def split_pattern(pattern, path=os.path):
+    """Split a pattern into (root, parts): the literal directory it starts
+    in and the remaining path components, the first of which has a wildcard.
+
+    The root keeps any drive or UNC share and its separators as typed, so
+    "C:\\*.mp3" starts in "C:\\" (not "C:", the drive's current directory)
+    and "\\\\server\\share\\*.mp3" in "\\\\server\\share\\". path is the
+    os.path flavour to follow (ntpath or posixpath), for checking one on the other.
+    """
+    separators = re.escape(path.sep + (path.altsep or ""))
+    drive, rest = path.splitdrive(pattern)
+    for match in re.finditer(f"[^{separators}]+", rest):
+        if has_wildcard(match.group()):
+            prefix = rest[:match.start()]
+            # Keep one separator for an absolute root ("/", "C:\\")
+            root = drive + (prefix.rstrip(path.sep + (path.altsep or "")) or prefix[:1])
+            return root, [part for part in re.split(f"[{separators}]+", rest[match.start():]) if part]
+    return pattern, []
+
+
+def component_matcher(part):
+    """Return a case-insensitive name test for one pattern component.
+
+    The common "*.ext" form is a plain suffix check; anything else is an
+    fnmatch pattern compiled once.
+    """
+    lowered = part.lower()
+    if lowered.startswith("*") and not has_wildcard(lowered[1:]):
+        suffix = lowered[1:]
+        return lambda name: name.lower().endswith(suffix)
+    regex = re.compile(fnmatch.translate(part), re.IGNORECASE)
+    return lambda name: regex.match(name) is not None
+
+
+def list_dir(directory):
+    """Return the (files, subdirectories) names in a directory, each sorted.
+
+    Hidden entries are included; callers decide whether to keep them.
+    Unreadable directories give empty lists.
+    """
+    files, subdirs = [], []
+    try:
+        with os.scandir(directory or ".") as entries:
+            for entry in entries:
+                try:
+                    (subdirs if entry.is_dir() else files).append(entry.name)
+                except OSError:
+                    continue
+    except OSError:
+        return [], []
+    files.sort()
+    subdirs.sort()
+    return files, subdirs
+
+
+def join(directory, name):
+    return os.path.join(directory, name) if directory else name
+
+
+def walk_pattern(directory, parts):
+    """Yield files under directory matching the remaining pattern components."""
+    part, rest = parts[0], parts[1:]
+    if part == "**":
+        if rest:
+            yield from walk_pattern(directory, rest)
+        files, subdirs = list_dir(directory)
+        if not rest:
+            # A trailing ** matches every file below this point
+            yield from (join(directory, name) for name in files if not name.startswith("."))
+        for name in subdirs:
+            if not name.startswith("."):
+                yield from walk_pattern(join(directory, name), parts)
+        return
+
+    matches = component_matcher(part)
+    # Hidden names only match a component that itself starts with a dot, as in glob
+    show_hidden = part.startswith(".")
+    files, subdirs = list_dir(directory)
+    for name in subdirs if rest else files:
+        if (show_hidden or not name.startswith(".")) and matches(name):
+            if rest:
+                yield from walk_pattern(join(directory, name), rest)
+            else:
+                yield join(directory, name)
+
+
+def iter_pattern(pattern):
+    """Yield the files matching a wildcard pattern, lazily."""
+    root, parts = split_pattern(pattern)
+    if not parts:
+        if os.path.isfile(pattern):
+            yield pattern
+        return
+    # Literal directories that don't exist as typed are matched
+    # case-insensitively from the nearest one that does
+    while root and not os.path.isdir(root):
+        head, last = os.path.split(root.rstrip("/\\") or root)
+        if not last:
+            break  # A drive or share root that isn't there
+        root = head
+        parts.insert(0, last)
+    yield from walk_pattern(root, parts)
+
+
+def iter_directory(directory, extensions):
+    """Yield every non-hidden file under directory whose extension is in extensions, lazily."""
+    pending = [directory]
+    while pending:
+        current = pending.pop()
+        files, subdirs = list_dir(current)
+        for name in files:
+            if not name.startswith(".") and os.path.splitext(name)[1].lower() in extensions:
+                yield os.path.join(current, name)
+        # Reversed so the stack pops subdirectories in sorted order
+        pending.extend(os.path.join(current, name) for name in reversed(subdirs) if not name.startswith("."))
+
+
+def iter_inputs(token, extensions):
+    """Expand one command-line input into file paths, lazily.
+
+    Wildcard patterns yield their matches, directories yield the files
+    beneath them with a wanted extension, and anything else is yielded
+    unchanged (so missing files are still reported by the caller).
+    """
+    if has_wildcard(token) and not os.path.exists(token):
+        yield from iter_pattern(token)
+    elif os.path.isdir(token):
+        yield from iter_directory(token, extensions)
+    else:
+        yield token
@@ -0,0 +1,371 @@
+#!/usr/bin/env python
+"""
+In-memory stand-in for the DaVinci Resolve scripting API.
+
+Lets benchmark.py drive the generate_srt pipeline without a running Resolve.
+Every API call is counted as one round trip (and optionally delayed by a
+fixed latency) so pipeline changes can be compared by RPC count as well as
+wall time.
+"""
+
+import os
+import sys
+import time
+import types
+import tempfile
+from collections import Counter
+
+
+def srt_timecode(frame, fps):
+    """Format a frame number as an SRT timecode, rounded to the millisecond."""
+    ms = round(frame * 1000 / fps)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+class CallCounter:
+    """Counts scripting API calls and simulates per-call latency."""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = Counter()
+
+    def record(self, name):
+        self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    @property
+    def total(self):
+        return sum(self.calls.values())
+
+    def reset(self):
+        self.calls.clear()
+
+
+class FakeObject:
+    """Base class whose CamelCase methods each count as one API round trip."""
+
+    def __init__(self, counter):
+        self._counter = counter
+
+    def __getattribute__(self, name):
+        attr = object.__getattribute__(self, name)
+        if name[:1].isupper() and not name.isupper() and callable(attr):
+            counter = object.__getattribute__(self, "_counter")
+            label = f"{type(self).__name__}.{name}"
+
+            def call(*args, **kwargs):
+                counter.record(label)
+                return attr(*args, **kwargs)
+            return call
+        return attr
+
+
+class FakeTimelineItem(FakeObject):
+    def __init__(self, counter, name, start, end):
+        super().__init__(counter)
+        self._name = name
+        self._start = start
+        self._end = end
+
+    def GetName(self):
+        return self._name
+
+    def GetStart(self):
+        return self._start
+
+    def GetEnd(self):
+        return self._end
+
+
+class FakeMediaPoolItem(FakeObject):
+    def __init__(self, counter, path, duration_frames):
+        super().__init__(counter)
+        self._path = path
+        self._duration = duration_frames
+
+    def GetName(self):
+        return os.path.basename(self._path)
+
+    def GetClipProperty(self, key=None):
+        props = {"File Path": self._path, "Frames": str(self._duration)}
+        return props.get(key) if key else props
+
+
+class FakeFolder(FakeObject):
+    def __init__(self, counter):
+        super().__init__(counter)
+        self._clips = []
+
+    def GetClipList(self):
+        return list(self._clips)
+
+
+class FakeTimeline(FakeObject):
+    """Timeline with audio and subtitle tracks held as plain lists."""
+
+    def __init__(self, counter, backend, name, clips):
+        super().__init__(counter)
+        self._backend = backend
+        self._name = name
+        self._start_frame = backend.start_frame
+        self._tracks = {"video": [], "audio": [[]], "subtitle": []}
+        position = self._start_frame
+        for clip in clips:
+            end = position + clip._duration
+            self._tracks["audio"][0].append(FakeTimelineItem(counter, clip.GetName(), position, end))
+            position = end
+        self._end_frame = position
+
+    def GetName(self):
+        return self._name
+
+    def GetStartFrame(self):
+        return self._start_frame
+
+    def GetEndFrame(self):
+        return self._end_frame
+
+    def GetSetting(self, key=None):
+        settings = {"timelineFrameRate": self._backend.fps}
+        return settings.get(key) if key else settings
+
+    def GetTrackCount(self, track_type):
+        return len(self._tracks.get(track_type, []))
+
+    def AddTrack(self, track_type, sub_type=None):
+        self._tracks.setdefault(track_type, []).append([])
+        return True
+
+    def DeleteTrack(self, track_type, index):
+        tracks = self._tracks.get(track_type, [])
+        if not 1 <= index <= len(tracks):
+            return False
+        del tracks[index - 1]
+        return True
+
+    def GetItemListInTrack(self, track_type, index):
+        tracks = self._tracks.get(track_type, [])
+        if not 1 <= index <= len(tracks):
+            return None
+        return list(tracks[index - 1])
+
+    def DeleteItems(self, items, ripple=False):
+        doomed = {id(item) for item in items}
+        for tracks in self._tracks.values():
+            for track in tracks:
+                track[:] = [item for item in track if id(item) not in doomed]
+        return True
+
+    def ExportSubtitles(self, path, fmt="srt"):
+        if not self._backend.native_export:
+            # Mirrors calling a method the scripting proxy doesn't expose
+            raise TypeError("'NoneType' object is not callable")
+        fps = float(self._backend.fps)
+        tracks = self._tracks["subtitle"]
+        with open(path, "w", encoding="utf-8") as f:
+            for n, item in enumerate(tracks[0] if tracks else [], 1):
+                start = srt_timecode(item._start, fps)
+                end = srt_timecode(item._end, fps)
+                text = item._name.replace("\u2028", "\n")
+                f.write(f"{n}\n{start} --> {end}\n{text}\n\n")
+        return True
+
+    def CreateSubtitlesFromAudio(self, settings=None):
+        if not self._tracks["subtitle"]:
+            self._tracks["subtitle"].append([])
+        track = self._tracks["subtitle"][0]
+        self._backend.caption_runs.append(dict(settings or {}))
+        track.extend(self._backend.make_cues(self._counter, self._start_frame, self._end_frame))
+        return True
+
+
+class FakeMediaPool(FakeObject):
+    def __init__(self, counter, backend):
+        super().__init__(counter)
+        self._backend = backend
+        self._root = FakeFolder(counter)
+
+    def GetRootFolder(self):
+        return self._root
+
+    def ImportMedia(self, paths):
+        if isinstance(paths, str):
+            paths = [paths]
+        items = [FakeMediaPoolItem(self._counter, path, self._backend.clip_frames) for path in paths]
+        self._root._clips.extend(items)
+        return items
+
+    def CreateTimelineFromClips(self, name, clips):
+        timeline = FakeTimeline(self._counter, self._backend, name, clips)
+        self._backend.timelines.append(timeline)
+        return timeline
+
+
+class FakeProject(FakeObject):
+    def __init__(self, counter, backend, name):
+        super().__init__(counter)
+        self._name = name
+        self._media_pool = FakeMediaPool(counter, backend)
+        self._current_timeline = None
+
+    def GetName(self):
+        return self._name
+
+    def GetMediaPool(self):
+        return self._media_pool
+
+    def GetCurrentTimeline(self):
+        return self._current_timeline
+
+    def SetCurrentTimeline(self, timeline):
+        self._current_timeline = timeline
+        return True
+
+
+class FakeProjectManager(FakeObject):
+    def __init__(self, counter, backend):
+        super().__init__(counter)
+        self._project = FakeProject(counter, backend, "Fake Project")
+
+    def GetCurrentProject(self):
+        return self._project
+
+    def GetProject(self, name):
+        return self._project if name == self._project._name else None
+
+    def CreateProject(self, name):
+        self._project = FakeProject(self._counter, self._project._media_pool._backend, name)
+        return self._project
+
+
+class FakeResolve(FakeObject):
+    """Top-level object returned by scriptapp("Resolve")."""
+
+    SUBTITLE_LANGUAGE = "language"
+    SUBTITLE_CAPTION_PRESET = "captionPreset"
+    SUBTITLE_CHARS_PER_LINE = "charsPerLine"
+    SUBTITLE_LINE_BREAK = "lineBreak"
+    SUBTITLE_GAP = "gap"
+    AUTO_CAPTION_AUTO = "auto"
+    AUTO_CAPTION_ENGLISH = "en"
+    AUTO_CAPTION_FRENCH = "fr"
+    AUTO_CAPTION_GERMAN = "de"
+    AUTO_CAPTION_SPANISH = "es"
+    AUTO_CAPTION_SUBTITLE_DEFAULT = "default"
+    AUTO_CAPTION_LINE_SINGLE = "single"
+    AUTO_CAPTION_LINE_DOUBLE = "double"
+
+    def __init__(self, counter, backend):
+        super().__init__(counter)
+        self._project_manager = FakeProjectManager(counter, backend)
+        self._page = "edit"
+
+    def GetProjectManager(self):
+        return self._project_manager
+
+    def GetCurrentPage(self):
+        return self._page
+
+    def OpenPage(self, page):
+        self._page = page
+        return True
+
+
+class FakeBackend:
+    """A fake Resolve instance plus the knobs that shape its timelines.
+
+    fps          — timeline frame rate reported by GetSetting
+    clip_frames  — length given to every imported clip
+    cue_frames   — length of each generated subtitle cue
+    latency      — seconds added to every API call
+    native_export — whether Timeline.ExportSubtitles is available
+    """
+
+    def __init__(self, fps="24", clip_frames=24 * 60 * 10, cue_frames=72, latency=0.0, start_frame=86400,
+                 native_export=True):
+        self.fps = fps
+        self.native_export = native_export
+        self.clip_frames = clip_frames
+        self.cue_frames = cue_frames
+        self.start_frame = start_frame
+        self.counter = CallCounter(latency)
+        self.timelines = []
+        self.caption_runs = []
+        self.resolve = FakeResolve(self.counter, self)
+
+    def make_cues(self, counter, start_frame, end_frame):
+        """Build one subtitle item per cue_frames across [start_frame, end_frame)."""
+        cues = []
+        for n, start in enumerate(range(start_frame, end_frame, self.cue_frames), 1):
+            end = min(start + self.cue_frames, end_frame)
+            text = f"Caption number {n} says\u2028something on two lines"
+            cues.append(FakeTimelineItem(counter, text, start, end))
+        return cues
+
+    def fill_subtitle_tracks(self, timeline, tracks):
+        """Put a full set of cues on each of the first `tracks` subtitle tracks.
+
+        Setup helper for benchmarks; does not count as API calls.
+        """
+        subtitle_tracks = timeline._tracks["subtitle"]
+        while len(subtitle_tracks) < tracks:
+            subtitle_tracks.append([])
+        for track in subtitle_tracks[:tracks]:
+            track.extend(self.make_cues(self.counter, timeline._start_frame, timeline._end_frame))
+
+    def new_timeline(self, name="bench"):
+        """Create a one-clip timeline without counting the setup calls."""
+        clip = FakeMediaPoolItem(self.counter, f"{name}.wav", self.clip_frames)
+        timeline = FakeTimeline(self.counter, self, name, [clip])
+        self.timelines.append(timeline)
+        return timeline
+
+    def scriptapp(self, name):
+        return self.resolve if name == "Resolve" else None
+
+
+def install(backend):
+    """Make `import DaVinciResolveScript` resolve to the given fake backend.
+
+    Registers a stand-in module in sys.modules and points RESOLVE_SCRIPT_API
+    and RESOLVE_SCRIPT_LIB at a scratch directory holding a stub module and
+    library, so generate_srt's path validation and subprocess import test pass
+    without prompting.
+    """
+    module = sys.modules.get("DaVinciResolveScript")
+    if getattr(module, "FAKE_RESOLVE", False):
+        module.scriptapp = backend.scriptapp
+        return module
+
+    scratch = tempfile.mkdtemp(prefix="fake_resolve_")
+    modules_dir = os.path.join(scratch, "Modules")
+    os.makedirs(modules_dir)
+    with open(os.path.join(modules_dir, "DaVinciResolveScript.py"), "w") as f:
+        f.write("def scriptapp(name):\n    return None\n")
+    lib_path = os.path.join(scratch, "fusionscript.so")
+    open(lib_path, "w").close()
+    os.environ["RESOLVE_SCRIPT_API"] = scratch
+    os.environ["RESOLVE_SCRIPT_LIB"] = lib_path
+
+    module = types.ModuleType("DaVinciResolveScript")
+    module.FAKE_RESOLVE = True
+    module.scriptapp = backend.scriptapp
+    sys.modules["DaVinciResolveScript"] = module
+    return module
+
+
+def install_hosts(backends):
+    """Like install(), for several fake Resolve hosts at once.
+
+    backends maps host names to FakeBackends; scriptapp("Resolve", host)
+    returns that host's instance, and a call without a host gets the first.
+    """
+    default = next(iter(backends.values()))
+    module = install(default)
+
+    def scriptapp(name, host=None):
+        backend = backends.get(host) if host else default
+        return backend.scriptapp(name) if backend else None
+    module.scriptapp = scriptapp
+    return module
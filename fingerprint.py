@@ -0,0 +1,483 @@
+"""
+Audio fingerprints for recognising the same recording in another file.
+
+A WAV master, an MP3 export and an MP4 with the same audio differ byte for
+byte but sound the same. fingerprint_samples() reduces decoded PCM (see
+audio_analysis.pcm_array) to one 32-bit value every FRAME_HOP_MS: each bit
+says whether the energy difference between two neighbouring frequency
+bands rose or fell since the previous frame. Those comparisons survive
+lossy encoding and resampling, while unrelated audio disagrees on about
+half of the bits.
+
+FingerprintIndex keeps fingerprints of captioned files, and their cues for
+each set of caption settings, in a local folder. find() looks for an entry
+with the same audio, allowing the two to be shifted by up to
+MAX_OFFSET_MS (encoder padding, a trimmed lead-in), and reports the shift
+so reused cues can be moved to match.
+
+delta_plan() compares an edited recording with the version captioned
+before: stretches that still match (possibly moved by cuts or inserts
+earlier on) can keep their old cues, and only the rest needs captioning.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+
+try:
+    import numpy as np
+except ImportError:  # Only the analysis features need NumPy
+    np = None
+
+from audio_analysis import (ANALYSIS_SAMPLE_RATE, SILENCE_THRESHOLD_DB, array_blocks, pcm_array, require_numpy,
+                            window_levels_db)
+from subtitles import Cue, read_cues, write_subtitles
+
+# Analysis frame (128 ms) and hop (32 ms) at ANALYSIS_SAMPLE_RATE.
+FRAME_SAMPLES = 2048
+HOP_SAMPLES = 512
+FRAME_HOP_MS = HOP_SAMPLES * 1000 // ANALYSIS_SAMPLE_RATE
+
+# 33 log-spaced bands over the range speech is clearest in give 32 bits.
+BAND_EDGES_HZ = (300.0, 3000.0)
+BANDS = 33
+
+# Frames transformed per NumPy call, to bound memory on long recordings.
+FRAMES_PER_BATCH = 4096
+
+# Two fingerprints match when they may be shifted by up to MAX_OFFSET_MS,
+# their lengths differ by no more than that, and at most MATCH_BIT_ERRORS
+# of the overlapping bits differ (unrelated audio is near 0.5).
+MAX_OFFSET_MS = 2000
+MATCH_BIT_ERRORS = 0.3
+
+# Values seen more often than this in one fingerprint (silence, hum) say
+# little about alignment and are left out of the offset vote.
+COMMON_VALUE_LIMIT = 8
+
+# Delta re-captioning: offsets need at least MIN_VOTES exact matches to be
+# tried, at most MAX_CANDIDATE_OFFSETS of them (one per edit, roughly).
+# Bit errors are averaged over ALIGN_WINDOW_FRAMES (about 1 s); matching
+# stretches shorter than MIN_UNCHANGED_MS are captioned again anyway, and
+# DELTA_PAD_MS either side of every change is re-captioned so words cut by
+# the edit are transcribed whole. Past MAX_CHANGED_FRACTION of the
+# recording, captioning it whole is simpler.
+MIN_VOTES = 8
+# A recording against its own earlier version: edits land between frames,
+# which costs a few percent of bits, and unrelated audio is still near 0.5.
+ALIGN_BIT_ERRORS = 0.35
+# Edits rarely land on the HOP_SAMPLES grid, and audio shifted by half a hop
+# loses most of its matching bits, so the new recording is fingerprinted at
+# ALIGN_PHASES evenly spaced starts within one hop (8 ms apart).
+ALIGN_PHASES = 4
+MAX_CANDIDATE_OFFSETS = 16
+ALIGN_WINDOW_FRAMES = 31
+MIN_UNCHANGED_MS = 3000
+DELTA_PAD_MS = 1500
+MAX_CHANGED_FRACTION = 0.5
+
+INDEX_FILE = "index.jsonl"
+
+
+def band_matrix(sample_rate=ANALYSIS_SAMPLE_RATE, frame_samples=FRAME_SAMPLES):
+    """Return the (frequency bins, BANDS) matrix summing FFT power into bands."""
+    edges = np.geomspace(BAND_EDGES_HZ[0], BAND_EDGES_HZ[1], BANDS + 1)
+    freqs = np.fft.rfftfreq(frame_samples, 1.0 / sample_rate)
+    band = np.searchsorted(edges, freqs, side="right") - 1
+    matrix = np.zeros((freqs.size, BANDS), dtype=np.float32)
+    inside = (band >= 0) & (band < BANDS)
+    matrix[np.flatnonzero(inside), band[inside]] = 1.0
+    return matrix
+
+
+def band_energies(samples):
+    """Return the (frames, BANDS) band energies of int16 samples, FRAMES_PER_BATCH frames at a time."""
+    require_numpy()
+    if len(samples) < FRAME_SAMPLES:
+        return np.zeros((0, BANDS), dtype=np.float32)
+    count = (len(samples) - FRAME_SAMPLES) // HOP_SAMPLES + 1
+    window = np.hanning(FRAME_SAMPLES).astype(np.float32)
+    bands = band_matrix()
+    energies = np.empty((count, BANDS), dtype=np.float32)
+    for first in range(0, count, FRAMES_PER_BATCH):
+        last = min(count, first + FRAMES_PER_BATCH)
+        span = samples[first * HOP_SAMPLES:(last - 1) * HOP_SAMPLES + FRAME_SAMPLES]
+        frames = np.lib.stride_tricks.sliding_window_view(span, FRAME_SAMPLES)[::HOP_SAMPLES]
+        spectrum = np.fft.rfft(frames.astype(np.float32) * window, axis=1)
+        power = (spectrum.real ** 2 + spectrum.imag ** 2).astype(np.float32)
+        energies[first:last] = power @ bands
+    return energies
+
+
+def fingerprint_samples(samples):
+    """Return the fingerprint of int16 PCM at ANALYSIS_SAMPLE_RATE as a uint32 array."""
+    energies = np.log1p(band_energies(samples))
+    if len(energies) < 2:
+        return np.zeros(0, dtype=np.uint32)
+    slopes = energies[:, :-1] - energies[:, 1:]
+    bits = (slopes[1:] - slopes[:-1]) > 0
+    weights = np.left_shift(np.uint32(1), np.arange(BANDS - 1, dtype=np.uint32))
+    return (bits.astype(np.uint32) @ weights).astype(np.uint32)
+
+
+def fingerprint_file(path):
+    """Decode path (through the PCM cache) and return (fingerprint, duration_ms).
+
+    Raises AudioAnalysisError when ffmpeg or NumPy is missing or decoding fails.
+    """
+    samples = pcm_array(path)
+    return fingerprint_samples(samples), len(samples) * 1000 // ANALYSIS_SAMPLE_RATE
+
+
+def quiet_frames(samples, threshold_db=SILENCE_THRESHOLD_DB):
+    """Return a mask of the fingerprint values whose audio stays below threshold_db.
+
+    Their bits come from the noise floor, so they say nothing about
+    whether two recordings match.
+    """
+    levels = window_levels_db(array_blocks(samples), window_ms=FRAME_HOP_MS)
+    # Fingerprint value i spans frames i and i+1: FRAME_SAMPLES + HOP_SAMPLES samples
+    span = (FRAME_SAMPLES + HOP_SAMPLES) // HOP_SAMPLES
+    count = max(0, (len(samples) - FRAME_SAMPLES) // HOP_SAMPLES)
+    if len(levels) < span or not count:
+        return np.zeros(count, dtype=bool)
+    loudest = np.lib.stride_tricks.sliding_window_view(levels, span).max(axis=1)
+    quiet = np.ones(count, dtype=bool)
+    quiet[:min(count, len(loudest))] = loudest[:count] < threshold_db
+    return quiet
+
+
+def popcount(values):
+    """Return the number of set bits in each uint32 of values."""
+    if hasattr(np, "bitwise_count"):
+        return np.bitwise_count(values)
+    return np.unpackbits(values.view(np.uint8)).reshape(-1, 32).sum(axis=1)
+
+
+def match_offsets(query, reference):
+    """Return reference position minus query position for every exact sub-fingerprint match.
+
+    Values common in reference (silence, hum) are skipped.
+    """
+    if not len(query) or not len(reference):
+        return np.zeros(0, dtype=np.int64)
+    order = np.argsort(reference, kind="stable")
+    starts = np.searchsorted(reference[order], query, side="left")
+    counts = np.searchsorted(reference[order], query, side="right") - starts
+    usable = (counts > 0) & (counts <= COMMON_VALUE_LIMIT)
+    counts = counts[usable]
+    # One (query frame, reference frame) pair per exact match
+    query_pos = np.repeat(np.flatnonzero(usable), counts)
+    within = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return order[np.repeat(starts[usable], counts) + within] - query_pos
+
+
+def best_offset(query, reference, max_offset=None):
+    """Return (offset_frames, bit_error_rate) aligning query to reference, or None.
+
+    query frame i lines up with reference frame i + offset_frames. The
+    offset is voted for by sub-fingerprints that match exactly (a handful
+    do in any re-encode) and checked by the bit error rate over the overlap.
+    """
+    offsets = match_offsets(query, reference)
+    if max_offset is not None:
+        offsets = offsets[np.abs(offsets) <= max_offset]
+    if not offsets.size:
+        return None
+    votes = np.bincount(offsets + len(query))
+    offset = int(np.argmax(votes)) - len(query)
+    q_from, r_from = max(0, -offset), max(0, offset)
+    overlap = min(len(query) - q_from, len(reference) - r_from)
+    if overlap <= 0:
+        return None
+    errors = popcount(query[q_from:q_from + overlap] ^ reference[r_from:r_from + overlap])
+    return offset, float(errors.sum()) / (overlap * (BANDS - 1))
+
+
+def moving_average(values, width):
+    """Average values over a centred window of width, narrowing at the ends."""
+    total = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    positions = np.arange(len(values))
+    low = np.clip(positions - width // 2, 0, len(values))
+    high = np.clip(positions + width // 2 + 1, 0, len(values))
+    return (total[high] - total[low]) / (high - low)
+
+
+def phase_fingerprints(samples, base=None, phases=ALIGN_PHASES):
+    """Return {shift_samples: fingerprint of samples[shift_samples:]} for phases starts within one hop.
+
+    base, the fingerprint already taken at shift 0, is reused if given.
+    """
+    step = HOP_SAMPLES // phases
+    return {shift: base if shift == 0 and base is not None else fingerprint_samples(samples[shift:])
+            for shift in range(0, HOP_SAMPLES, step)}
+
+
+def align_runs(queries, reference, quiet=None, max_errors=ALIGN_BIT_ERRORS):
+    """Split the query recording into runs that match reference at one offset and runs that don't.
+
+    queries maps a shift in samples to the query's fingerprint taken that
+    far in (see phase_fingerprints; a plain fingerprint counts as shift 0).
+    Returns [(start_frame, end_frame, offset_samples or None)] covering the
+    query in order, where offset_samples is the reference's sample position
+    minus the query's. Each frame takes whichever candidate (phase and
+    offset) matches it best over the surrounding ALIGN_WINDOW_FRAMES, if any
+    matches well enough; neighbouring runs less than a hop apart are the
+    same alignment seen from two phases and are merged. Frames marked in
+    quiet (see quiet_frames) don't count towards the average; a window with
+    nothing but quiet frames matches any offset.
+    """
+    if not isinstance(queries, dict):
+        queries = {0: queries}
+    length = len(queries.get(0, next(iter(queries.values()))))
+    candidates = []
+    for shift, query in queries.items():
+        offsets, votes = np.unique(match_offsets(query, reference), return_counts=True)
+        offsets, votes = offsets[votes >= MIN_VOTES], votes[votes >= MIN_VOTES]
+        for i in np.argsort(-votes, kind="stable")[:MAX_CANDIDATE_OFFSETS]:
+            candidates.append((int(votes[i]), shift, int(offsets[i])))
+    candidates.sort(key=lambda candidate: -candidate[0])
+
+    unmatched = np.iinfo(np.int64).min
+    best = np.full(length, unmatched, dtype=np.int64)
+    best_errors = np.full(length, np.inf)
+    positions = np.arange(length)
+    weight = np.ones(length) if quiet is None else (~quiet[:length]).astype(np.float64)
+    weight = np.concatenate((weight, np.ones(length - len(weight))))
+    heard = moving_average(weight, ALIGN_WINDOW_FRAMES)
+    for _, shift, offset in candidates:
+        query = queries[shift]
+        target = positions + offset
+        inside = (target >= 0) & (target < len(reference)) & (positions < len(query))
+        # Frames with nothing to compare against count as all bits wrong
+        errors = np.full(length, float(BANDS - 1))
+        errors[inside] = popcount(query[positions[inside]] ^ reference[target[inside]])
+        errors = moving_average(errors * weight, ALIGN_WINDOW_FRAMES) / (BANDS - 1)
+        errors = np.divide(errors, heard, out=np.zeros_like(errors), where=heard > 0)
+        better = (errors <= max_errors) & (errors < best_errors)
+        # Query frame i of this phase starts at sample i * HOP_SAMPLES + shift
+        best[better] = offset * HOP_SAMPLES - shift
+        best_errors[better] = errors[better]
+
+    bounds = np.concatenate(([0], np.flatnonzero(np.diff(best)) + 1, [length]))
+    runs = []
+    for start, end in zip(bounds[:-1].tolist(), bounds[1:].tolist()):
+        offset = None if best[start] == unmatched else int(best[start])
+        previous = runs[-1] if runs else None
+        if (previous and offset is not None and previous[2] is not None
+                and abs(previous[2] - offset) < HOP_SAMPLES):
+            # Keep the offset of whichever piece is longer
+            runs[-1] = [previous[0], end, previous[2] if previous[1] - previous[0] >= end - start else offset]
+        else:
+            runs.append([start, end, offset])
+    return [tuple(run) for run in runs]
+
+
+def delta_plan(queries, reference, duration_ms, quiet=None, pad_ms=DELTA_PAD_MS):
+    """Plan re-captioning an edited recording from the fingerprint of the version captioned before.
+
+    Returns (kept, changed): kept is [(start_ms, end_ms, offset_ms)], spans
+    of the new recording whose cues can be taken from the old one with
+    shift_cues(cues, offset_ms); changed is [(start_ms, end_ms)], the spans
+    to caption again. Together they cover 0..duration_ms in order, and no
+    kept span is shorter than MIN_UNCHANGED_MS. Returns None when more than
+    MAX_CHANGED_FRACTION has changed. queries (the new recording's
+    fingerprints, see phase_fingerprints) and quiet are passed on to
+    align_runs.
+    """
+    require_numpy()
+    runs = align_runs(queries, reference, quiet)
+    if runs:
+        # The last run also covers the few ms after the last whole frame
+        runs[-1] = (runs[-1][0], max(runs[-1][1], -(-duration_ms // FRAME_HOP_MS)), runs[-1][2])
+    min_frames = MIN_UNCHANGED_MS // FRAME_HOP_MS
+    # Changed audio, plus the seam wherever the offset jumps (a cut)
+    changes = []
+    previous = None
+    for start, end, offset in runs:
+        if offset is None or end - start < min_frames:
+            changes.append([start * FRAME_HOP_MS, end * FRAME_HOP_MS])
+            previous = None
+            continue
+        if previous is not None and previous != offset:
+            changes.append([start * FRAME_HOP_MS, start * FRAME_HOP_MS])
+        previous = offset
+    if not runs:
+        changes.append([0, duration_ms])
+
+    changed = []
+    for start, end in changes:
+        start, end = max(0, start - pad_ms), min(duration_ms, end + pad_ms)
+        # A stretch left between changes (or before the first) that is too
+        # short to trust is captioned along with them
+        if changed and start - changed[-1][1] < MIN_UNCHANGED_MS:
+            changed[-1][1] = max(changed[-1][1], end)
+        else:
+            changed.append([0 if start < MIN_UNCHANGED_MS else start, end])
+    if changed and duration_ms - changed[-1][1] < MIN_UNCHANGED_MS:
+        changed[-1][1] = duration_ms
+    if sum(end - start for start, end in changed) > MAX_CHANGED_FRACTION * duration_ms:
+        return None
+
+    kept = []
+    position = 0
+    for start, end in changed + [[duration_ms, duration_ms]]:
+        if start > position:
+            middle = (position + start) // 2 // FRAME_HOP_MS
+            offset = next(offset for run_start, run_end, offset in runs if run_start <= middle < run_end)
+            kept.append((position, start, round(offset * 1000 / ANALYSIS_SAMPLE_RATE)))
+        position = end
+    return kept, [tuple(span) for span in changed]
+
+
+def shift_cues(cues, offset_ms, duration_ms=None):
+    """Move cues earlier by offset_ms, dropping any that end up outside 0..duration_ms."""
+    shifted = []
+    for start_ms, end_ms, text in cues:
+        start_ms, end_ms = start_ms - offset_ms, end_ms - offset_ms
+        if end_ms <= 0 or (duration_ms is not None and start_ms >= duration_ms):
+            continue
+        shifted.append(Cue(max(0, start_ms), end_ms, text))
+    return shifted
+
+
+class FingerprintIndex:
+    """Fingerprints of captioned files, with their cues, kept in a folder.
+
+    Each entry is stored as <id>.fp (raw uint32 fingerprint) and
+    <id>.<key>.json (cues in this tool's JSON format) per caption settings
+    key, and listed in index.jsonl. Safe to share between threads.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.entries = None
+        self.loaded_mtime = None
+
+    def load(self):
+        """Read index.jsonl into {id: entry} if it changed since the last read."""
+        path = os.path.join(self.directory, INDEX_FILE)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            mtime = None
+        if self.entries is not None and mtime == self.loaded_mtime:
+            return self.entries
+        entries = {}
+        if mtime is not None:
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        row = json.loads(line)
+                        # Re-inserted so entries stay in order of their latest row
+                        entry = entries.pop(row["id"], None) or {"duration_ms": row["duration_ms"], "captions": {}}
+                        entry["captions"][row["key"]] = row["cues"]
+                        entry["source"] = row.get("source")
+                        entry["size"], entry["mtime_ns"] = row.get("size"), row.get("mtime_ns")
+                        entries[row["id"]] = entry
+                    except (ValueError, KeyError, TypeError):
+                        continue
+        self.entries, self.loaded_mtime = entries, mtime
+        return entries
+
+    def fingerprint(self, entry_id):
+        path = os.path.join(self.directory, f"{entry_id}.fp")
+        try:
+            return np.fromfile(path, dtype="<u4")
+        except OSError:
+            return None
+
+    def find(self, query, duration_ms, keys, max_offset_ms=MAX_OFFSET_MS):
+        """Return (entry_id, offset_ms, {key: cues}) for a stored match with cues for every key, or None.
+
+        offset_ms is how much later the audio starts in the stored file
+        than in the query; shift_cues(cues, offset_ms) lines stored cues up
+        with the query.
+        """
+        require_numpy()
+        with self.lock:
+            entries = self.load()
+        max_frames = max_offset_ms // FRAME_HOP_MS
+        best = None
+        for entry_id, entry in entries.items():
+            if abs(entry["duration_ms"] - duration_ms) > max_offset_ms:
+                continue
+            if not all(key in entry["captions"] for key in keys):
+                continue
+            reference = self.fingerprint(entry_id)
+            if reference is None:
+                continue
+            match = best_offset(query, reference, max_frames)
+            if match and match[1] <= MATCH_BIT_ERRORS and (best is None or match[1] < best[2]):
+                best = (entry_id, match[0], match[1])
+        if best is None:
+            return None
+        entry_id, offset_frames, errors = best
+        logging.info(f"Fingerprint matches {entries[entry_id]['source']} "
+                     f"({errors:.0%} bit errors, offset {offset_frames * FRAME_HOP_MS} ms)")
+        captions = {}
+        for key in keys:
+            try:
+                captions[key] = read_cues(os.path.join(self.directory, entries[entry_id]["captions"][key]))
+            except (OSError, ValueError, KeyError) as e:
+                logging.warning(f"Stored captions for {entries[entry_id]['source']} are unreadable: {e}")
+                return None
+        return entry_id, offset_frames * FRAME_HOP_MS, captions
+
+    def latest_for_source(self, source, keys=()):
+        """Return the latest entry dict captioned from source with every key, or None (cheap: no fingerprints read)."""
+        with self.lock:
+            entries = self.load()
+        for entry in reversed(list(entries.values())):
+            if entry["source"] == source and all(key in entry["captions"] for key in keys):
+                return entry
+        return None
+
+    def find_source(self, source, keys):
+        """Return (fingerprint, {key: cues}) of the latest entry captioned from source with every key, or None."""
+        require_numpy()
+        with self.lock:
+            entries = self.load()
+        for entry_id, entry in reversed(list(entries.items())):
+            if entry["source"] != source or not all(key in entry["captions"] for key in keys):
+                continue
+            reference = self.fingerprint(entry_id)
+            if reference is None:
+                continue
+            try:
+                captions = {key: read_cues(os.path.join(self.directory, entry["captions"][key])) for key in keys}
+            except (OSError, ValueError) as e:
+                logging.warning(f"Stored captions for {source} are unreadable: {e}")
+                return None
+            return reference, captions
+        return None
+
+    def add(self, fingerprint, duration_ms, source, captions):
+        """Store fingerprint with {key: cues} captioned from source; returns the entry id."""
+        entry_id = hashlib.sha1(fingerprint.astype("<u4").tobytes()).hexdigest()[:20]
+        try:
+            info = os.stat(source)
+            size, mtime_ns = info.st_size, info.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        with self.lock:
+            os.makedirs(self.directory, exist_ok=True)
+            fp_path = os.path.join(self.directory, f"{entry_id}.fp")
+            if not os.path.exists(fp_path):
+                tmp_path = fp_path + ".tmp"
+                fingerprint.astype("<u4").tofile(tmp_path)
+                os.replace(tmp_path, fp_path)
+            rows = []
+            for key, cues in captions.items():
+                name = f"{entry_id}.{key}.json"
+                write_subtitles(os.path.join(self.directory, name), cues, "json", bold=False)
+                rows.append(json.dumps({"id": entry_id, "duration_ms": int(duration_ms), "source": source,
+                                        "size": size, "mtime_ns": mtime_ns, "key": key, "cues": name,
+                                        "added": time.strftime("%Y-%m-%dT%H:%M:%S")}))
+            with open(os.path.join(self.directory, INDEX_FILE), "a", encoding="utf-8") as f:
+                f.write("".join(row + "\n" for row in rows))
+        return entry_id
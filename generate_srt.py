@@ -1,6 +1,7 @@
 #!/usr/bin/env python
 import sys
 import os
+import re
 import glob
 import shutil
 import time
@@ -13,6 +14,24 @@ import tempfile
 import subprocess
 from pydub import AudioSegment
 import csv
+import atexit
+import hashlib
+import contextlib
+import itertools
+import threading
+from collections import namedtuple
+
+from subtitles import parse_srt, write_srt, write_subtitles, read_cues, stitch_cues, Cue, SUBTITLE_FORMATS, STDOUT_PATH
+from timecode import parse_framerate, frames_to_ms, frames_to_ms_array, ms_to_frames, format_srt_timecode
+import audio_analysis
+import cassette
+import fingerprint
+import resolve_calls
+import scheduler
+import scratch
+import watch
+import worker_pool
+from discovery import iter_inputs, iter_directory, has_wildcard
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -21,12 +40,82 @@ logging.basicConfig(level=logging.INFO)
 # To add a new format, add it here — flags and usage messages are derived from this.
 SUPPORTED_CONVERSION_FORMATS = {"wav", "mp3", "flac", "aac", "ogg", "opus", "aiff"}
 
+# Auto-caption settings used by create_subtitles_from_audio() unless a
+# --variants entry overrides them.
+DEFAULT_CAPTION_SETTINGS = {
+    "language": "english",
+    "chars_per_line": 42,
+    "line_break": "double",
+    "gap": 0,
+}
+
+# Languages Resolve can auto-caption (each is exposed as AUTO_CAPTION_<NAME>),
+# plus the short codes accepted for them in --variants.
+CAPTION_LANGUAGES = {
+    "auto", "danish", "dutch", "english", "french", "german", "italian", "japanese", "korean",
+    "mandarin_simplified", "mandarin_traditional", "norwegian", "portuguese", "russian",
+    "spanish", "swedish",
+}
+CAPTION_LANGUAGE_CODES = {
+    "da": "danish", "nl": "dutch", "en": "english", "fr": "french", "de": "german",
+    "it": "italian", "ja": "japanese", "ko": "korean", "zh": "mandarin_simplified",
+    "zh-hans": "mandarin_simplified", "zh-hant": "mandarin_traditional", "no": "norwegian",
+    "pt": "portuguese", "ru": "russian", "es": "spanish", "sv": "swedish",
+}
+CAPTION_LINE_BREAKS = {"single", "double"}
+
+# How many times generate_srt_chunked() retries a failed chunk.
+CHUNK_RETRIES = 2
+
+# Whether Timeline.ExportSubtitles works in this Resolve; None until first tried.
+NATIVE_SUBTITLE_EXPORT = None
+# Per Resolve host (None for the local one): whether ExportSubtitles stamps
+# cues with the timeline's start timecode (01:00:00:00) rather than starting
+# at zero. Probed once by native_export_offset().
+NATIVE_EXPORT_STAMPED = {}
+
 PREFS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "preferences.json")
+# Fingerprints of captioned files and their cues, for --dedupe.
+FINGERPRINT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fingerprints")
+FINGERPRINT_INDEX = fingerprint.FingerprintIndex(FINGERPRINT_DIR)
+# Output formats read_cues() can read back, best first.
+READABLE_FORMATS = ("json", "srt", "vtt")
+# Position-independent on/off flags and the option name each one sets.
+GLOBAL_FLAGS = {
+    "--concat": "concat",
+    "--export": "export",
+    "--import": "import_only",
+    "--paranoid": "paranoid",
+    "--stdout": "stdout",
+    "--strip-silence": "strip_silence",
+    "--no-silence-check": "no_silence_check",
+    "--in-order": "in_order",
+    "--dedupe": "dedupe",
+    "--delta": "delta",
+    "--plan": "plan",
+}
+
+# Position-independent flags that take a value, and the option name each sets.
+GLOBAL_VALUE_FLAGS = {
+    "--formats": "formats",
+    "--variants": "variants",
+    "--chunk-minutes": "chunk_minutes",
+    "--watch": "watch",
+    "--manifest": "manifest",
+    "--deadline": "deadline",
+    "--hosts": "hosts",
+    "--shared-dir": "shared_dir",
+    "--record-cassette": "record_cassette",
+    "--ram-scratch": "ram_scratch",
+}
 CONV_DIR_FLAGS = {"--conv-dir", "--conversion-dir", "--set-conv-dir", "--set-conversion-dir", "--temp-dir", "--tmp-dir"}
 
 # Video container extensions and the audio formats verified to work in each.
 # For video files, only the audio stream is transcoded; video is copied as-is.
 VIDEO_EXTENSIONS = {".mp4", ".mov", ".mkv", ".avi"}
+AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".opus", ".wma", ".aiff"}
+# What a directory argument expands to.
+MEDIA_EXTENSIONS = AUDIO_EXTENSIONS | VIDEO_EXTENSIONS
 VIDEO_CONTAINER_AUDIO_COMPAT = {
     ".mp4": {"mp3", "aac", "opus", "wav"},
     ".mov": {"mp3", "aac", "wav"},
@@ -45,6 +134,17 @@ AUDIO_FORMAT_CODEC = {
     "aiff": "pcm_s16le",
 }
 
+# One input file and how to handle it. convert_format/convert_dir come from a
+# --<fmt> flag; output, group, caption_settings and priority only from a
+# --manifest row (output is the SRT path, group names a concat timeline shared
+# with the neighbouring rows, caption_settings overrides
+# DEFAULT_CAPTION_SETTINGS, and higher priorities are captioned first).
+Job = namedtuple("Job", "source convert_format convert_dir output group caption_settings priority",
+                 defaults=(None, None, None, None, None, 0))
+
+# Columns (CSV) or keys (JSONL) a --manifest row may have; only source is required.
+MANIFEST_FIELDS = ("source", "output", "convert", "convert_dir", "group", "priority") + tuple(DEFAULT_CAPTION_SETTINGS)
+
 def find_module_locations(base_path):
     """Find possible locations of DaVinciResolveScript.py based on a base path.
     Only checks the standard location and directly in the specified path."""
@@ -541,23 +641,29 @@ sys.exit(1)
         except:
             pass
 
-# Validate and set up Resolve paths
-validate_resolve_paths()
+# Path validation and the import below are diagnostics: they go to stderr,
+# so that with --stdout nothing but the subtitles reaches stdout
+with contextlib.redirect_stdout(sys.stderr):
+    # Validate and set up Resolve paths
+    validate_resolve_paths()
 
-# Import DaVinci Resolve Script
-try:
-    import DaVinciResolveScript as dvr_script
-    logging.info("Successfully imported DaVinciResolveScript")
-except ImportError as e:
-    logging.error(f"Failed to import DaVinciResolveScript: {str(e)}")
-    print("\nError importing DaVinci Resolve script libraries. Please check:")
-    print("1. DaVinci Resolve is properly installed")
-    print("2. You have the correct version of Python (64-bit)")
-    print("3. The paths to DaVinci Resolve libraries are correct")
-    print("\nPaths checked:")
-    print(f"API path: {os.environ.get('RESOLVE_SCRIPT_API', 'Not set')}")
-    print(f"Library path: {os.environ.get('RESOLVE_SCRIPT_LIB', 'Not set')}")
-    sys.exit(1)
+    # Import DaVinci Resolve Script
+    try:
+        import DaVinciResolveScript as dvr_script
+        logging.info("Successfully imported DaVinciResolveScript")
+    except ImportError as e:
+        logging.error(f"Failed to import DaVinciResolveScript: {str(e)}")
+        print("\nError importing DaVinci Resolve script libraries. Please check:")
+        print("1. DaVinci Resolve is properly installed")
+        print("2. You have the correct version of Python (64-bit)")
+        print("3. The paths to DaVinci Resolve libraries are correct")
+        print("\nPaths checked:")
+        print(f"API path: {os.environ.get('RESOLVE_SCRIPT_API', 'Not set')}")
+        print(f"Library path: {os.environ.get('RESOLVE_SCRIPT_LIB', 'Not set')}")
+        sys.exit(1)
+
+# Set from --record-cassette; writes every Resolve call made this run to a cassette.
+CASSETTE_RECORDER = None
 
 def get_resolve():
     """Get the resolve object and ensure it's ready for use."""
@@ -566,7 +672,15 @@ def get_resolve():
     # Import the module
     try:
         import DaVinciResolveScript as dvr_script
-        resolve = dvr_script.scriptapp("Resolve")
+        # Every call on resolve and the objects it returns has a deadline
+        host = resolve_calls.current_host()
+        args = ("Resolve", host) if host else ("Resolve",)
+        if CASSETTE_RECORDER:
+            # Recorded underneath the deadlines, so latencies are Resolve's own
+            resolve = resolve_calls.call(CASSETTE_RECORDER.connect, dvr_script.scriptapp, *args, label="scriptapp")
+        else:
+            resolve = resolve_calls.call(dvr_script.scriptapp, *args, label="scriptapp")
+        resolve = resolve_calls.guard(resolve)
         if not resolve:
             raise Exception("Failed to get Resolve object")
         
@@ -745,16 +859,97 @@ def handle_conv_dir_flag(value):
         print(f"Conversion output directory set to: {abs_value}")
     sys.exit(0)
 
+# Set from --shared-dir for this run; takes precedence over the preference.
+SHARED_OUTPUT_DIR = None
+# Set from --ram-scratch for this run (a scratch.ScratchSpace).
+SCRATCH_SPACE = None
+# Bytes per second of converted audio, for sizing --ram-scratch claims: PCM
+# formats assume 48 kHz stereo, compressed ones a generous bitrate.
+CONVERTED_BYTES_PER_SECOND = {"wav": 192000, "aiff": 192000, "flac": 120000}
+COMPRESSED_BYTES_PER_SECOND = 40000
+
 def get_conversion_output_dir():
-    """Return the preferred conversion output dir, or None to use system temp."""
+    """Return the conversion output dir (--shared-dir, then the preference), or None to use system temp."""
+    if SHARED_OUTPUT_DIR:
+        return SHARED_OUTPUT_DIR
     prefs = load_preferences()
     return prefs.get("conversion_output_dir", None)
 
+def is_within(path, folder):
+    """True if path is folder or anything below it (symlinks resolved)."""
+    path, folder = os.path.realpath(path), os.path.realpath(folder)
+    try:
+        return os.path.commonpath([path, folder]) == folder
+    except ValueError:
+        # Different drives on Windows
+        return False
+
+def intermediate_dir(estimate_bytes):
+    """Return the folder for an intermediate file the current job will delete when it's done.
+
+    With --ram-scratch that's the RAM-backed folder while estimate_bytes()
+    fits the budget; otherwise (and outside process_job) the conversion
+    output dir, or system temp.
+    """
+    fallback = get_conversion_output_dir() or tempfile.gettempdir()
+    if not scratch.active():
+        return fallback
+    return scratch.directory(estimate_bytes(), fallback)
+
+def estimate_converted_size(source_path, fmt):
+    """Rough size in bytes of source_path converted to fmt (video keeps its video stream)."""
+    size = scheduler.file_size(source_path)
+    duration = scheduler.probe_duration(source_path)
+    rate = CONVERTED_BYTES_PER_SECOND.get(fmt, COMPRESSED_BYTES_PER_SECOND)
+    if duration is None:
+        # Without ffprobe, assume PCM is about ten times the (compressed) source
+        audio = size * 10 if rate >= CONVERTED_BYTES_PER_SECOND["wav"] else size
+    else:
+        audio = int(duration * rate)
+    if os.path.splitext(source_path)[1].lower() in VIDEO_EXTENSIONS:
+        return size + audio
+    return audio
+
+def analysis_wav_size(path, duration_ms=None):
+    """Size in bytes of duration_ms (default: all of path) as the 16 kHz mono WAV audio_analysis writes."""
+    if duration_ms is None:
+        try:
+            duration_ms = audio_analysis.pcm_duration_ms(path)
+        except audio_analysis.AudioAnalysisError:
+            return 0
+    return duration_ms * audio_analysis.ANALYSIS_SAMPLE_RATE * 2 // 1000
+
 
 def check_ffmpeg():
     """Return True if ffmpeg is available on PATH."""
     return shutil.which("ffmpeg") is not None
 
+def print_ffmpeg_help():
+    print("Error: ffmpeg was not found on your PATH.")
+    print("Install it using one of the following (these are common methods, not exhaustive):")
+    print("  Linux:   sudo apt install ffmpeg  (or your distro's package manager equivalent)")
+    print("  macOS:   brew install ffmpeg  (or https://ffmpeg.org/download.html)")
+    print("  Windows: winget install ffmpeg  (or https://ffmpeg.org/download.html)")
+    supported = ", ".join(f"--{fmt}" for fmt in sorted(SUPPORTED_CONVERSION_FORMATS))
+    print(f"Supported conversion flags: {supported}")
+
+def check_container_format(source_path, fmt):
+    """Return True if fmt audio can go in source_path's container.
+
+    Audio-only sources accept every format; for video, prints the
+    supported formats and returns False when the combination won't work.
+    """
+    src_ext = os.path.splitext(source_path)[1].lower()
+    if src_ext not in VIDEO_EXTENSIONS:
+        return True
+    allowed = VIDEO_CONTAINER_AUDIO_COMPAT.get(src_ext, set())
+    if fmt not in allowed:
+        print(f"Error: '{fmt}' audio is not supported in {src_ext} containers.")
+        supported = ", ".join(f"--{f}" for f in sorted(allowed))
+        print(f"Supported formats for {src_ext}: {supported}")
+        return False
+    return True
+
 def convert_audio(source_path, fmt, output_dir=None):
     """Convert source_path to the given format via ffmpeg.
 
@@ -762,18 +957,14 @@ def convert_audio(source_path, fmt, output_dir=None):
     For video files: copies the video stream and transcodes only the audio,
     keeping the same container extension.
 
-    If output_dir is None the OS temp directory is used.
+    If output_dir is None the conversion output dir (or the OS temp
+    directory) is used, or --ram-scratch space; the file is then an
+    intermediate the job deletes once it's captioned.
     Appends _1, _2, … to the stem if the destination already exists.
     Returns the output path on success, or "FAILED" on error.
     """
     if not check_ffmpeg():
-        print("Error: ffmpeg was not found on your PATH.")
-        print("Install it using one of the following (these are common methods, not exhaustive):")
-        print("  Linux:   sudo apt install ffmpeg  (or your distro's package manager equivalent)")
-        print("  macOS:   brew install ffmpeg  (or https://ffmpeg.org/download.html)")
-        print("  Windows: winget install ffmpeg  (or https://ffmpeg.org/download.html)")
-        supported = ", ".join(f"--{fmt}" for fmt in sorted(SUPPORTED_CONVERSION_FORMATS))
-        print(f"Supported conversion flags: {supported}")
+        print_ffmpeg_help()
         return "FAILED"
 
     src_ext = os.path.splitext(source_path)[1].lower()
@@ -781,11 +972,7 @@ def convert_audio(source_path, fmt, output_dir=None):
 
     # For video files, validate the container+audio format combination
     if is_video:
-        allowed = VIDEO_CONTAINER_AUDIO_COMPAT.get(src_ext, set())
-        if fmt not in allowed:
-            print(f"Error: '{fmt}' audio is not supported in {src_ext} containers.")
-            supported = ", ".join(f"--{f}" for f in sorted(allowed))
-            print(f"Supported formats for {src_ext}: {supported}")
+        if not check_container_format(source_path, fmt):
             return "FAILED"
         # Video output keeps the same container extension
         out_ext = src_ext
@@ -798,7 +985,7 @@ def convert_audio(source_path, fmt, output_dir=None):
         return "FAILED"
 
     stem = os.path.splitext(os.path.basename(source_path))[0]
-    dest_dir = output_dir if output_dir else (get_conversion_output_dir() or tempfile.gettempdir())
+    dest_dir = output_dir or intermediate_dir(lambda: estimate_converted_size(source_path, fmt))
     os.makedirs(dest_dir, exist_ok=True)
 
     candidate = os.path.join(dest_dir, f"{stem}{out_ext}")
@@ -819,51 +1006,237 @@ def convert_audio(source_path, fmt, output_dir=None):
         return "FAILED"
 
     logging.info(f"Converted {source_path} -> {candidate}")
+    if not output_dir:
+        scratch.track(candidate)
     return candidate
 
+def find_empty_input(path, full_decode=False):
+    """Return why path has no audio worth captioning, or None.
 
-def ci_glob(pattern):
-    """Convert a glob pattern to a case-insensitive equivalent.
-
-    Each alphabetic character is replaced with a [aA]-style bracket expression
-    so that glob.glob matches regardless of case on case-sensitive filesystems.
-    e.g. "*.mp3" -> "*.[mM][pP][3]"  (digits pass through unchanged)
+    full_decode=True decodes the whole file into the PCM cache, for when
+    --strip-silence or --chunk-minutes will read it afterwards anyway.
+    The check is skipped (None) when ffmpeg or NumPy isn't available or the
+    file can't be decoded, leaving it to Resolve as before.
     """
-    result = []
-    for ch in pattern:
-        if ch.isalpha():
-            result.append(f"[{ch.lower()}{ch.upper()}]")
-        else:
-            result.append(ch)
-    return "".join(result)
+    if not check_ffmpeg():
+        return None
+    try:
+        return audio_analysis.detect_empty_audio(path, full_decode=full_decode)
+    except audio_analysis.AudioAnalysisError as e:
+        logging.debug(f"Skipping silence check for {path}: {e}")
+        return None
+
+def condense_for_import(import_path):
+    """Run the --strip-silence pre-pass on one file.
 
+    Writes a condensed proxy (long silences removed) to the conversion
+    output dir. Returns (path_to_import, edit_map); when there is nothing
+    worth removing or the analysis fails, that's (import_path, None) and the
+    original is captioned as usual.
+    """
+    output_dir = intermediate_dir(lambda: analysis_wav_size(import_path))
+    try:
+        proxy_path, edit_map = audio_analysis.strip_silence(import_path, output_dir)
+    except audio_analysis.AudioAnalysisError as e:
+        print(f"Warning: couldn't strip silence from {os.path.basename(import_path)}: {e}")
+        return import_path, None
+    if not proxy_path:
+        return import_path, None
+    scratch.track(proxy_path)
+    return proxy_path, edit_map
+
+
+def default_options():
+    """Return the global options used when no flags are given."""
+    options = {name: False for name in GLOBAL_FLAGS.values()}
+    options["formats"] = ("srt",)
+    options["variants"] = None
+    options["chunk_minutes"] = None
+    options["watch"] = None
+    options["manifest"] = None
+    options["deadline"] = None
+    options["hosts"] = None
+    options["shared_dir"] = None
+    options["record_cassette"] = None
+    options["ram_scratch"] = None
+    # Set by parse_args: some input is converted into the conversion output dir
+    options["converting"] = False
+    return options
+
+def parse_formats(value):
+    """Parse a --formats value like "srt,vtt,json" into a tuple of format names.
+
+    Exits with a usage message if any format is unknown.
+    """
+    formats = []
+    for name in value.lower().split(","):
+        name = name.strip().lstrip(".")
+        if not name:
+            continue
+        if name not in SUBTITLE_FORMATS:
+            supported = ", ".join(sorted(SUBTITLE_FORMATS))
+            print(f"Error: unknown subtitle format '{name}'. Supported formats: {supported}")
+            sys.exit(1)
+        if name not in formats:
+            formats.append(name)
+    if not formats:
+        print("Error: --formats needs at least one format")
+        sys.exit(1)
+    return tuple(formats)
+
+def parse_variants(value):
+    """Parse a --variants value into a list of caption variant dicts.
+
+    Variants are comma-separated; each is colon-separated fields, the first
+    of which is its label (the output suffix, as in talk.<label>.srt). Every
+    field, the label included, is read by what it looks like:
+        a number          — characters per line
+        single / double   — line mode
+        a language        — name or short code, e.g. spanish or es
+    Anything unset falls back to DEFAULT_CAPTION_SETTINGS. For example
+    "en,single,es:spanish:32" gives talk.en.srt (English, defaults),
+    talk.single.srt (single lines) and talk.es.srt (Spanish, 32 chars).
+
+    Labels may only use letters, digits, "_" and "-", since they become part
+    of file names. Exits with a usage message on an unknown field, a label
+    with anything else in it, or a duplicate label.
+    """
+    variants = []
+    for spec in value.split(","):
+        fields = [field.strip() for field in spec.split(":") if field.strip()]
+        if not fields:
+            continue
+        if not re.fullmatch(r"[\w-]+", fields[0]):
+            print(f"Error: variant label '{fields[0]}' can only use letters, digits, '_' and '-'")
+            sys.exit(1)
+        variant = dict(DEFAULT_CAPTION_SETTINGS, label=fields[0])
+        for position, field in enumerate(fields):
+            lowered = field.lower()
+            if lowered.isdigit():
+                variant["chars_per_line"] = int(lowered)
+            elif lowered in CAPTION_LINE_BREAKS:
+                variant["line_break"] = lowered
+            elif lowered in CAPTION_LANGUAGE_CODES:
+                variant["language"] = CAPTION_LANGUAGE_CODES[lowered]
+            elif lowered in CAPTION_LANGUAGES:
+                variant["language"] = lowered
+            elif position > 0:
+                print(f"Error: don't know what '{field}' means in variant '{spec}'")
+                print("Use a number (chars per line), single/double, or a language such as "
+                      f"{', '.join(sorted(CAPTION_LANGUAGE_CODES))}")
+                sys.exit(1)
+        if any(v["label"] == variant["label"] for v in variants):
+            print(f"Error: variant label '{variant['label']}' is used twice")
+            sys.exit(1)
+        variants.append(variant)
+    if not variants:
+        print("Error: --variants needs at least one variant")
+        sys.exit(1)
+    return variants
 
 def parse_args(argv):
-    """Parse argv into entries and global flags.
+    """Parse argv into jobs and global flags.
 
     Returns:
-        entries   — list of (source_path, converted_path_or_None)
-        do_concat — True if --concat was present
-        do_export — True if --export was present
+        jobs    — iterator of Job, one per input file. Wildcards and
+                  directories are expanded as it's consumed, and nothing is
+                  converted yet; prepare_import() does that per job
+        options — dict of global options, keyed by the names in GLOBAL_FLAGS
+                  (e.g. options["concat"] is True if --concat was present)
 
     Per-file syntax:
         <file> [--<fmt> [dest_dir]]
 
+    <file> may be a wildcard pattern ("**" spans directories) or a
+    directory, which means every audio/video file beneath it.
+
     Global flags (position-independent):
         --concat   import all files into one timeline
         --export   write the SRT file (override for --concat which skips export by default)
+        --import   import only, skip subtitle generation
+        --paranoid re-verify the timeline against Resolve at every step
+        --stdout   stream the SRT to stdout instead of writing files
+        --strip-silence  import a proxy with long silences cut out, then map
+                   the cues back to the original file's times
+        --no-silence-check  send silent inputs to Resolve anyway
+        --formats <list>  comma-separated subtitle formats to write (default: srt)
+        --variants <list> caption the timeline once per variant (see parse_variants)
+        --chunk-minutes <n> caption long files as chunks of at most n minutes
+        --watch <dir>  after the listed files, keep captioning new files as
+                   they finish arriving in dir, until interrupted
+        --manifest <file>  also read jobs from a CSV or JSONL file, one per
+                   row (see iter_manifest); read as the jobs are consumed
+        --in-order caption files in the order given instead of shortest first
+        --deadline <time>  defer jobs that aren't expected to finish by then
+                   (see scheduler.parse_deadline) to a manifest for the next run
+        --hosts <list>  run one pipeline per Resolve host (comma-separated
+                   names or addresses, "localhost" for this machine) sharing the jobs
+        --shared-dir <dir>  write converted media, proxies and chunks here,
+                   where every host can import them
+        --ram-scratch <size>  write intermediates to a RAM-backed folder while
+                   they fit in size bytes ("4G"), deleting each file's when it's done
     """
-    AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".aac", ".flac", ".ogg", ".opus", ".wma", ".aiff"}
     CONVERT_FLAGS = {f"--{fmt}" for fmt in SUPPORTED_CONVERSION_FORMATS}
-    GLOBAL_FLAGS = {"--concat", "--export", "--import"}
 
     # Strip global flags first so they don't interfere with per-file parsing
     argv_lower = [a.lower() for a in argv]
-    do_concat = "--concat" in argv_lower
-    do_export = "--export" in argv_lower
-    do_import_only = "--import" in argv_lower
+    options = default_options()
+    options.update({name: flag in argv_lower for flag, name in GLOBAL_FLAGS.items()})
     argv = [a for a in argv if a.lower() not in GLOBAL_FLAGS]
 
+    remaining = []
+    i = 0
+    while i < len(argv):
+        name = GLOBAL_VALUE_FLAGS.get(argv[i].lower())
+        if name:
+            if i + 1 >= len(argv) or argv[i + 1].startswith('--'):
+                print(f"Error: {argv[i]} needs a value")
+                sys.exit(1)
+            options[name] = argv[i + 1]
+            i += 2
+        else:
+            remaining.append(argv[i])
+            i += 1
+    argv = remaining
+
+    if isinstance(options["formats"], str):
+        options["formats"] = parse_formats(options["formats"])
+    if isinstance(options["variants"], str):
+        options["variants"] = parse_variants(options["variants"])
+    if isinstance(options["chunk_minutes"], str):
+        try:
+            options["chunk_minutes"] = float(options["chunk_minutes"])
+        except ValueError:
+            options["chunk_minutes"] = 0
+        if options["chunk_minutes"] <= 0:
+            print("Error: --chunk-minutes needs a positive number of minutes")
+            sys.exit(1)
+    if isinstance(options["deadline"], str):
+        try:
+            options["deadline"] = scheduler.parse_deadline(options["deadline"])
+        except ValueError as e:
+            print(f"Error: --deadline needs a time of day (18:30) or a duration (90m, 2h): {e}")
+            sys.exit(1)
+    if isinstance(options["hosts"], str):
+        options["hosts"] = [host.strip() for host in options["hosts"].split(",") if host.strip()]
+        if not options["hosts"] or len(set(options["hosts"])) != len(options["hosts"]):
+            print("Error: --hosts needs a comma-separated list of distinct Resolve hosts")
+            sys.exit(1)
+    if options["shared_dir"]:
+        os.makedirs(options["shared_dir"], exist_ok=True)
+    if isinstance(options["ram_scratch"], str):
+        try:
+            options["ram_scratch"] = scratch.parse_size(options["ram_scratch"])
+        except ValueError as e:
+            print(f"Error: --ram-scratch needs a size such as 512M or 4G: {e}")
+            sys.exit(1)
+    if options["manifest"] and not os.path.isfile(options["manifest"]):
+        print(f"Error: manifest not found: {options['manifest']}")
+        sys.exit(1)
+    if options["watch"] and not os.path.isdir(options["watch"]):
+        print(f"Error: --watch needs an existing directory, got: {options['watch']}")
+        sys.exit(1)
+
     def is_convert_flag(token):
         """Return the format string if token is a supported --<fmt> flag, else None."""
         return token[2:].lower() if token.lower() in CONVERT_FLAGS else None
@@ -885,7 +1258,7 @@ def parse_args(argv):
                 i += 1
         return fmt, output_dir, i
 
-    entries = []
+    groups = []
     i = 0
     while i < len(argv):
         token = argv[i]
@@ -898,29 +1271,262 @@ def parse_args(argv):
         # Collect a run of consecutive file tokens (no flag in between).
         # This handles shell-expanded wildcards where the shell splits
         # "*.m4a --wav" into individual filenames before Python sees them.
-        sources = []
+        tokens = []
         while i < len(argv) and not is_convert_flag(argv[i]):
-            tok = argv[i]
-            if '*' in tok or '?' in tok:
-                sources.extend(sorted(glob.glob(ci_glob(tok))))
-            else:
-                sources.append(tok)
+            tokens.append(argv[i])
             i += 1
 
         # Check for an optional conversion flag after the file group
         fmt, output_dir, i = peek_flag(argv, i)
 
-        for source in sources:
-            if fmt:
-                converted = convert_audio(source, fmt, output_dir)
-                entries.append((source, converted))
-            else:
-                entries.append((source, None))
+        groups.append((tokens, fmt, output_dir))
+
+    # Report what can be known without listing directories or running
+    # ffmpeg now, rather than partway through the batch
+    if any(fmt for _, fmt, _ in groups) and not check_ffmpeg():
+        print_ffmpeg_help()
+        sys.exit(1)
+    checked = []
+    for tokens, fmt, output_dir in groups:
+        kept = []
+        for token in tokens:
+            if not os.path.exists(token):
+                if not has_wildcard(token):
+                    print(f"File not found, skipping: {token}")
+                    continue
+            elif fmt and os.path.isfile(token) and not check_container_format(token, fmt):
+                continue
+            kept.append(token)
+        checked.append((kept, fmt, output_dir))
+
+    options["converting"] = any(fmt and not output_dir for _, fmt, output_dir in groups)
+    jobs = iter_jobs(checked)
+    if options["manifest"]:
+        jobs = itertools.chain(jobs, iter_manifest(options["manifest"]))
+    return jobs, options
+
+def iter_jobs(groups):
+    """Yield a Job for each input in groups of (tokens, fmt, output_dir).
+
+    Wildcards ("*.m4a", "talks/**/*.wav") and directories are expanded
+    lazily, case-insensitively, one directory listing at a time.
+    """
+    for tokens, fmt, output_dir in groups:
+        for token in tokens:
+            for source in iter_inputs(token, MEDIA_EXTENSIONS):
+                yield Job(source, fmt, output_dir)
+
+def read_manifest_rows(manifest_path):
+    """Yield (line_number, row dict) from a CSV or JSONL manifest, one at a time.
+
+    JSONL is used for .jsonl/.ndjson files, CSV (with a header row) for
+    anything else. Lines that aren't valid JSON objects are reported and
+    skipped.
+    """
+    with open(manifest_path, newline="", encoding="utf-8-sig") as f:
+        if os.path.splitext(manifest_path)[1].lower() in (".jsonl", ".ndjson"):
+            for line_number, line in enumerate(f, 1):
+                if not line.strip():
+                    continue
+                try:
+                    row = json.loads(line)
+                except ValueError as e:
+                    print(f"Error: {manifest_path} line {line_number}: invalid JSON ({e}), skipping")
+                    continue
+                if not isinstance(row, dict):
+                    print(f"Error: {manifest_path} line {line_number}: expected a JSON object, skipping")
+                    continue
+                yield line_number, row
+        else:
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield reader.line_num, row
+
+def manifest_caption_settings(row):
+    """Return the caption settings given in a manifest row, or raise ValueError."""
+    settings = {}
+    language = row.get("language")
+    if language:
+        language = language.lower()
+        language = CAPTION_LANGUAGE_CODES.get(language, language)
+        if language not in CAPTION_LANGUAGES:
+            raise ValueError(f"unknown language '{row['language']}'")
+        settings["language"] = language
+    for name in ("chars_per_line", "gap"):
+        if row.get(name):
+            try:
+                settings[name] = int(row[name])
+            except ValueError:
+                raise ValueError(f"{name} must be a whole number, got '{row[name]}'")
+            if settings[name] < 0:
+                raise ValueError(f"{name} can't be negative")
+    line_break = row.get("line_break")
+    if line_break:
+        if line_break.lower() not in CAPTION_LINE_BREAKS:
+            raise ValueError(f"line_break must be single or double, got '{line_break}'")
+        settings["line_break"] = line_break.lower()
+    return settings or None
+
+def iter_manifest(manifest_path):
+    """Yield a Job for each row of a --manifest file, reading it as a stream.
+
+    Each row names one source file plus, optionally: output (SRT path, or a
+    folder to put it in), convert (a conversion format such as wav) and
+    convert_dir, group (rows sharing a group, one after another, go on one
+    timeline), priority (a whole number; higher runs first) and the caption
+    settings language, chars_per_line, line_break and gap. Relative paths are taken from the manifest's
+    folder. Invalid rows are reported and skipped without stopping the
+    rest of the batch.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    warned = set()
+
+    def resolve_path(value):
+        return os.path.join(base_dir, os.path.expanduser(value)) if value else None
+
+    for line_number, raw in read_manifest_rows(manifest_path):
+        where = f"{manifest_path} line {line_number}"
+        row = {}
+        for key, value in raw.items():
+            key = str(key or "").strip().lower()
+            if key not in MANIFEST_FIELDS:
+                if key not in warned:
+                    print(f"Warning: ignoring unknown manifest column '{key}'")
+                    warned.add(key)
+                continue
+            if value is not None and str(value).strip():
+                row[key] = str(value).strip()
+
+        if "source" not in row:
+            print(f"Error: {where}: no source, skipping")
+            continue
+        source = resolve_path(row["source"])
+        fmt = row.get("convert", "").lower().lstrip("-.") or None
+        if fmt and fmt not in SUPPORTED_CONVERSION_FORMATS:
+            print(f"Error: {where}: unsupported conversion format '{row['convert']}', skipping")
+            continue
+        if fmt and not check_container_format(source, fmt):
+            continue
+        try:
+            settings = manifest_caption_settings(row)
+        except ValueError as e:
+            print(f"Error: {where}: {e}, skipping")
+            continue
+        priority = row.get("priority", "0")
+        if not priority.lstrip("+-").isdigit():
+            print(f"Error: {where}: priority must be a whole number, got '{priority}', skipping")
+            continue
+        priority = int(priority)
+        yield Job(source, fmt, resolve_path(row.get("convert_dir")), resolve_path(row.get("output")),
+                  row.get("group"), settings, priority)
+
+def iter_batches(jobs):
+    """Yield lists of jobs to caption together.
+
+    Consecutive jobs with the same group form one batch (one timeline);
+    every other job is a batch of its own.
+    """
+    batch = []
+    for job in jobs:
+        if batch and (job.group is None or job.group != batch[0].group):
+            yield batch
+            batch = []
+        batch.append(job)
+    if batch:
+        yield batch
+
+def job_manifest_row(job):
+    """Return job as a --manifest row, with absolute paths."""
+    row = {
+        "source": os.path.abspath(job.source),
+        "output": os.path.abspath(job.output) if job.output else "",
+        "convert": job.convert_format or "",
+        "convert_dir": os.path.abspath(job.convert_dir) if job.convert_dir else "",
+        "group": job.group or "",
+        "priority": job.priority or "",
+    }
+    for name in DEFAULT_CAPTION_SETTINGS:
+        row[name] = (job.caption_settings or {}).get(name, "")
+    return row
+
+class DeferredManifest:
+    """A CSV manifest of the jobs --deadline put off, for the next run's --manifest.
+
+    The file is only created once something is deferred, and each row is
+    written as it's deferred so nothing is lost if the run is interrupted.
+    """
 
-    return entries, do_concat, do_export, do_import_only
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self.file = None
+        self.writer = None
+
+    def add(self, batch):
+        if not self.file:
+            self.file = open(self.path, "w", newline="", encoding="utf-8")
+            self.writer = csv.DictWriter(self.file, fieldnames=MANIFEST_FIELDS)
+            self.writer.writeheader()
+        for job in batch:
+            self.writer.writerow(job_manifest_row(job))
+        self.file.flush()
+        self.count += len(batch)
+
+    def close(self):
+        if self.file:
+            self.file.close()
+
+# (source bytes, seconds) of each conversion a thread has run since
+# run_batch last collected them, for the throughput model.
+CONVERSION_TIMES = threading.local()
+
+def take_conversion_times():
+    """Return and forget this thread's conversion timings."""
+    samples = getattr(CONVERSION_TIMES, "samples", [])
+    CONVERSION_TIMES.samples = []
+    return samples
+
+def source_problem(path):
+    """Return why path can't be captioned ("File not found", "Can't read file"), or None if it can."""
+    if not os.path.exists(path):
+        return "File not found"
+    if not os.access(path, os.R_OK):
+        return "Can't read file"
+    return None
+
+def prepare_import(job):
+    """Return the path to import for job, converting it first if it asked for that.
+
+    Returns None (after printing why) if the source is missing or the
+    conversion fails.
+    """
+    problem = source_problem(job.source)
+    if problem:
+        print(f"{problem}, skipping: {job.source}")
+        return None
+    if not job.convert_format:
+        return job.source
+    started = time.monotonic()
+    converted = convert_audio(job.source, job.convert_format, job.convert_dir)
+    if converted == "FAILED":
+        return None
+    if not hasattr(CONVERSION_TIMES, "samples"):
+        CONVERSION_TIMES.samples = []
+    CONVERSION_TIMES.samples.append((scheduler.file_size(job.source), time.monotonic() - started))
+    return converted
 
 def get_audio_duration(audio_file):
-    """Get the duration of an audio file in seconds."""
+    """Get the duration of an audio file in seconds.
+
+    Read from the shared PCM cache when ffmpeg and NumPy are available, so a
+    later silence or chunk analysis of the same file doesn't decode it again;
+    otherwise pydub loads the file.
+    """
+    if check_ffmpeg():
+        try:
+            return audio_analysis.pcm_duration_ms(audio_file) / 1000.0
+        except audio_analysis.AudioAnalysisError as e:
+            logging.debug(f"Falling back to pydub for duration of {audio_file}: {e}")
     try:
         audio = AudioSegment.from_file(audio_file)
         return len(audio) / 1000.0  # Convert milliseconds to seconds
@@ -1002,13 +1608,22 @@ def create_project(resolve, project_name):
     time.sleep(2)
     return project
 
-def setup_timeline_tracks(timeline):
-    """Set up timeline tracks for audio and subtitles."""
+def setup_timeline_tracks(timeline, state=None):
+    """Set up timeline tracks for audio and subtitles.
+
+    With a TimelineState the track counts come from the snapshot, and any
+    track we add invalidates the matching count.
+    """
     logging.info("Setting up timeline tracks...")
-    
+
+    def track_count(track_type):
+        if state is None:
+            return timeline.GetTrackCount(track_type)
+        return state.get(f"{track_type}_tracks")
+
     try:
         # Check current track count
-        audio_tracks = timeline.GetTrackCount("audio")
+        audio_tracks = track_count("audio")
         logging.info(f"Current audio track count: {audio_tracks}")
         
         # Add audio track if none exist
@@ -1017,17 +1632,19 @@ def setup_timeline_tracks(timeline):
             if not timeline.AddTrack("audio"):
                 logging.error("Failed to add audio track")
                 return False
+            if state is not None:
+                state.invalidate("audio_tracks")
             time.sleep(1)  # Wait for track creation
             
             # Verify audio track was created
-            audio_tracks = timeline.GetTrackCount("audio")
+            audio_tracks = track_count("audio")
             logging.info(f"Audio track count after creation: {audio_tracks}")
             if audio_tracks < 1:
                 logging.error("No audio tracks found after creation")
                 return False
         
         # Check subtitle tracks
-        subtitle_tracks = timeline.GetTrackCount("subtitle")
+        subtitle_tracks = track_count("subtitle")
         logging.info(f"Current subtitle track count: {subtitle_tracks}")
         
         # Add subtitle track if none exist
@@ -1036,10 +1653,12 @@ def setup_timeline_tracks(timeline):
             if not timeline.AddTrack("subtitle"):
                 logging.error("Failed to add subtitle track")
                 return False
+            if state is not None:
+                state.invalidate("subtitle_tracks")
             time.sleep(1)  # Wait for track creation
             
             # Verify subtitle track was created
-            subtitle_tracks = timeline.GetTrackCount("subtitle")
+            subtitle_tracks = track_count("subtitle")
             logging.info(f"Subtitle track count after creation: {subtitle_tracks}")
             if subtitle_tracks < 1:
                 logging.error("No subtitle tracks found after creation")
@@ -1127,33 +1746,14 @@ def add_media_to_timeline(timeline, media_item):
         logging.error(f"Error in add_media_to_timeline: {str(e)}")
         return False
 
-def import_media_with_timeout(media_pool, file_path, timeout=30):
-    """Import media with a timeout."""
-    import threading
-    import queue
+def import_media_with_timeout(media_pool, file_path, timeout=None):
+    """Import media, giving up after timeout seconds (default: the ImportMedia deadline).
 
-    result_queue = queue.Queue()
-    
-    def import_worker():
-        try:
-            media_items = media_pool.ImportMedia([file_path])
-            result_queue.put(("success", media_items))
-        except Exception as e:
-            result_queue.put(("error", str(e)))
-    
-    thread = threading.Thread(target=import_worker)
-    thread.daemon = True
-    thread.start()
-    
-    try:
-        status, result = result_queue.get(timeout=timeout)
-        if status == "error":
-            raise Exception(f"Import failed: {result}")
-        return result
-    except queue.Empty:
-        raise Exception(f"Import timed out after {timeout} seconds")
-    finally:
-        thread = None
+    Raises resolve_calls.ResolveCallTimeout if Resolve doesn't answer in time.
+    """
+    items = resolve_calls.call(resolve_calls.unwrap(media_pool).ImportMedia, [file_path],
+                               timeout=timeout, label="ImportMedia")
+    return resolve_calls.wrap(items)
 
 def verify_media_import(media_pool, media_items, file_path):
     """Verify that media was imported correctly."""
@@ -1216,7 +1816,7 @@ def import_audio_file(media_pool, root_folder, audio_file):
         logging.info(f"Attempting to import from path: {abs_audio_path}")
         
         # Import the media
-        media_items = media_pool.ImportMedia([abs_audio_path])
+        media_items = import_media_with_timeout(media_pool, abs_audio_path)
         if not media_items:
             logging.error("Failed to import media")
             return False
@@ -1308,11 +1908,14 @@ def get_current_timeline(resolve):
         logging.error(f"Error getting current timeline: {str(e)}")
         return None
 
-def get_subtitle_items(timeline):
+def get_subtitle_items(timeline, state=None):
     """Get subtitle items from the timeline."""
     try:
         # Get subtitle track
-        subtitle_track_count = timeline.GetTrackCount("subtitle")
+        if state is None:
+            subtitle_track_count = timeline.GetTrackCount("subtitle")
+        else:
+            subtitle_track_count = state.get("subtitle_tracks")
         if subtitle_track_count < 1:
             logging.error("No subtitle tracks found")
             return None
@@ -1326,14 +1929,17 @@ def get_subtitle_items(timeline):
         logging.info(f"Found {len(items)} items in subtitle track")
         
         # Get timeline start frame to offset subtitles to start at 00:00:00,000
-        timeline_start_frame = timeline.GetStartFrame()
+        timeline_start_frame = timeline.GetStartFrame() if state is None else state.get("start_frame")
         logging.info(f"Timeline start frame: {timeline_start_frame}")
         
-        # Extract text and timing from items
+        # Extract text and timing from items. Per-item logging is DEBUG only:
+        # on long timelines the repr and log I/O cost more than the walk itself.
+        debug = logging.getLogger().isEnabledFor(logging.DEBUG)
         subtitle_items = []
         for i, item in enumerate(items):
             text = item.GetName()
-            logging.info(f"Raw text from Resolve (item {i}): {repr(text)}")  # Use repr to show special characters
+            if debug:
+                logging.debug(f"Raw text from Resolve (item {i}): {repr(text)}")  # Use repr to show special characters
             start = item.GetStart()
             end = item.GetEnd()
             
@@ -1347,93 +1953,248 @@ def get_subtitle_items(timeline):
                 'end': end_offset,
                 'index': i + 1
             })
-            logging.info(f"Found text in item {i}: {text}")
+            if debug:
+                logging.debug(f"Found text in item {i}: {text}")
             
         return subtitle_items
     except Exception as e:
         logging.error(f"Error getting subtitle items: {str(e)}")
         return None
 
+def export_subtitle_items(timeline, fps, state=None):
+    """Bulk-extract subtitle items through Resolve's native SRT export.
+
+    One ExportSubtitles call replaces three API calls per item. The exported
+    file is parsed back into the same item dicts get_subtitle_items returns
+    (frames relative to the timeline start, lines joined with U+2028).
+    Returns None when the export is unavailable or produced nothing, so the
+    caller can fall back to the per-item walk.
+    """
+    global NATIVE_SUBTITLE_EXPORT
+    if NATIVE_SUBTITLE_EXPORT is False:
+        return None
+
+    fd, export_path = tempfile.mkstemp(suffix=".srt")
+    os.close(fd)
+    try:
+        try:
+            exported = timeline.ExportSubtitles(export_path, "srt")
+        except Exception as e:
+            # Not part of this Resolve's scripting API; don't try again this run
+            logging.info(f"Native subtitle export unavailable: {str(e)}")
+            NATIVE_SUBTITLE_EXPORT = False
+            return None
+
+        if not exported or os.path.getsize(export_path) == 0:
+            logging.info("Native subtitle export returned nothing")
+            return None
+
+        with open(export_path, 'r', encoding='utf-8-sig') as f:
+            cues = parse_srt(f.read())
+    finally:
+        try:
+            os.unlink(export_path)
+        except OSError:
+            pass
+
+    if not cues:
+        return None
+
+    timeline_start_frame = timeline.GetStartFrame() if state is None else state.get("start_frame")
+    frames = [(ms_to_frames(start_ms, fps), ms_to_frames(end_ms, fps)) for start_ms, end_ms, _ in cues]
+
+    # The export may be stamped with timeline timecode (e.g. starting at
+    # 01:00:00:00); shift it so subtitles start at 00:00:00,000 like the walk
+    offset = native_export_offset(timeline, frames[0][0], timeline_start_frame)
+    if offset is None:
+        return None
+
+    subtitle_items = []
+    for i, ((start, end), (_, _, lines)) in enumerate(zip(frames, cues)):
+        subtitle_items.append({
+            'text': '\u2028'.join(lines),
+            'start': start - offset,
+            'end': end - offset,
+            'index': i + 1
+        })
+
+    logging.info(f"Extracted {len(subtitle_items)} subtitle items via native export")
+    return subtitle_items
+
+def native_export_offset(timeline, first_frame, timeline_start_frame):
+    """Return the frames to subtract from native export times, or None if that can't be told.
+
+    Whether Resolve's export is stamped with timeline timecode doesn't
+    depend on the cues, so it's probed once per host: the first exported
+    cue (first_frame) is compared with the first subtitle item's own start,
+    which is in timeline frames. None (not remembered) sends the caller to
+    the per-item walk.
+    """
+    if not timeline_start_frame:
+        return 0
+    host = resolve_calls.current_host()
+    if host not in NATIVE_EXPORT_STAMPED:
+        try:
+            items = timeline.GetItemListInTrack("subtitle", 1)
+            item_start = items[0].GetStart() if items else None
+        except Exception as e:
+            logging.info(f"Couldn't probe the native export's timecode: {str(e)}")
+            return None
+        if item_start is None:
+            return None
+        # Exported times are rounded to the millisecond, so allow a frame either way
+        stamped = abs(first_frame - item_start) <= 1
+        if not stamped and abs(first_frame - (item_start - timeline_start_frame)) > 1:
+            logging.info("Native export times match neither timeline nor zero-based frames")
+            return None
+        NATIVE_EXPORT_STAMPED[host] = stamped
+        logging.info(f"Native export uses {'timeline' if stamped else 'zero-based'} timecode")
+    return timeline_start_frame if NATIVE_EXPORT_STAMPED[host] else 0
+
+def extract_subtitle_items(timeline, fps, state=None, native=True):
+    """Get subtitle items, preferring the bulk native export over the per-item walk."""
+    if native:
+        subtitle_items = export_subtitle_items(timeline, fps, state)
+        if subtitle_items:
+            return subtitle_items
+        logging.info("Falling back to per-item subtitle extraction")
+    return get_subtitle_items(timeline, state)
+
 def get_timeline_framerate(timeline):
-    """Get the framerate of the timeline."""
+    """Get the framerate of the timeline as an exact Fraction (23.976 -> 24000/1001)."""
     try:
         settings = timeline.GetSetting()
         if settings and 'timelineFrameRate' in settings:
-            fps = float(settings['timelineFrameRate'])
-            logging.info(f"Timeline framerate: {fps}")
+            fps = parse_framerate(str(settings['timelineFrameRate']))
+            logging.info(f"Timeline framerate: {float(fps):.3f} ({fps})")
             return fps
         else:
             logging.warning("Could not get timeline framerate from settings, defaulting to 24 fps")
-            return 24.0
+            return parse_framerate(24)
     except Exception as e:
         logging.error(f"Error getting timeline framerate: {str(e)}, defaulting to 24 fps")
-        return 24.0
+        return parse_framerate(24)
 
 def format_timecode(frames, fps):
     """Convert frames to SRT timecode format using the specified FPS."""
-    total_seconds = frames / fps  # Convert frames to seconds
-    hours = int(total_seconds // 3600)
-    minutes = int((total_seconds % 3600) // 60)
-    seconds = int(total_seconds % 60)
-    milliseconds = int((total_seconds * 1000) % 1000)
-    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{milliseconds:03d}"
+    return format_srt_timecode(frames_to_ms(frames, fps))
+
+def iter_cues(subtitle_items, fps):
+    """Yield a Cue per subtitle item, converting all frames in one pass."""
+    starts = frames_to_ms_array([item['start'] for item in subtitle_items], fps)
+    ends = frames_to_ms_array([item['end'] for item in subtitle_items], fps)
+    for item, start_ms, end_ms in zip(subtitle_items, starts, ends):
+        yield Cue(int(start_ms), int(end_ms), item['text'])
 
 def write_srt_file(srt_path, subtitle_items, fps):
-    """Write subtitle items to an SRT file using the specified FPS."""
+    """Write subtitle items to an SRT file using the specified FPS.
+
+    The file is written to a temp file and renamed into place, so a crash
+    never leaves a truncated SRT behind. srt_path "-" streams to stdout.
+    """
     try:
-        with open(srt_path, 'w', encoding='utf-8') as f:
-            for i, item in enumerate(subtitle_items, 1):
-                text = item['text']
-                # Split on Resolve's line separator character (U+2028)
-                lines = text.split('\u2028')
-                # Format with line break and bold tags
-                formatted_text = f"<b>{lines[0]}\n{lines[1]}</b>" if len(lines) > 1 else f"<b>{text}</b>"
-                
-                # Write the subtitle entry
-                f.write(f"{i}\n")
-                f.write(f"{format_timecode(item['start'], fps)} --> {format_timecode(item['end'], fps)}\n")
-                f.write(formatted_text + "\n\n")
-        
-        logging.info(f"Successfully wrote SRT file to {srt_path}")
+        write_srt(srt_path, iter_cues(subtitle_items, fps))
+        logging.info(f"Successfully wrote SRT file to {'stdout' if srt_path == STDOUT_PATH else srt_path}")
         return True
     except Exception as e:
         logging.error(f"Error writing SRT file: {str(e)}")
         return False
 
-def create_subtitles_from_audio(timeline):
-    """Create subtitles from audio in the timeline."""
+def subtitle_output_path(srt_output_path, fmt, label=None):
+    """Return where a given format is written: the SRT path with its extension
+    swapped, and ".<label>" inserted before it for caption variants."""
+    if srt_output_path == STDOUT_PATH:
+        return STDOUT_PATH
+    extension, _ = SUBTITLE_FORMATS[fmt]
+    suffix = f".{label}" if label else ""
+    return os.path.splitext(srt_output_path)[0] + suffix + extension
+
+def write_subtitle_files(srt_output_path, subtitle_items, fps, formats=("srt",), label=None, edit_map=None):
+    """Fan one set of extracted subtitle items out to every requested format.
+
+    Frames are converted to cues once and shared by all writers. Each file
+    is written atomically next to srt_output_path with its own extension.
+    With an edit_map (from --strip-silence) the cues are moved from the
+    condensed proxy's times back to the original file's first.
+    """
+    try:
+        cues = list(iter_cues(subtitle_items, fps))
+    except Exception as e:
+        logging.error(f"Error converting subtitle items: {str(e)}")
+        return False
+    if edit_map is not None:
+        cues = edit_map.remap_cues(cues)
+    return write_cue_files(srt_output_path, cues, formats, label)
+
+def write_cue_files(srt_output_path, cues, formats=("srt",), label=None):
+    """Write a list of Cues in every requested format next to srt_output_path."""
+    try:
+        for fmt in formats:
+            path = subtitle_output_path(srt_output_path, fmt, label)
+            write_subtitles(path, cues, fmt)
+            logging.info(f"Successfully wrote {fmt.upper()} file to {'stdout' if path == STDOUT_PATH else path}")
+        return True
+    except Exception as e:
+        logging.error(f"Error writing subtitle files: {str(e)}")
+        return False
+
+def create_subtitles_from_audio(timeline, resolve=None, state=None, caption_settings=None):
+    """Create subtitles from audio in the timeline.
+
+    resolve          — an already connected Resolve object to reuse; a fresh
+                       one is fetched when omitted
+    state            — TimelineState to invalidate once subtitles have been created
+    caption_settings — dict overriding DEFAULT_CAPTION_SETTINGS (language,
+                       chars_per_line, line_break, gap), e.g. from --variants
+    """
     try:
         # Ensure we're on the Edit page
-        if not ensure_edit_page(get_resolve()):
+        if resolve is None:
+            if not ensure_edit_page(get_resolve()):
+                return False
+
+            # Get Resolve instance for constants
+            resolve = get_resolve()
+        elif not ensure_edit_page(resolve):
             return False
-            
-        # Get Resolve instance for constants
-        resolve = get_resolve()
         
+        caption = dict(DEFAULT_CAPTION_SETTINGS, **(caption_settings or {}))
+        language = getattr(resolve, f"AUTO_CAPTION_{caption['language'].upper()}", None)
+        if language is None:
+            logging.error(f"Resolve has no auto-caption language '{caption['language']}'")
+            return False
+        line_break = (resolve.AUTO_CAPTION_LINE_SINGLE if caption["line_break"] == "single"
+                      else resolve.AUTO_CAPTION_LINE_DOUBLE)
+
         # Set up auto caption settings with proper Resolve constants
         settings = {
-            resolve.SUBTITLE_LANGUAGE: resolve.AUTO_CAPTION_ENGLISH,
+            resolve.SUBTITLE_LANGUAGE: language,
             resolve.SUBTITLE_CAPTION_PRESET: resolve.AUTO_CAPTION_SUBTITLE_DEFAULT,
-            resolve.SUBTITLE_CHARS_PER_LINE: 42,
-            resolve.SUBTITLE_LINE_BREAK: resolve.AUTO_CAPTION_LINE_DOUBLE,
-            resolve.SUBTITLE_GAP: 0
+            resolve.SUBTITLE_CHARS_PER_LINE: caption["chars_per_line"],
+            resolve.SUBTITLE_LINE_BREAK: line_break,
+            resolve.SUBTITLE_GAP: caption["gap"]
         }
             
         # Create subtitles with specified settings
         if not timeline.CreateSubtitlesFromAudio(settings):
             logging.error("Failed to create subtitles from audio")
             return False
-            
+
+        # Subtitle generation adds a subtitle track when none exists
+        if state is not None:
+            state.invalidate("subtitle_tracks")
+
         logging.info("Successfully initiated subtitle creation")
         return True
     except Exception as e:
         logging.error(f"Error creating subtitles from audio: {str(e)}")
         return False
 
-def get_current_project():
-    """Get the current project in Resolve."""
+def get_current_project(resolve=None):
+    """Get the current project in Resolve, reusing resolve when given."""
     try:
-        resolve = get_resolve()
+        if resolve is None:
+            resolve = get_resolve()
         if not resolve:
             logging.error("Failed to get Resolve object")
             return None
@@ -1454,11 +2215,71 @@ def get_current_project():
         logging.error(f"Error getting current project: {str(e)}")
         return None
 
-def build_timeline(project, media_pool, import_paths, timeline_name):
+class TimelineState:
+    """Snapshot of the timeline facts the pipeline keeps re-checking.
+
+    Each fact is queried from Resolve the first time it is needed and served
+    from the cache afterwards. Only our own mutations (adding tracks,
+    generating subtitles) invalidate the facts they touch, so a verification
+    step that follows another costs no round trips. Pass --paranoid to skip
+    the snapshot and re-query everything at every step instead.
+    """
+
+    def __init__(self, project=None, timeline=None):
+        self.project = project
+        self.timeline = timeline
+        self._facts = {}
+
+    def bind(self, project, timeline):
+        """Point the snapshot at a (new) timeline and drop all cached facts."""
+        self.project = project
+        self.timeline = timeline
+        self._facts.clear()
+
+    def fetch(self, key):
+        """Query a single fact from Resolve, bypassing the cache."""
+        timeline = self.timeline
+        if key == "current_name":
+            current = self.project.GetCurrentTimeline()
+            return current.GetName() if current else None
+        if key == "name":
+            return timeline.GetName()
+        if key == "audio_tracks":
+            return timeline.GetTrackCount("audio")
+        if key == "subtitle_tracks":
+            return timeline.GetTrackCount("subtitle")
+        if key == "audio_items":
+            return len(timeline.GetItemListInTrack("audio", 1) or [])
+        if key == "start_frame":
+            return timeline.GetStartFrame()
+        raise KeyError(f"Unknown timeline fact: {key}")
+
+    def get(self, key):
+        """Return a cached fact, querying Resolve only on a cache miss."""
+        if key not in self._facts:
+            self._facts[key] = self.fetch(key)
+        return self._facts[key]
+
+    def remember(self, key, value):
+        """Record a fact we already know without asking Resolve."""
+        self._facts[key] = value
+
+    def invalidate(self, *keys):
+        """Forget the given facts, or every fact when called without keys."""
+        if not keys:
+            self._facts.clear()
+        for key in keys:
+            self._facts.pop(key, None)
+
+def build_timeline(project, media_pool, import_paths, timeline_name, state=None):
     """Import all files and create a timeline with all clips in order.
 
     Works for both single-file and concat cases — a single file is just a
     list of one.
+
+    When a TimelineState is given it is bound to the new timeline and the
+    post-creation checks are answered through it, and the media pool scan in
+    verify_media_import is skipped in favour of ImportMedia's own result.
     """
     try:
         root_folder = media_pool.GetRootFolder()
@@ -1470,11 +2291,11 @@ def build_timeline(project, media_pool, import_paths, timeline_name):
         for path in import_paths:
             abs_path = os.path.abspath(os.path.normpath(path))
             logging.info(f"Importing: {abs_path}")
-            items = media_pool.ImportMedia([abs_path])
+            items = import_media_with_timeout(media_pool, abs_path)
             if not items:
                 logging.error(f"Failed to import {abs_path}")
                 return None
-            if not verify_media_import(media_pool, items, abs_path):
+            if state is None and not verify_media_import(media_pool, items, abs_path):
                 logging.error(f"Media import verification failed for {abs_path}")
                 return None
             media_items.append(items[0])
@@ -1488,6 +2309,20 @@ def build_timeline(project, media_pool, import_paths, timeline_name):
         project.SetCurrentTimeline(timeline)
         time.sleep(2)
 
+        if state is not None:
+            state.bind(project, timeline)
+            if state.get("current_name") != timeline_name:
+                logging.error("Failed to set timeline as current")
+                return None
+            state.remember("name", timeline_name)
+
+            if not state.get("audio_items"):
+                logging.error("No media found in timeline after creation")
+                return None
+
+            logging.info("Successfully created timeline")
+            return timeline
+
         current_timeline = project.GetCurrentTimeline()
         if not current_timeline or current_timeline.GetName() != timeline_name:
             logging.error("Failed to set timeline as current")
@@ -1505,7 +2340,8 @@ def build_timeline(project, media_pool, import_paths, timeline_name):
         return None
 
 
-def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, do_import_only=False):
+def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, do_import_only=False,
+                 paranoid=False, formats=("srt",), variants=None, edit_map=None):
     """Core pipeline: import files, build timeline, optionally generate subtitles and export SRT.
 
     import_paths    — list of file paths to import (one for normal, many for concat)
@@ -1513,6 +2349,16 @@ def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, d
     srt_output_path — where to write the SRT file (used only when do_export=True)
     do_export       — write the SRT file when True; skip when False (concat default)
     do_import_only  — stop after importing into timeline, skip subtitle generation entirely
+    paranoid        — re-query Resolve at every verification step instead of
+                      answering from a TimelineState snapshot
+    formats         — subtitle formats to write from the one extraction; each
+                      goes next to srt_output_path with its own extension
+    variants        — list of caption variant dicts (see parse_variants); each
+                      is captioned in turn on the same timeline and written
+                      with its label as a suffix (talk.en.srt). None captions
+                      once with DEFAULT_CAPTION_SETTINGS and no suffix.
+    edit_map        — audio_analysis.EditMap when import_paths is a condensed
+                      proxy; cues are remapped to the original before writing
     """
     try:
         logging.info(f"Starting {'import' if do_import_only else 'SRT generation'} for: {import_paths}")
@@ -1524,7 +2370,7 @@ def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, d
             logging.error("Failed to get Resolve object")
             return False
 
-        project = get_current_project()
+        project = get_current_project() if paranoid else get_current_project(resolve)
         if not project:
             logging.error("No project is open. Please open a project first.")
             return False
@@ -1534,12 +2380,13 @@ def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, d
             logging.error("Failed to get media pool")
             return False
 
-        timeline = build_timeline(project, media_pool, import_paths, timeline_name)
+        state = None if paranoid else TimelineState()
+        timeline = build_timeline(project, media_pool, import_paths, timeline_name, state=state)
         if not timeline:
             logging.error("Failed to build timeline")
             return False
 
-        if not verify_project_state(project, timeline):
+        if not verify_project_state(project, timeline, state):
             logging.error("Project state verification failed")
             return False
 
@@ -1547,44 +2394,56 @@ def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, d
             logging.info("Import complete (subtitle generation skipped)")
             return True
 
-        if not clear_subtitle_tracks(timeline):
-            logging.error("Failed to clear subtitle tracks")
-            return False
-
-        if not setup_timeline_tracks(timeline):
+        if not setup_timeline_tracks(timeline, state):
             logging.error("Failed to setup timeline tracks")
             return False
 
-        if not create_subtitles_from_audio(timeline):
-            logging.error("Failed to generate subtitles")
-            return False
+        # Import and timeline setup are paid once; each variant only clears the
+        # subtitle tracks and re-runs captioning on the same timeline
+        fps = None
+        subtitle_resolve = None if paranoid else resolve
+        for variant in variants or [None]:
+            label = variant["label"] if variant else None
+            if label:
+                logging.info(f"Captioning variant '{label}'")
+
+            if not clear_subtitle_tracks(timeline, state):
+                logging.error("Failed to clear subtitle tracks")
+                return False
 
-        if not wait_for_subtitles(timeline):
-            logging.error("Timed out waiting for subtitles")
-            return False
+            if not create_subtitles_from_audio(timeline, resolve=subtitle_resolve, state=state,
+                                               caption_settings=variant):
+                logging.error("Failed to generate subtitles")
+                return False
 
-        if not verify_timeline(timeline):
-            logging.error("Timeline no longer valid after subtitle generation")
-            return False
+            if not wait_for_subtitles(timeline):
+                logging.error("Timed out waiting for subtitles")
+                return False
 
-        if not do_export:
-            logging.info("Subtitles generated in Resolve (export skipped)")
-            return True
+            if not verify_timeline(timeline, state):
+                logging.error("Timeline no longer valid after subtitle generation")
+                return False
 
-        subtitle_items = get_subtitle_items(timeline)
-        if not subtitle_items:
-            logging.error("Failed to get subtitle items")
-            return False
+            if not do_export:
+                logging.info("Subtitles generated in Resolve (export skipped)")
+                continue
 
-        fps = get_timeline_framerate(timeline)
-        logging.info(f"Using framerate: {fps} fps")
+            if fps is None:
+                fps = get_timeline_framerate(timeline)
+                logging.info(f"Using framerate: {fps} fps")
 
-        logging.info(f"Writing SRT to: {srt_output_path}")
-        if not write_srt_file(srt_output_path, subtitle_items, fps):
-            logging.error("Failed to write SRT file")
-            return False
+            subtitle_items = extract_subtitle_items(timeline, fps, state)
+            if not subtitle_items:
+                logging.error("Failed to get subtitle items")
+                return False
+
+            logging.info(f"Writing {', '.join(formats)} next to: {srt_output_path}")
+            if not write_subtitle_files(srt_output_path, subtitle_items, fps, formats, label, edit_map):
+                logging.error("Failed to write subtitle files")
+                return False
+
+            logging.info(f"Successfully wrote subtitle files for {srt_output_path}")
 
-        logging.info(f"Successfully wrote SRT file to {srt_output_path}")
         return True
 
     except Exception as e:
@@ -1592,7 +2451,8 @@ def generate_srt(import_paths, timeline_name, srt_output_path, do_export=True, d
         return False
 
 
-def generate_srt_for_file(audio_file, srt_output_path=None):
+def generate_srt_for_file(audio_file, srt_output_path=None, paranoid=False, formats=("srt",), variants=None,
+                          edit_map=None):
     """Thin wrapper around generate_srt for single-file callers."""
     output_path = srt_output_path if srt_output_path else os.path.splitext(audio_file)[0] + ".srt"
     return generate_srt(
@@ -1600,10 +2460,145 @@ def generate_srt_for_file(audio_file, srt_output_path=None):
         timeline_name=os.path.basename(audio_file),
         srt_output_path=output_path,
         do_export=True,
+        paranoid=paranoid,
+        formats=formats,
+        variants=variants,
+        edit_map=edit_map,
     )
 
-def verify_project_state(project, timeline):
-    """Verify that the project and timeline are in a valid state."""
+def caption_clip(clip_path, description, paranoid=False, variants=None, retries=CHUNK_RETRIES,
+                 silence_check=True):
+    """Caption one short clip on its own timeline, with up to `retries` retries.
+
+    Returns {label: cues} with one entry per variant (the label is None
+    without variants), empty when the clip has nothing to caption, or None
+    if every attempt failed. description ("chunk 2/5") is used in the log.
+    silence_check=False (--no-silence-check) sends quiet clips to Resolve too.
+    """
+    labels = [variant["label"] for variant in variants] if variants else [None]
+    empty_reason = find_empty_input(clip_path) if silence_check else None
+    if empty_reason:
+        logging.info(f"{description.capitalize()} has nothing to caption ({empty_reason})")
+        return {label: [] for label in labels}
+    clip_srt = os.path.splitext(clip_path)[0] + ".srt"
+    for attempt in range(retries + 1):
+        logging.info(f"Captioning {description}" + (f" (retry {attempt})" if attempt else ""))
+        # Resolve won't reuse a timeline name, so retries get their own
+        timeline_name = os.path.basename(clip_path) + (f" (retry {attempt})" if attempt else "")
+        if generate_srt([clip_path], timeline_name, clip_srt, paranoid=paranoid, formats=("json",),
+                        variants=variants):
+            return {label: read_cues(subtitle_output_path(clip_srt, "json", label)) for label in labels}
+        logging.warning(f"{description.capitalize()} failed")
+    logging.error(f"Giving up on {description} after {retries + 1} attempts")
+    return None
+
+def scratch_folder(audio_file, suffix, estimate_bytes):
+    """Return a new folder named <stem>_<suffix> for about estimate_bytes() of clips (see intermediate_dir)."""
+    stem = os.path.splitext(os.path.basename(audio_file))[0]
+    base_dir = intermediate_dir(estimate_bytes)
+    folder = os.path.join(base_dir, f"{stem}_{suffix}")
+    counter = 1
+    while os.path.exists(folder):
+        folder = os.path.join(base_dir, f"{stem}_{suffix}_{counter}")
+        counter += 1
+    return folder
+
+def generate_srt_chunked(audio_file, srt_output_path, chunk_minutes, paranoid=False, formats=("srt",),
+                         variants=None, edit_map=None, retries=CHUNK_RETRIES, silence_check=True):
+    """Caption a long recording as a series of shorter jobs and stitch the results.
+
+    The audio is cut at low-energy points into chunks of at most
+    chunk_minutes (see audio_analysis.split_for_chunking), each captioned on
+    its own timeline with up to `retries` retries, so a hiccup costs one
+    chunk rather than the whole recording. Per-chunk cues are kept as JSON
+    next to the chunk audio, then shifted to the original's time, stitched
+    with the seams de-duplicated, and written to every requested format.
+    Recordings no longer than one chunk go through generate_srt_for_file.
+    Chunks with nothing to caption are skipped unless silence_check is False.
+    """
+    chunk_dir = scratch_folder(audio_file, "chunks", lambda: analysis_wav_size(audio_file))
+    try:
+        chunks = audio_analysis.split_for_chunking(audio_file, chunk_dir, int(chunk_minutes * 60000))
+    except audio_analysis.AudioAnalysisError as e:
+        logging.error(f"Failed to split {audio_file} into chunks: {e}")
+        return False
+    finally:
+        scratch.track(chunk_dir)
+    if not chunks:
+        logging.info(f"{os.path.basename(audio_file)} fits in one chunk; captioning it whole")
+        return generate_srt_for_file(audio_file, srt_output_path, paranoid=paranoid, formats=formats,
+                                     variants=variants, edit_map=edit_map)
+
+    labels = [variant["label"] for variant in variants] if variants else [None]
+    parts = {label: [] for label in labels}
+    for index, (chunk_path, offset_ms, keep_from_ms, keep_to_ms) in enumerate(chunks, 1):
+        captions = caption_clip(chunk_path, f"chunk {index}/{len(chunks)}", paranoid=paranoid,
+                                variants=variants, retries=retries, silence_check=silence_check)
+        if captions is None:
+            return False
+        for label in labels:
+            parts[label].append((offset_ms, keep_from_ms, keep_to_ms, captions[label]))
+
+    for label in labels:
+        cues = stitch_cues(parts[label])
+        if edit_map is not None:
+            cues = edit_map.remap_cues(cues)
+        logging.info(f"Stitched {len(cues)} subtitles from {len(chunks)} chunks")
+        if not write_cue_files(srt_output_path, cues, formats, label):
+            return False
+    return True
+
+def generate_srt_delta(audio_file, srt_output_path, kept, changed, old_cues, paranoid=False, formats=("srt",),
+                       variants=None, silence_check=True):
+    """Caption only the changed spans of an edited recording (--delta).
+
+    kept and changed come from fingerprint.delta_plan(); old_cues maps each
+    variant label to the cues of the version captioned before. Each changed
+    span is cut out as a 16 kHz mono WAV in a <name>_delta scratch_folder
+    and captioned like a chunk (quiet ones are skipped unless silence_check
+    is False). The kept spans take the old cues that lie wholly inside
+    them, moved to their new time. The two are then stitched in order and
+    written to every requested format.
+    """
+    delta_dir = scratch_folder(audio_file, "delta",
+                               lambda: analysis_wav_size(audio_file, sum(end - start for start, end in changed)))
+    stem = os.path.splitext(os.path.basename(audio_file))[0]
+    paths = [os.path.join(delta_dir, f"{stem}.change{index:02d}.wav") for index in range(1, len(changed) + 1)]
+    try:
+        os.makedirs(delta_dir, exist_ok=True)
+        audio_analysis.write_wav_segments(audio_analysis.pcm_array(audio_file), changed, paths)
+    except (OSError, audio_analysis.AudioAnalysisError) as e:
+        logging.error(f"Failed to cut the changed parts out of {audio_file}: {e}")
+        return False
+    finally:
+        scratch.track(delta_dir)
+
+    parts = {label: [] for label in old_cues}
+    for start_ms, end_ms, offset_ms in kept:
+        for label, cues in old_cues.items():
+            moved = [cue for cue in fingerprint.shift_cues(cues, offset_ms)
+                     if start_ms <= cue.start_ms and cue.end_ms <= end_ms]
+            parts[label].append((0, start_ms, end_ms, moved))
+    for index, (path, (start_ms, end_ms)) in enumerate(zip(paths, changed), 1):
+        captions = caption_clip(path, f"changed span {index}/{len(changed)}", paranoid=paranoid, variants=variants,
+                                silence_check=silence_check)
+        if captions is None:
+            return False
+        for label in parts:
+            parts[label].append((start_ms, start_ms, end_ms, captions[label]))
+
+    for label, label_parts in parts.items():
+        cues = stitch_cues(sorted(label_parts, key=lambda part: part[1]))
+        logging.info(f"Spliced {len(cues)} subtitles from {len(changed)} re-captioned span(s)")
+        if not write_cue_files(srt_output_path, cues, formats, label):
+            return False
+    return True
+
+def verify_project_state(project, timeline, state=None):
+    """Verify that the project and timeline are in a valid state.
+
+    With a TimelineState the checks read the snapshot instead of Resolve.
+    """
     try:
         # Check project is valid
         if not project:
@@ -1616,13 +2611,18 @@ def verify_project_state(project, timeline):
             return False
             
         # Check timeline is current
-        current_timeline = project.GetCurrentTimeline()
-        if not current_timeline or current_timeline.GetName() != timeline.GetName():
-            logging.error("Timeline is not current")
-            return False
+        if state is not None:
+            if state.get("current_name") != state.get("name"):
+                logging.error("Timeline is not current")
+                return False
+        else:
+            current_timeline = project.GetCurrentTimeline()
+            if not current_timeline or current_timeline.GetName() != timeline.GetName():
+                logging.error("Timeline is not current")
+                return False
             
         # Check timeline has media
-        items = timeline.GetItemListInTrack("audio", 1)
+        items = timeline.GetItemListInTrack("audio", 1) if state is None else state.get("audio_items")
         if not items:
             logging.error("No media in timeline")
             return False
@@ -1633,21 +2633,24 @@ def verify_project_state(project, timeline):
         logging.error(f"Error verifying project state: {str(e)}")
         return False
 
-def verify_timeline(timeline):
-    """Verify that the timeline is valid and has required tracks."""
+def verify_timeline(timeline, state=None):
+    """Verify that the timeline is valid and has required tracks.
+
+    With a TimelineState the track counts come from the snapshot.
+    """
     try:
         if not timeline:
             logging.error("Timeline is None")
             return False
             
         # Check audio track exists
-        audio_tracks = timeline.GetTrackCount("audio")
+        audio_tracks = timeline.GetTrackCount("audio") if state is None else state.get("audio_tracks")
         if audio_tracks < 1:
             logging.error("No audio tracks found")
             return False
             
         # Check subtitle track exists
-        subtitle_tracks = timeline.GetTrackCount("subtitle")
+        subtitle_tracks = timeline.GetTrackCount("subtitle") if state is None else state.get("subtitle_tracks")
         if subtitle_tracks < 1:
             logging.error("No subtitle tracks found")
             return False
@@ -1658,20 +2661,579 @@ def verify_timeline(timeline):
         logging.error(f"Error verifying timeline: {str(e)}")
         return False
 
-def clear_subtitle_tracks(timeline):
-    """Clear all subtitle tracks in the timeline."""
+def clear_subtitle_tracks(timeline, state=None, strategy="batch"):
+    """Clear all subtitle tracks in the timeline.
+
+    strategy:
+        batch     — one DeleteItems call per track (default)
+        recreate  — delete every subtitle track and add back a single empty
+                    one; no item lists are fetched at all
+        per-item  — one DeleteItems call per item (the old behaviour, kept so
+                    benchmark.py can compare against it)
+    """
     try:
-        subtitle_track_count = timeline.GetTrackCount("subtitle")
+        if state is None:
+            subtitle_track_count = timeline.GetTrackCount("subtitle")
+        else:
+            subtitle_track_count = state.get("subtitle_tracks")
+
+        if strategy == "recreate" and subtitle_track_count > 0:
+            # Delete from the top down so the remaining indexes stay valid
+            for track_index in range(subtitle_track_count, 0, -1):
+                if not timeline.DeleteTrack("subtitle", track_index):
+                    logging.warning("DeleteTrack failed, falling back to batched DeleteItems")
+                    return clear_subtitle_tracks(timeline, state, strategy="batch")
+            if state is not None:
+                state.invalidate("subtitle_tracks")
+            if not timeline.AddTrack("subtitle"):
+                logging.error("Failed to re-add subtitle track")
+                return False
+            logging.info(f"Recreated subtitle track (dropped {subtitle_track_count})")
+            return True
+
+        deleted = 0
         for track_index in range(1, subtitle_track_count + 1):
             items = timeline.GetItemListInTrack("subtitle", track_index)
-            for item in items:
-                timeline.DeleteItems([item])
-        logging.info("Cleared all subtitle tracks")
+            if not items:
+                continue
+            if strategy == "per-item":
+                for item in items:
+                    timeline.DeleteItems([item])
+            elif not timeline.DeleteItems(items):
+                logging.error(f"Failed to delete {len(items)} items from subtitle track {track_index}")
+                return False
+            deleted += len(items)
+        logging.info(f"Cleared all subtitle tracks ({deleted} items)")
         return True
     except Exception as e:
         logging.error(f"Error clearing subtitle tracks: {str(e)}")
         return False
 
+def job_srt_path(job, options):
+    """Return the SRT path for job: stdout, its manifest output, or next to the source.
+
+    A manifest output naming an existing folder gets <source name>.srt
+    inside it; the folder for any other output path is created if needed.
+    """
+    if options["stdout"]:
+        return STDOUT_PATH
+    if not job.output:
+        return os.path.splitext(job.source)[0] + ".srt"
+    if os.path.isdir(job.output):
+        return os.path.join(job.output, os.path.splitext(os.path.basename(job.source))[0] + ".srt")
+    os.makedirs(os.path.dirname(job.output) or ".", exist_ok=True)
+    return job.output
+
+def job_variants(job, options):
+    """Return the caption variants for job: --variants with its manifest settings applied."""
+    if not job.caption_settings:
+        return options["variants"]
+    if not options["variants"]:
+        return [dict(DEFAULT_CAPTION_SETTINGS, label=None, **job.caption_settings)]
+    return [dict(variant, **job.caption_settings) for variant in options["variants"]]
+
+def has_current_subtitles(path, options):
+    """Return True if path's first subtitle output exists and is newer than path."""
+    variants = options["variants"]
+    label = variants[0]["label"] if variants else None
+    output = subtitle_output_path(os.path.splitext(path)[0] + ".srt", options["formats"][0], label)
+    try:
+        return os.path.getmtime(output) >= os.path.getmtime(path)
+    except OSError:
+        return False
+
+def caption_key(variant):
+    """Return a short key for the caption settings a variant uses (its label aside)."""
+    settings = {name: (variant or {}).get(name, default) for name, default in DEFAULT_CAPTION_SETTINGS.items()}
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def fingerprint_input(path):
+    """Return (fingerprint, duration_ms) of path for --dedupe, or None if it can't be decoded."""
+    try:
+        return fingerprint.fingerprint_file(path)
+    except audio_analysis.AudioAnalysisError as e:
+        logging.warning(f"Can't fingerprint {os.path.basename(path)}, captioning it as usual: {e}")
+        return None
+
+def reuse_captions(fingerprinted, srt_path, formats, variants):
+    """Write the stored cues of matching audio for every variant; returns True if there was a match."""
+    fp, duration_ms = fingerprinted
+    keys = [caption_key(variant) for variant in variants or [None]]
+    match = FINGERPRINT_INDEX.find(fp, duration_ms, keys)
+    if not match:
+        return False
+    _, offset_ms, captions = match
+    for variant, key in zip(variants or [None], keys):
+        cues = fingerprint.shift_cues(captions[key], offset_ms, duration_ms)
+        if not write_cue_files(srt_path, cues, formats, variant["label"] if variant else None):
+            return False
+    return True
+
+def remember_captions(fingerprinted, source, srt_path, formats, variants):
+    """Add the subtitles just written for source to the fingerprint index."""
+    fmt = next((fmt for fmt in READABLE_FORMATS if fmt in formats), None)
+    if fmt is None or srt_path == STDOUT_PATH:
+        logging.info(f"Not adding {os.path.basename(source)} to the fingerprint index: no readable output")
+        return
+    captions = {}
+    for variant in variants or [None]:
+        path = subtitle_output_path(srt_path, fmt, variant["label"] if variant else None)
+        try:
+            captions[caption_key(variant)] = read_cues(path)
+        except (OSError, ValueError) as e:
+            logging.warning(f"Couldn't read {path} back for the fingerprint index: {e}")
+            return
+    fp, duration_ms = fingerprinted
+    try:
+        FINGERPRINT_INDEX.add(fp, duration_ms, os.path.abspath(source), captions)
+    except OSError as e:
+        logging.warning(f"Couldn't update the fingerprint index: {e}")
+
+def plan_delta(source, import_path, fingerprinted, variants):
+    """Compare import_path with the version of source captioned before (--delta).
+
+    Returns (kept, changed, {label: old cues}) for generate_srt_delta, or
+    None when there is no earlier version in the fingerprint index or too
+    much of the recording has changed to be worth it.
+    """
+    keys = [caption_key(variant) for variant in variants or [None]]
+    previous = FINGERPRINT_INDEX.find_source(os.path.abspath(source), keys)
+    if previous is None:
+        logging.info(f"No earlier captioned version of {os.path.basename(source)} in the fingerprint index")
+        return None
+    reference, captions = previous
+    fp, duration_ms = fingerprinted
+    try:
+        samples = audio_analysis.pcm_array(import_path)
+        queries = fingerprint.phase_fingerprints(samples, fp)
+        quiet = fingerprint.quiet_frames(samples)
+    except audio_analysis.AudioAnalysisError:
+        queries, quiet = fp, None
+    plan = fingerprint.delta_plan(queries, reference, duration_ms, quiet)
+    if plan is None:
+        print(f"  Most of {os.path.basename(source)} changed since it was last captioned; captioning it whole")
+        return None
+    kept, changed = plan
+    labels = [variant["label"] if variant else None for variant in variants or [None]]
+    return kept, changed, {label: captions[key] for label, key in zip(labels, keys)}
+
+def process_job(job, options):
+    """Convert (if asked), check and caption one job on its own timeline.
+
+    Returns "done", "reused" (--dedupe found the same audio captioned
+    before and its cues were written instead), "delta" (--delta captioned
+    only what changed since the last version), "empty" (no audio worth
+    captioning; empty subtitle files were written instead) or "failed".
+    """
+    src = job.source
+    do_import_only = options["import_only"]
+    do_strip_silence = options["strip_silence"]
+    chunk_minutes = options["chunk_minutes"]
+    formats = options["formats"]
+    variants = job_variants(job, options)
+    try:
+        print(f"\nProcessing {os.path.basename(src)}...")
+        import_path = prepare_import(job)
+        if not import_path:
+            return "failed"
+        if import_path != src:
+            print(f"  Using converted file: {import_path}")
+
+        if do_import_only:
+            if generate_srt(
+                [import_path],
+                os.path.basename(import_path),
+                srt_output_path=None,
+                do_export=False,
+                do_import_only=True,
+                paranoid=options["paranoid"],
+            ):
+                print(f"Successfully imported {os.path.basename(src)}")
+                return "done"
+            print(f"Failed to import {os.path.basename(src)}")
+            return "failed"
+
+        srt_path = job_srt_path(job, options)
+        empty_reason = None
+        if not options["no_silence_check"]:
+            # Decode into the PCM cache up front when it will be read again
+            full_decode = do_strip_silence or bool(chunk_minutes) or options["dedupe"] or options["delta"]
+            empty_reason = find_empty_input(import_path, full_decode=full_decode)
+        if empty_reason:
+            # Write empty subtitle files so batch tooling still finds an output
+            print(f"No audio to caption in {os.path.basename(src)} ({empty_reason}); "
+                  f"skipped Resolve and wrote empty subtitles")
+            for variant in variants or [None]:
+                write_cue_files(srt_path, [], formats, variant["label"] if variant else None)
+            return "empty"
+
+        fingerprinted = None
+        if options["dedupe"] or options["delta"]:
+            fingerprinted = fingerprint_input(import_path)
+        if fingerprinted and options["dedupe"] and reuse_captions(fingerprinted, srt_path, formats, variants):
+            print(f"{os.path.basename(src)} has the same audio as a file captioned before; "
+                  f"reused its subtitles and skipped Resolve")
+            # Indexed under its own path too, so --plan and a later --delta run know this copy
+            remember_captions(fingerprinted, src, srt_path, formats, variants)
+            return "reused"
+        plan = plan_delta(src, import_path, fingerprinted, variants) if fingerprinted and options["delta"] else None
+        if plan:
+            kept, changed, old_cues = plan
+            changed_ms = sum(end - start for start, end in changed)
+            print(f"  Re-captioning {len(changed)} changed span(s), {changed_ms / 1000:.0f} s of "
+                  f"{fingerprinted[1] / 60000:.0f} min; keeping the other subtitles")
+            if generate_srt_delta(import_path, srt_path, kept, changed, old_cues, paranoid=options["paranoid"],
+                                  formats=formats, variants=variants,
+                                  silence_check=not options["no_silence_check"]):
+                print(f"Successfully updated SRT for {os.path.basename(src)}")
+                remember_captions(fingerprinted, src, srt_path, formats, variants)
+                return "delta"
+            print(f"Failed to update SRT for {os.path.basename(src)}")
+            return "failed"
+
+        edit_map = None
+        if do_strip_silence:
+            import_path, edit_map = condense_for_import(import_path)
+            if edit_map:
+                print(f"  Using condensed proxy: {import_path}")
+        if chunk_minutes:
+            ok = generate_srt_chunked(import_path, srt_path, chunk_minutes, paranoid=options["paranoid"],
+                                      formats=formats, variants=variants, edit_map=edit_map,
+                                      silence_check=not options["no_silence_check"])
+        else:
+            ok = generate_srt_for_file(import_path, srt_output_path=srt_path, paranoid=options["paranoid"],
+                                       formats=formats, variants=variants, edit_map=edit_map)
+        if ok:
+            print(f"Successfully generated SRT for {os.path.basename(src)}")
+            if fingerprinted:
+                remember_captions(fingerprinted, src, srt_path, formats, variants)
+            return "done"
+        print(f"Failed to generate SRT for {os.path.basename(src)}")
+        return "failed"
+
+    except Exception as e:
+        print(f"Error processing {os.path.basename(src)}: {str(e)}")
+        return "failed"
+
+def process_group(jobs, options, export=False):
+    """Convert and import jobs onto one timeline and caption it (--concat, manifest groups).
+
+    The timeline is named after the group, or the first file for --concat,
+    and subtitles go to the first job's SRT path with its caption settings.
+    export=False leaves them in Resolve only. Returns "done" or "failed".
+    """
+    do_import_only = options["import_only"]
+    formats = options["formats"]
+
+    # One timeline needs every file, so convert them all up front
+    valid_entries = []
+    for job in jobs:
+        import_path = prepare_import(job)
+        if import_path:
+            valid_entries.append((job, import_path))
+    if not valid_entries:
+        print("No valid files to process")
+        return "failed"
+
+    import_paths = [import_path for _, import_path in valid_entries]
+    first = valid_entries[0][0]
+    timeline_name = first.group or os.path.basename(first.source)
+    srt_path = job_srt_path(first, options)
+    variants = job_variants(first, options)
+    export = export and not do_import_only
+
+    names = ", ".join(os.path.basename(job.source) for job, _ in valid_entries)
+    print(f"\nConcat mode: building one timeline from {len(valid_entries)} file(s): {names}")
+    if do_import_only:
+        print("  Import only — subtitle generation skipped")
+    elif export:
+        print(f"  SRT will be exported to: {srt_path}")
+    else:
+        print("  Subtitles will be generated in Resolve only (use --export to save SRT)")
+
+    if generate_srt(import_paths, timeline_name, srt_path, do_export=export, do_import_only=do_import_only,
+                    paranoid=options["paranoid"], formats=formats, variants=variants):
+        print(f"Successfully {'imported' if do_import_only else 'generated subtitles for'} concat timeline '{timeline_name}'")
+        if export:
+            for variant in variants or [None]:
+                label = variant["label"] if variant else None
+                for fmt in formats:
+                    print(f"{fmt.upper()} saved to: {subtitle_output_path(srt_path, fmt, label)}")
+        return "done"
+    print("Failed to process concat timeline")
+    return "failed"
+
+class RunState:
+    """Counters and shared state for one run of main().
+
+    Updated under a lock, so the per-host pipelines of --hosts can share it.
+    """
+
+    def __init__(self, deadline=None):
+        self.lock = threading.Lock()
+        self.deadline = deadline
+        self.total = 0
+        self.successful = 0
+        self.empty = 0
+        self.reused = 0
+        self.patched = 0
+        self.hung = 0
+        self.per_host = {}
+        self.timing = scheduler.ThroughputModel(load_preferences())
+        self.deferred = DeferredManifest(os.path.abspath(f"deferred-{time.strftime('%Y%m%d-%H%M%S')}.csv"))
+
+    def count(self, batch, result, host=None):
+        """Add a batch's final result to the summary counters."""
+        with self.lock:
+            if result == "deferred":
+                return
+            self.total += len(batch)
+            if result in ("done", "reused", "delta"):
+                self.successful += len(batch)
+                if result == "reused":
+                    self.reused += len(batch)
+                elif result == "delta":
+                    self.patched += len(batch)
+                if host:
+                    self.per_host[host] = self.per_host.get(host, 0) + len(batch)
+            elif result == "empty":
+                self.empty += len(batch)
+            elif result == "hung":
+                self.hung += len(batch)
+
+    def learn(self, conversions, caption=None):
+        """Add a batch's conversion timings and (duration, seconds, format) to the model and save it."""
+        with self.lock:
+            for size, seconds in conversions:
+                self.timing.record_conversion(size, seconds)
+            if caption:
+                self.timing.record(*caption)
+            prefs = load_preferences()
+            self.timing.save(prefs)
+            save_preferences(prefs)
+
+def job_format(job):
+    """Return the extension of the file Resolve imports for job (".wav"), for per-format timing."""
+    ext = os.path.splitext(job.source)[1].lower()
+    if job.convert_format and ext not in VIDEO_EXTENSIONS:
+        return f".{job.convert_format}"
+    return ext
+
+def estimate_batch(model, batch, duration):
+    """Return the predicted seconds to convert and caption batch, or None if its duration is unknown."""
+    caption = model.estimate(duration, job_format(batch[0]))
+    if caption is None:
+        return None
+    return caption + sum(model.estimate_conversion(scheduler.file_size(job.source))
+                         for job in batch if job.convert_format)
+
+def run_batch(batch, duration, options, run):
+    """Caption one batch from the schedule, unless --deadline defers it.
+
+    Returns "done", "reused", "delta", "empty", "failed", "hung" (a Resolve
+    call overran its deadline and the batch was abandoned) or "deferred".
+    """
+    estimate = estimate_batch(run.timing, batch, duration)
+    if scheduler.misses_deadline(run.deadline, estimate):
+        names = ", ".join(os.path.basename(job.source) for job in batch)
+        expected = f"expected to take ~{estimate / 60:.0f} min" if estimate else "length unknown"
+        print(f"\nDeferring {names} ({expected}, would miss the deadline)")
+        with run.lock:
+            run.deferred.add(batch)
+        return "deferred"
+
+    started = time.monotonic()
+    hangs_before = resolve_calls.hang_count()
+    resolve_calls.start_job()
+    if batch[0].group is None:
+        # --ram-scratch: the job's intermediates are deleted as soon as it's done
+        with scratch.job(SCRATCH_SPACE, before_delete=audio_analysis.forget_pcm):
+            result = process_job(batch[0], options)
+    else:
+        result = process_group(batch, options, export=True)
+    conversions = take_conversion_times()
+    caption = None
+    if resolve_calls.hang_count() > hangs_before:
+        result = "hung"
+    elif result == "done" and duration and not options["import_only"]:
+        converting = sum(seconds for _, seconds in conversions)
+        caption = (duration, time.monotonic() - started - converting, job_format(batch[0]))
+    if conversions or caption:
+        run.learn(conversions, caption)
+    return result
+
+def run_on_hosts(scheduled, hosts, options, run):
+    """Spread the scheduled batches over several Resolve hosts (--hosts).
+
+    Each host gets its own pipeline thread and Resolve connection; a batch
+    that fails or hangs on one host is retried on another.
+    """
+    print(f"Sharing jobs between {len(hosts)} Resolve hosts: {', '.join(hosts)}")
+
+    def process(host, item):
+        batch, duration = item
+        result = run_batch(batch, duration, options, run)
+        if result in ("failed", "hung"):
+            print(f"  [{host}] {os.path.basename(batch[0].source)} {result}; offering it to another host")
+        return result
+
+    def finish(host, item, result):
+        run.count(item[0], result, host)
+
+    retired = worker_pool.run_pool(
+        scheduled, hosts, process, finish,
+        retry=lambda result: result in ("failed", "hung"),
+        hung=lambda result: result == "hung",
+        setup=lambda host: resolve_calls.set_host(None if host in ("localhost", "local") else host),
+    )
+    for host in retired:
+        print(f"Stopped using {host} after {worker_pool.RETIRE_AFTER} hung jobs in a row")
+    if retired and len(retired) == len(hosts):
+        print("Every host stopped responding; the remaining files were not started")
+
+def format_eta(seconds):
+    """Format seconds as "2h05m", "4m10s" or "12s"; "?" when unknown."""
+    if seconds is None:
+        return "?"
+    seconds = int(round(seconds))
+    if seconds >= 3600:
+        return f"{seconds // 3600}h{seconds % 3600 // 60:02d}m"
+    if seconds >= 60:
+        return f"{seconds // 60}m{seconds % 60:02d}s"
+    return f"{seconds}s"
+
+def plan_action(job, options):
+    """Return what a run would do with job: "import", "reuse", "delta" or "caption".
+
+    "reuse" and "delta" are judged from the fingerprint index without
+    decoding anything: a file that hasn't changed since it was indexed is
+    reused, an indexed one that has is re-captioned with --delta. Other
+    files may still turn out to match once fingerprinted.
+    """
+    if options["import_only"]:
+        return "import"
+    if options["dedupe"] or options["delta"]:
+        keys = [caption_key(variant) for variant in job_variants(job, options) or [None]]
+        entry = FINGERPRINT_INDEX.latest_for_source(os.path.abspath(job.source), keys)
+        if entry:
+            try:
+                info = os.stat(job.source)
+                unchanged = (info.st_size, info.st_mtime_ns) == (entry["size"], entry["mtime_ns"])
+            except OSError:
+                unchanged = False
+            if unchanged:
+                return "reuse"
+            if options["delta"]:
+                return "delta"
+    return "caption"
+
+def print_plan(jobs, options):
+    """List what a run would do with jobs and how long each stage should take (--plan).
+
+    Nothing is converted and Resolve isn't contacted; durations are probed
+    with ffprobe as for a real run, and batches are listed in the order the
+    run would take them. Estimates come from the throughput model learned
+    from earlier runs (see scheduler.ThroughputModel). With --watch, the
+    files already in the watched folder are planned too, as its first pass
+    would take them.
+    """
+    model = scheduler.ThroughputModel(load_preferences())
+    hosts = len(options["hosts"] or [None])
+    deadline = options["deadline"]
+    skipped = []  # (job, reason)
+
+    def runnable(jobs, watched=False):
+        for job in jobs:
+            reason = (source_problem(job.source) or "").lower()
+            if not reason and watched and has_current_subtitles(job.source, options):
+                reason = "subtitles up to date"
+            if reason:
+                skipped.append((job, reason))
+            else:
+                yield job
+
+    jobs = runnable(jobs)
+    if options["watch"]:
+        watched = (Job(path) for path in iter_directory(options["watch"], MEDIA_EXTENSIONS))
+        jobs = itertools.chain(jobs, runnable(watched, watched=True))
+    if options["concat"]:
+        batch = list(jobs)
+        durations = {job.source: scheduler.probe_duration(job.source) for job in batch}
+        scheduled = [(batch, scheduler.batch_duration(batch, durations))] if batch else []
+    else:
+        window = 1 if options["in_order"] else scheduler.SCHEDULE_WINDOW
+        scheduled = scheduler.schedule(iter_batches(jobs), window=window)
+
+    # stage -> [files, seconds, bytes or media seconds]
+    stages = {name: [0, 0.0, 0.0] for name in ("convert", "caption", "import", "delta", "reuse", "defer", "unknown")}
+    clock = time.time()
+    print(f"{'action':<8} {'length':>8} {'estimate':>9}  file")
+    for batch, duration in scheduled:
+        names = ", ".join(os.path.basename(job.source) for job in batch)
+        action = "caption" if len(batch) > 1 else plan_action(batch[0], options)
+        converting = 0.0
+        for job in batch:
+            if job.convert_format:
+                size = scheduler.file_size(job.source)
+                converting += model.estimate_conversion(size)
+                stages["convert"][0] += 1
+                stages["convert"][2] += size
+        if action == "reuse":
+            estimate = converting
+        elif action == "import":
+            estimate = converting + model.caption_model(job_format(batch[0])).overhead
+        else:
+            estimate = estimate_batch(model, batch, duration)
+        # The same rule as run_batch, so files of unknown length are started
+        if scheduler.misses_deadline(deadline, estimate, clock):
+            stages["defer"][0] += len(batch)
+            print(f"{'defer':<8} {format_eta(duration):>8} {'':>9}  {names}")
+            continue
+        if estimate is None:
+            stages["unknown"][0] += len(batch)
+            estimate = converting + model.caption_model(job_format(batch[0])).overhead
+        clock += estimate / hosts
+        stages["convert"][1] += converting
+        stages[action][0] += len(batch)
+        stages[action][1] += estimate - converting
+        stages[action][2] += duration or 0
+        note = f" (+ {batch[0].convert_format} conversion ~{format_eta(converting)})" if converting else ""
+        print(f"{action:<8} {format_eta(duration):>8} {'~' + format_eta(estimate):>9}  {names}{note}")
+    for job, reason in skipped:
+        print(f"{'skip':<8} {'':>8} {'':>9}  {os.path.basename(job.source)} ({reason})")
+
+    files = sum(stages[name][0] for name in ("caption", "import", "delta", "reuse", "defer"))
+    if not files:
+        print("No files to process")
+        return
+    caption = model.caption
+    learned = f"from {len(caption.samples)} past job(s)" if caption.samples else "defaults, no runs yet"
+    rate = model.conversion_rate() / 1e6
+    print(f"\nPlan for {files} file(s); nothing was converted or sent to Resolve")
+    rows = [
+        ("Conversion", "convert", f"{stages['convert'][2] / 1e6:.0f} MB at {rate:.1f} MB/s"
+         + ("" if model.conversions else " (default)")),
+        ("Captioning", "caption", f"{format_eta(stages['caption'][2])} of media; {caption.overhead:.0f} s per file "
+         f"+ {caption.factor:.2f} s per media second ({learned})"),
+        ("Import only", "import", "per-file overhead"),
+        ("Incremental", "delta", "at most; only the changed parts are captioned (--delta)"),
+        ("Reused", "reuse", "unchanged since captioned; Resolve skipped"),
+    ]
+    for label, name, detail in rows:
+        count, seconds, _ = stages[name]
+        if count:
+            print(f"  {label:<12} {count:>6} file(s) {'~' + format_eta(seconds):>9}  {detail}")
+    if stages["defer"][0]:
+        print(f"  {'Deferred':<12} {stages['defer'][0]:>6} file(s) {'':>9}  wouldn't finish before --deadline")
+    if skipped:
+        print(f"  {'Skipped':<12} {len(skipped):>6} file(s) {'':>9}  missing, unreadable or already captioned")
+    if stages["unknown"][0]:
+        print(f"  {stages['unknown'][0]} file(s) of unknown length (no ffprobe?) are counted at the per-file overhead")
+    total = sum(stages[name][1] for name in ("convert", "caption", "import", "delta", "reuse"))
+    shared = f", ~{format_eta(total / hosts)} shared between {hosts} hosts" if hosts > 1 else ""
+    finish = time.strftime("%H:%M", time.localtime(time.time() + total / hosts))
+    print(f"Estimated wall time: ~{format_eta(total)}{shared}; done around {finish}")
+
 def main():
     # Handle conv-dir preference flags before anything else
     argv = sys.argv[1:]
@@ -1684,94 +3246,195 @@ def main():
 
     # Get files to process
     if len(sys.argv) > 1:
-        entries, do_concat, do_export, do_import_only = parse_args(sys.argv[1:])
+        jobs, options = parse_args(sys.argv[1:])
     else:
         samples_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "samples")
-        entries = [
-            (os.path.join(samples_dir, f), None)
-            for f in os.listdir(samples_dir) if f.lower().endswith('.mp3')
-        ]
-        do_concat = False
-        do_export = False
-        do_import_only = False
-
-    if not entries:
-        print("No files to process")
+        jobs = (
+            Job(os.path.join(samples_dir, f))
+            for f in sorted(os.listdir(samples_dir)) if f.lower().endswith('.mp3')
+        )
+        options = default_options()
+
+    do_concat = options["concat"]
+    do_export = options["export"]
+    do_import_only = options["import_only"]
+    do_stdout = options["stdout"]
+    do_strip_silence = options["strip_silence"]
+    chunk_minutes = options["chunk_minutes"]
+    watch_dir = options["watch"]
+    deadline = options["deadline"]
+    hosts = options["hosts"]
+    formats = options["formats"]
+    variants = options["variants"]
+
+    # With --stdout the SRT owns stdout; progress messages move to stderr
+    if do_stdout:
+        sys.stdout = sys.stderr
+
+    if do_stdout and len(formats) > 1:
+        print("Error: --stdout can only stream one format; pick one with --formats")
+        return
+    if do_stdout and variants and len(variants) > 1:
+        print("Error: --stdout can only stream one caption variant")
+        return
+    if do_strip_silence and do_concat:
+        print("Error: --strip-silence works per file and can't be combined with --concat")
+        return
+    if chunk_minutes and (do_concat or do_import_only):
+        print("Error: --chunk-minutes can't be combined with --concat or --import")
+        return
+    if watch_dir and (do_concat or do_stdout):
+        print("Error: --watch can't be combined with --concat or --stdout")
+        return
+    if deadline and (do_concat or watch_dir):
+        print("Error: --deadline can't be combined with --concat or --watch")
         return
 
-    # Drop entries where conversion failed or source not found
-    valid_entries = []
-    for src, conv in entries:
-        if conv is None and not os.path.exists(src):
-            print(f"File not found, skipping: {src}")
-            continue
-        if conv == "FAILED":
-            continue
-        valid_entries.append((src, conv))
+    for flag in ("dedupe", "delta"):
+        if options[flag] and (do_concat or do_import_only):
+            print(f"Error: --{flag} works per captioned file and can't be combined with --concat or --import")
+            return
 
-    if not valid_entries:
-        print("No valid files to process")
+    if hosts and (do_concat or do_stdout):
+        print("Error: --hosts can't be combined with --concat or --stdout")
+        return
+    remote = [host for host in hosts or [] if host not in ("localhost", "local")]
+    if options["shared_dir"]:
+        global SHARED_OUTPUT_DIR
+        SHARED_OUTPUT_DIR = os.path.abspath(options["shared_dir"])
+    elif remote and not get_conversion_output_dir():
+        # Intermediates would land in this machine's temp folder, which other hosts can't import from
+        kinds = [name for name, used in (("converted media", options["converting"]),
+                                         ("--strip-silence proxies", do_strip_silence),
+                                         ("--chunk-minutes chunks", chunk_minutes),
+                                         ("--delta clips", options["delta"])) if used]
+        if kinds:
+            print(f"Error: {', '.join(kinds)} would be written to this machine's temp folder, which "
+                  f"{', '.join(remote)} can't import from; give a folder on shared storage with --shared-dir")
+            return
+        if options["manifest"]:
+            print("Warning: manifest rows converted without a convert_dir go to this machine's temp folder, "
+                  "which other hosts can't import from; use --shared-dir")
+
+    if watch_dir:
+        # Intermediates are media files too; inside the watched tree they'd be picked up and captioned
+        folders = [get_conversion_output_dir() or tempfile.gettempdir()]
+        if options["ram_scratch"]:
+            folders.append(scratch.find_ram_dir())
+        inside = [folder for folder in folders if folder and is_within(folder, watch_dir)]
+        if inside:
+            print(f"Error: intermediates go to {inside[0]}, inside the watched folder {watch_dir}; set "
+                  f"--shared-dir or the conversion output dir to a folder outside it")
+            return
+
+    if options["ram_scratch"]:
+        if do_import_only or options["shared_dir"] or remote:
+            print("Error: --ram-scratch keeps intermediates in this machine's memory and deletes them after "
+                  "each file, so it can't be combined with --import, --shared-dir or remote --hosts")
+            return
+
+    if options["plan"]:
+        print_plan(jobs, options)
         return
 
-    if do_concat:
-        import_paths = [conv if conv else src for src, conv in valid_entries]
-        first_src = valid_entries[0][0]
-        timeline_name = os.path.basename(first_src)
-        srt_path = os.path.splitext(first_src)[0] + ".srt"
-        export = do_export and not do_import_only
-
-        names = ", ".join(os.path.basename(s) for s, _ in valid_entries)
-        print(f"\nConcat mode: building one timeline from {len(valid_entries)} file(s): {names}")
-        if do_import_only:
-            print("  Import only — subtitle generation skipped")
-        elif export:
-            print(f"  SRT will be exported to: {srt_path}")
+    if options["ram_scratch"]:
+        ram_dir = scratch.find_ram_dir()
+        if ram_dir:
+            global SCRATCH_SPACE
+            SCRATCH_SPACE = scratch.ScratchSpace(options["ram_scratch"], ram_dir)
+            atexit.register(SCRATCH_SPACE.close)
+            logging.info(f"Scratch space: up to {options['ram_scratch'] / 1e6:.0f} MB in {SCRATCH_SPACE.directory}")
         else:
-            print("  Subtitles will be generated in Resolve only (use --export to save SRT)")
+            print("Warning: no RAM-backed folder (tmpfs) found; --ram-scratch is ignored")
 
-        if generate_srt(import_paths, timeline_name, srt_path, do_export=export, do_import_only=do_import_only):
-            print(f"Successfully {'imported' if do_import_only else 'generated subtitles for'} concat timeline '{timeline_name}'")
-            if export:
-                print(f"SRT saved to: {srt_path}")
-        else:
-            print("Failed to process concat timeline")
-        return
-
-    # Normal per-file processing
-    successful = 0
-    for src, conv in valid_entries:
-        import_path = conv if conv else src
-        try:
-            print(f"\nProcessing {os.path.basename(src)}...")
-            if conv:
-                print(f"  Using converted file: {conv}")
-
-            if do_import_only:
-                if generate_srt(
-                    [import_path],
-                    os.path.basename(import_path),
-                    srt_output_path=None,
-                    do_export=False,
-                    do_import_only=True,
-                ):
-                    successful += 1
-                    print(f"Successfully imported {os.path.basename(src)}")
-                else:
-                    print(f"Failed to import {os.path.basename(src)}")
-            else:
-                srt_path = os.path.splitext(src)[0] + ".srt"
-                if generate_srt_for_file(import_path, srt_output_path=srt_path):
-                    successful += 1
-                    print(f"Successfully generated SRT for {os.path.basename(src)}")
-                else:
-                    print(f"Failed to generate SRT for {os.path.basename(src)}")
+    if options["record_cassette"]:
+        global CASSETTE_RECORDER
+        CASSETTE_RECORDER = cassette.Recorder(options["record_cassette"], {"argv": sys.argv[1:]})
+        atexit.register(CASSETTE_RECORDER.close)
 
-        except Exception as e:
-            print(f"Error processing {os.path.basename(src)}: {str(e)}")
-            continue
+    if do_concat:
+        # --concat puts every file on one timeline, manifest groups included
+        process_group(list(jobs), options, export=do_export or do_stdout)
+        if resolve_calls.total_hangs():
+            print(f"Abandoned after {resolve_calls.total_hangs()} hung Resolve call(s)")
+        return
 
+    # Shortest (and highest priority) first, looking a window of batches
+    # ahead; --in-order keeps the given order. Durations are probed either
+    # way to learn how long captioning takes on this machine.
+    window = 1 if options["in_order"] else scheduler.SCHEDULE_WINDOW
+    batches = iter_batches(jobs)
+    if do_stdout:
+        # Each file's SRT is numbered from 1, so several back to back wouldn't be one valid file
+        first = list(itertools.islice(batches, 2))
+        if len(first) > 1:
+            print("Error: --stdout streams the subtitles of one file; give a single input, or use --concat")
+            return
+        batches = iter(first)
+    scheduled = scheduler.schedule(batches, window=window)
+
+    if watch_dir:
+        # One long-lived process keeps Resolve's scripting connection warm;
+        # files that already have up-to-date subtitles are left alone
+        print(f"Watching {watch_dir} for new files (Ctrl+C to stop)")
+        watched = watch.watch_directory(watch_dir, MEDIA_EXTENSIONS,
+                                        wanted=lambda path: not has_current_subtitles(path, options))
+        watched_batches = iter_batches(Job(path) for path in watched)
+        scheduled = itertools.chain(scheduled, scheduler.schedule(watched_batches, window=1))
+
+    run = RunState(deadline)
+
+    # Normal per-file processing: each job is discovered, converted and
+    # captioned before the next one is looked at. Manifest rows sharing a
+    # group arrive together and share one timeline.
+    try:
+        if hosts:
+            run_on_hosts(scheduled, hosts, options, run)
+        else:
+            consecutive_hangs = 0
+            for batch, duration in scheduled:
+                result = run_batch(batch, duration, options, run)
+                run.count(batch, result)
+                # A hung call abandons its job; the next one reconnects
+                if result != "hung":
+                    consecutive_hangs = 0
+                    continue
+                consecutive_hangs += 1
+                if consecutive_hangs >= resolve_calls.MAX_CONSECUTIVE_HANGS:
+                    print(f"\nResolve hung on {consecutive_hangs} jobs in a row; stopping. "
+                          f"Check that Resolve is responding and run the remaining files again")
+                    break
+                print("  Resolve stopped responding; moving on with a fresh connection")
+    except KeyboardInterrupt:
+        if not watch_dir:
+            raise
+        print("\nStopped watching")
+    finally:
+        run.deferred.close()
+
+    deferred = run.deferred
+    if deferred.count:
+        print(f"\n{deferred.count} file(s) deferred by --deadline; run them later with:")
+        print(f"  python generate_srt.py --manifest \"{deferred.path}\"")
+    if not run.total:
+        if not deferred.count:
+            print("No files to process")
+        return
     action = "imported" if do_import_only else "processed"
-    print(f"\n{successful}/{len(valid_entries)} file(s) {action} successfully")
+    print(f"\n{run.successful}/{run.total} file(s) {action} successfully")
+    if run.reused:
+        print(f"{run.reused} file(s) matched audio captioned before and reused its subtitles")
+    if run.patched:
+        print(f"{run.patched} file(s) were only re-captioned where they changed")
+    if run.empty:
+        print(f"{run.empty} file(s) had no audio to caption and were skipped")
+    if run.hung:
+        print(f"{run.hung} file(s) abandoned after {resolve_calls.total_hangs()} hung Resolve call(s)")
+    if SCRATCH_SPACE and (SCRATCH_SPACE.in_ram or SCRATCH_SPACE.on_disk):
+        print(f"{SCRATCH_SPACE.in_ram} intermediate(s) written to RAM (peak {SCRATCH_SPACE.peak / 1e6:.0f} MB), "
+              f"{SCRATCH_SPACE.on_disk} to disk; all deleted once their file was done")
+    for host, count in run.per_host.items():
+        print(f"  {host}: {count} file(s) done")
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
@@ -27,7 +27,12 @@ def get_system_python():
 SYSTEM_PYTHON = get_system_python()
 
 def create_complete_audioop():
-    """Create a complete audioop module for Python 3.13."""
+    """Install a working audioop module for Python 3.13.
+
+    Copies audioop_numpy.py (a NumPy implementation of the audioop functions
+    pydub uses, matching CPython's results) into site-packages as _audioop.py,
+    installing NumPy first if it's missing.
+    """
     # Find site-packages directory
     result = subprocess.run(
         [SYSTEM_PYTHON, "-c", "import site; print(site.getsitepackages()[0])"],
@@ -36,80 +41,23 @@ def create_complete_audioop():
         check=True
     )
     site_packages = result.stdout.strip()
-    
-    # Create the dummy _audioop.py in site-packages
-    audioop_path = os.path.join(site_packages, "_audioop.py")
-    
-    print(f"Creating audioop module at: {audioop_path}")
-    
-    # More complete implementation
-    with open(audioop_path, 'w') as f:
-        f.write("""
-# Dummy _audioop module for Python 3.13
-import array
-import struct
-
-def add(fragment1, fragment2, width):
-    return b'' * (len(fragment1) // width)
-
-def avg(fragment, width):
-    return 0
-
-def avgpp(fragment, width):
-    return 0
-
-def bias(fragment, width, bias):
-    return fragment
-
-def byteswap(fragment, width):
-    return fragment
-
-def cross(fragment1, fragment2, width):
-    return 0
-
-def findfactor(fragment1, fragment2, width):
-    return 1.0
-
-def findfit(fragment1, fragment2, width):
-    return (0, 1.0)
 
-def findmax(fragment, width):
-    return 0
-
-def getsample(fragment, width, index):
-    return 0
-
-def lin2lin(fragment, width1, width2):
-    return b'' * (len(fragment) // width1 * width2)
-
-def lin2ulaw(fragment, width):
-    return b'' * (len(fragment) // width)
-
-def minmax(fragment, width):
-    return (0, 0)
-
-def mul(fragment, width, factor):
-    return fragment
-
-def ratecv(fragment, width, nchannels, inrate, outrate, state, weightA=1, weightB=0):
-    return (fragment, (0,))
-
-def reverse(fragment, width):
-    return fragment
-
-def rms(fragment, width):
-    return 0
+    # The replacement needs NumPy in the same interpreter
+    numpy_check = subprocess.run([SYSTEM_PYTHON, "-c", "import numpy"], capture_output=True)
+    if numpy_check.returncode != 0:
+        print("Installing NumPy (needed by the audioop replacement)...")
+        try:
+            subprocess.run([SYSTEM_PYTHON, "-m", "pip", "install", "numpy"], check=True)
+        except subprocess.CalledProcessError as e:
+            print(f"Failed to install NumPy: {e}")
+            return False
 
-def tomono(fragment, width, lfactor, rfactor):
-    return b'' * (len(fragment) // width // 2 * width)
+    source_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "audioop_numpy.py")
+    audioop_path = os.path.join(site_packages, "_audioop.py")
 
-def tostereo(fragment, width, lfactor, rfactor):
-    return b'' * (len(fragment) // width * width * 2)
+    print(f"Creating audioop module at: {audioop_path}")
+    shutil.copyfile(source_path, audioop_path)
 
-def ulaw2lin(fragment, width):
-    return b'' * (len(fragment) * width)
-""")
-    
     # Create compatibility modules
     audioop_alt_path = os.path.join(site_packages, "audioop.py")
     pyaudioop_path = os.path.join(site_packages, "pyaudioop.py")
@@ -133,7 +81,10 @@ def ulaw2lin(fragment, width):
     try:
         subprocess.run(
             [SYSTEM_PYTHON, "-c", 
-             "from pydub import AudioSegment; print('SUCCESS: PyDub successfully imported!'); AudioSegment.silent(duration=1000); print('SUCCESS: AudioSegment can be created!')"],
+             "from pydub import AudioSegment; print('SUCCESS: PyDub successfully imported!'); AudioSegment.silent(duration=1000); print('SUCCESS: AudioSegment can be created!'); "
+             "tone = AudioSegment(b'\\x00\\x40' * 800, sample_width=2, frame_rate=8000, channels=1); "
+             "assert tone.rms == 16384 and len(tone.set_frame_rate(16000)) == 100, 'audioop results are wrong'; "
+             "print('SUCCESS: audioop gives real results!')"],
             check=True
         )
         print("\n✅ PyDub fixed successfully!")
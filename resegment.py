@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+"""
+Offline re-segmentation of captions that were already generated.
+
+Re-wraps, merges and splits existing cues to a new line length, line count
+and gap without going back to Resolve: the same knobs as
+SUBTITLE_CHARS_PER_LINE, SUBTITLE_LINE_BREAK and SUBTITLE_GAP in
+create_subtitles_from_audio(). Each word gets a share of its original cue's
+time in proportion to its length, and new cues take their timing from the
+words they contain.
+
+Usage:
+    python resegment.py <files...> [--chars N] [--lines 1|2] [--gap FRAMES] [--fps RATE]
+                        [--max-pause-ms MS] [--formats srt,vtt] [--suffix S | --in-place]
+
+Inputs can be SRT, WebVTT or JSON files written by generate_srt.py; glob
+patterns are expanded. Outputs are written atomically next to each input.
+"""
+
+import os
+import sys
+import argparse
+from collections import namedtuple
+
+from subtitles import Cue, SUBTITLE_FORMATS, RESOLVE_LINE_SEPARATOR, read_cues, split_lines, write_subtitles
+from timecode import frames_to_ms
+from discovery import iter_inputs
+
+# A single word with the slice of time it was given inside its original cue.
+TimedWord = namedtuple("TimedWord", "text start_ms end_ms")
+
+# Defaults match create_subtitles_from_audio()
+DEFAULT_CHARS_PER_LINE = 42
+DEFAULT_LINES_PER_CUE = 2
+DEFAULT_GAP_FRAMES = 0
+DEFAULT_MAX_PAUSE_MS = 700
+
+# What read_cues() understands, and so what a directory argument expands to.
+READABLE_EXTENSIONS = {".srt", ".vtt", ".json"}
+
+
+def cue_words(cue):
+    """Split a cue into TimedWords, sharing its duration in proportion to characters.
+
+    Each word is weighted by its length plus one for the following space, so
+    longer words get longer slices. Integer arithmetic keeps the slices
+    contiguous: each word ends exactly where the next one starts.
+    """
+    words = " ".join(split_lines(cue.text)).split()
+    if not words:
+        return []
+    weights = [len(word) + 1 for word in words]
+    total = sum(weights)
+    duration = cue.end_ms - cue.start_ms
+    timed = []
+    done = 0
+    for word, weight in zip(words, weights):
+        start = cue.start_ms + duration * done // total
+        done += weight
+        end = cue.start_ms + duration * done // total
+        timed.append(TimedWord(word, start, end))
+    return timed
+
+
+def wrap_words(words, chars_per_line):
+    """Greedily fill lines of at most chars_per_line characters.
+
+    Returns a list of lines, each a list of words. A word longer than a
+    whole line gets a line of its own rather than being broken.
+    """
+    lines = []
+    current = []
+    length = 0
+    for word in words:
+        added = len(word.text) if not current else length + 1 + len(word.text)
+        if current and added > chars_per_line:
+            lines.append(current)
+            current = [word]
+            length = len(word.text)
+        else:
+            current.append(word)
+            length = added
+    if current:
+        lines.append(current)
+    return lines
+
+
+def resegment(cues, chars_per_line=DEFAULT_CHARS_PER_LINE, lines_per_cue=DEFAULT_LINES_PER_CUE,
+              gap_ms=0, max_pause_ms=DEFAULT_MAX_PAUSE_MS):
+    """Re-wrap cues to new line length/count targets and return new Cues.
+
+    Words flow freely across the old cue boundaries, except where the old
+    cues were separated by a pause longer than max_pause_ms: a new cue
+    always starts there, so captions don't hang over silence. gap_ms is the
+    minimum gap left between consecutive cues; it is taken from the end of
+    the earlier cue.
+    """
+    if chars_per_line < 1 or lines_per_cue < 1:
+        raise ValueError("chars_per_line and lines_per_cue must be positive")
+
+    # Split the timeline into runs of speech separated by long pauses
+    runs = []
+    previous_end = None
+    for cue in sorted(cues, key=lambda c: c.start_ms):
+        words = cue_words(cue)
+        if not words:
+            continue
+        if previous_end is None or cue.start_ms - previous_end > max_pause_ms:
+            runs.append([])
+        runs[-1].extend(words)
+        previous_end = cue.end_ms
+
+    new_cues = []
+    for run in runs:
+        lines = wrap_words(run, chars_per_line)
+        for i in range(0, len(lines), lines_per_cue):
+            group = lines[i:i + lines_per_cue]
+            text = RESOLVE_LINE_SEPARATOR.join(" ".join(word.text for word in line) for line in group)
+            new_cues.append(Cue(group[0][0].start_ms, group[-1][-1].end_ms, text))
+
+    if gap_ms > 0:
+        for i in range(len(new_cues) - 1):
+            cue, following = new_cues[i], new_cues[i + 1]
+            latest_end = following.start_ms - gap_ms
+            if cue.end_ms > latest_end:
+                new_cues[i] = cue._replace(end_ms=max(cue.start_ms + 1, latest_end))
+    return new_cues
+
+
+def output_path(input_path, fmt, suffix):
+    """Return the path for one output format next to input_path."""
+    extension, _ = SUBTITLE_FORMATS[fmt]
+    return os.path.splitext(input_path)[0] + suffix + extension
+
+
+def expand_inputs(patterns, suffix=""):
+    """Expand glob patterns and directories, keeping plain paths as-is.
+
+    Files they match whose name already ends with suffix are earlier outputs
+    and are left out, so running the same pattern again doesn't re-segment
+    them into ".reseg.reseg" files.
+    """
+    inputs = []
+    for pattern in patterns:
+        for path in iter_inputs(pattern, READABLE_EXTENSIONS):
+            if suffix and path != pattern and os.path.splitext(path)[0].endswith(suffix):
+                continue
+            inputs.append(path)
+    return inputs
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("inputs", nargs="+", help="subtitle files (.srt, .vtt, .json), glob patterns or directories")
+    parser.add_argument("--chars", type=int, default=DEFAULT_CHARS_PER_LINE, help="characters per line")
+    parser.add_argument("--lines", type=int, default=DEFAULT_LINES_PER_CUE, help="lines per subtitle")
+    parser.add_argument("--gap", type=int, default=DEFAULT_GAP_FRAMES, help="gap between subtitles, in frames")
+    parser.add_argument("--fps", default="24", help="frame rate used to convert --gap (default 24)")
+    parser.add_argument("--max-pause-ms", type=int, default=DEFAULT_MAX_PAUSE_MS,
+                        help="never merge across pauses longer than this")
+    parser.add_argument("--formats", default=None,
+                        help="comma-separated output formats (default: same as each input)")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("--suffix", default=None, help="added to output file names (default: .reseg)")
+    output.add_argument("--in-place", action="store_true", help="overwrite the inputs")
+    args = parser.parse_args()
+
+    formats = None
+    if args.formats:
+        formats = [f.strip().lower() for f in args.formats.split(",") if f.strip()]
+        unknown = [f for f in formats if f not in SUBTITLE_FORMATS]
+        if unknown:
+            parser.error(f"unknown format(s): {', '.join(unknown)}")
+    if args.chars < 1:
+        parser.error("--chars must be at least 1")
+    if args.lines < 1:
+        parser.error("--lines must be at least 1")
+    if args.gap < 0:
+        parser.error("--gap can't be negative")
+    if args.max_pause_ms < 0:
+        parser.error("--max-pause-ms can't be negative")
+    suffix = "" if args.in_place else (args.suffix if args.suffix is not None else ".reseg")
+    try:
+        gap_ms = frames_to_ms(args.gap, args.fps)
+    except (ValueError, ZeroDivisionError, IndexError):
+        parser.error(f"--fps needs a positive frame rate such as 24, 23.976 or 30000/1001, not '{args.fps}'")
+
+    inputs = expand_inputs(args.inputs, suffix)
+    if not inputs:
+        print("No files to process")
+        return 1
+
+    failed = 0
+    for path in inputs:
+        try:
+            cues = read_cues(path)
+            new_cues = resegment(cues, args.chars, args.lines, gap_ms, args.max_pause_ms)
+            input_format = os.path.splitext(path)[1].lower().lstrip(".")
+            for fmt in formats or [input_format if input_format in SUBTITLE_FORMATS else "srt"]:
+                write_subtitles(output_path(path, fmt, suffix), new_cues, fmt)
+            print(f"{path}: {len(cues)} -> {len(new_cues)} subtitles")
+        except Exception as e:
+            print(f"Error re-segmenting {path}: {str(e)}")
+            failed += 1
+
+    print(f"\n{len(inputs) - failed}/{len(inputs)} file(s) re-segmented successfully")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
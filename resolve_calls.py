@@ -0,0 +1,195 @@
+"""
+Deadlines for DaVinci Resolve scripting calls.
+
+Every call into Resolve runs on one worker thread, and the caller waits at
+most that method's deadline for it (CALL_TIMEOUTS, else
+DEFAULT_CALL_TIMEOUT). A call that overruns raises ResolveCallTimeout and
+counts as a hang. Python can't interrupt a thread stuck inside Resolve's
+RPC library, so the wedged worker is abandoned (it's a daemon thread and
+won't block exit) and later calls go to a fresh one. The rest of the job
+that hung fails fast instead of waiting out more deadlines, until
+start_job() is called for the next job, which reconnects via get_resolve().
+
+guard() wraps the object returned by scriptapp() so that this applies to
+every method of every object reached from it, without changing how the
+calling code is written.
+
+The worker, the abandoned flag and the Resolve host to connect to are kept
+per thread, so several pipelines (one per Resolve host, see worker_pool)
+can run side by side without one host's hang affecting the others.
+"""
+
+import queue
+import logging
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+
+# Seconds to wait for a call before treating Resolve as hung
+DEFAULT_CALL_TIMEOUT = 60.0
+CALL_TIMEOUTS = {
+    "scriptapp": 30.0,
+    "ImportMedia": 300.0,
+    "CreateTimelineFromClips": 120.0,
+    "SetCurrentTimeline": 60.0,
+    # Captioning is synchronous and scales with the audio length
+    "CreateSubtitlesFromAudio": 7200.0,
+    "ExportSubtitles": 300.0,
+}
+# Consecutive jobs that hung before the batch gives up on Resolve
+MAX_CONSECUTIVE_HANGS = 3
+
+PLAIN_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+class ResolveCallTimeout(Exception):
+    """A Resolve call overran its deadline, or the job it belongs to was abandoned."""
+
+
+class CallWorker:
+    """A daemon thread that runs queued calls one at a time."""
+
+    def __init__(self):
+        self.calls = queue.Queue()
+        self.thread = threading.Thread(target=self.run, name="resolve-calls", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            future, fn, args = self.calls.get()
+            if not future.set_running_or_notify_cancel():
+                continue
+            try:
+                future.set_result(fn(*args))
+            except BaseException as e:
+                future.set_exception(e)
+
+    def submit(self, fn, args):
+        future = Future()
+        self.calls.put((future, fn, args))
+        return future
+
+
+class ThreadState(threading.local):
+    worker = None
+    abandoned = False
+    hangs = 0
+    host = None
+
+
+state = ThreadState()
+hangs = []  # label of every call that hung, in any thread, in order
+
+
+def call(fn, *args, timeout=None, label=None):
+    """Run fn(*args) on this thread's Resolve worker, waiting at most timeout seconds.
+
+    Calls made from a worker thread itself (there are none in practice)
+    run directly. Raises ResolveCallTimeout if the deadline passes or the
+    current job has already been abandoned.
+    """
+    label = label or getattr(fn, "__name__", "call")
+    if state.abandoned:
+        raise ResolveCallTimeout(f"skipping {label}: this job was abandoned after a hung Resolve call")
+    if threading.current_thread().name == "resolve-calls":
+        return fn(*args)
+    if state.worker is None:
+        state.worker = CallWorker()
+    if timeout is None:
+        timeout = CALL_TIMEOUTS.get(label, DEFAULT_CALL_TIMEOUT)
+    future = state.worker.submit(fn, args)
+    try:
+        return future.result(timeout=timeout)
+    except FutureTimeout:
+        if not future.cancel():
+            # Still running: leave that thread to it and start over
+            state.worker = None
+        hangs.append(label)
+        state.hangs += 1
+        state.abandoned = True
+        logging.error(f"Resolve call {label} hung for {timeout:g}s; abandoning this job")
+        raise ResolveCallTimeout(f"{label} didn't return within {timeout:g} seconds")
+
+
+def start_job():
+    """Allow calls again after a job was abandoned; the next get_resolve() reconnects."""
+    state.abandoned = False
+
+
+def hang_count():
+    """Hangs seen by this thread's calls."""
+    return state.hangs
+
+
+def total_hangs():
+    """Hangs seen by every thread."""
+    return len(hangs)
+
+
+def set_host(host):
+    """Make get_resolve() in this thread connect to host (None for the local Resolve)."""
+    state.host = host
+
+
+def current_host():
+    return state.host
+
+
+class Guarded:
+    """Proxy for a Resolve object whose method calls go through call().
+
+    Objects returned by those calls (alone or inside lists, tuples and
+    dicts) are wrapped as well, and arguments are unwrapped before they
+    reach Resolve, so proxies can be passed back in as usual.
+    """
+
+    __slots__ = ("_target",)
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    def __getattr__(self, name):
+        attr = getattr(self._target, name)
+        if not callable(attr):
+            return wrap(attr)
+
+        def method(*args):
+            return wrap(call(attr, *unwrap(args), label=name))
+        method.__name__ = name
+        return method
+
+    def __eq__(self, other):
+        return self._target == unwrap(other)
+
+    def __hash__(self):
+        return hash(self._target)
+
+    def __bool__(self):
+        return bool(self._target)
+
+    def __repr__(self):
+        return f"Guarded({self._target!r})"
+
+
+def wrap(value):
+    if isinstance(value, PLAIN_TYPES) or isinstance(value, Guarded):
+        return value
+    if isinstance(value, (list, tuple)):
+        return type(value)(wrap(item) for item in value)
+    if isinstance(value, dict):
+        return {key: wrap(item) for key, item in value.items()}
+    return Guarded(value)
+
+
+def unwrap(value):
+    if isinstance(value, Guarded):
+        return value._target
+    if isinstance(value, (list, tuple)):
+        return type(value)(unwrap(item) for item in value)
+    if isinstance(value, dict):
+        return {key: unwrap(item) for key, item in value.items()}
+    return value
+
+
+def guard(obj):
+    """Return obj (a Resolve scripting object) with deadlines on every call; None stays None."""
+    return None if obj is None else wrap(obj)
@@ -0,0 +1,262 @@
+"""
+Job ordering and run-time estimates for batch captioning.
+
+Batches are ordered highest priority first and, within a priority, shortest
+media first, so a long recording near the front of a batch doesn't hold up
+the short clips behind it. Ordering only looks SCHEDULE_WINDOW batches
+ahead, so huge manifests and directory trees still stream. Durations come
+from ffprobe; without it, batches are ordered by file size instead.
+
+TimingModel predicts how long a batch will take from its media duration,
+learned from the jobs this machine has finished before. ThroughputModel
+keeps one per source format alongside conversion speed, and is what gets
+saved in preferences.json between runs.
+"""
+
+import os
+import re
+import time
+import heapq
+import itertools
+import shutil
+import datetime
+import subprocess
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+# How many batches ahead the scheduler reads and probes to pick the shortest
+SCHEDULE_WINDOW = 500
+# ffprobe processes run at once while filling the window
+PROBE_WORKERS = 8
+# Finished jobs remembered for fitting the timing model
+TIMING_SAMPLES = 50
+# Estimates used until there's history: fixed cost per job (import, timeline
+# setup, waiting for captions) plus seconds of work per second of media
+DEFAULT_OVERHEAD_SECONDS = 30.0
+DEFAULT_REALTIME_FACTOR = 0.25
+# A format gets its own timing model once it has this many finished jobs
+MIN_FORMAT_SAMPLES = 5
+# ffmpeg conversion speed assumed until one has been timed, in MB of source per second
+DEFAULT_CONVERSION_MB_PER_SECOND = 20.0
+
+
+def probe_duration(path):
+    """Return the media duration of path in seconds via ffprobe, or None."""
+    if not shutil.which("ffprobe"):
+        return None
+    cmd = ["ffprobe", "-v", "error", "-show_entries", "format=duration",
+           "-of", "default=noprint_wrappers=1:nokey=1", path]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=60)
+        return float(result.stdout.strip())
+    except (OSError, ValueError, subprocess.TimeoutExpired):
+        return None
+
+
+def file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def batch_duration(batch, durations):
+    """Total duration of a batch's sources, or None if any is unknown."""
+    total = 0.0
+    for job in batch:
+        if durations.get(job.source) is None:
+            return None
+        total += durations[job.source]
+    return total
+
+
+def schedule(batches, window=SCHEDULE_WINDOW):
+    """Yield (batch, duration_seconds_or_None) in run order.
+
+    Batches are lists of jobs with optional priority (higher runs first).
+    Within a priority, batches with a known duration run shortest first,
+    then the rest smallest file first. window=1 keeps the input order but
+    still probes durations.
+
+    Only the first PROBE_WORKERS batches are probed before the first one is
+    yielded, so the first caption doesn't wait on a large window. The window
+    then grows to its full size while jobs run: more batches are read each
+    time one is taken and probed in the background, joining the choice as
+    their durations come in.
+    """
+    pending = []
+    probing = deque()  # (batch, [duration futures]) in input order
+    counter = 0
+    batches = iter(batches)
+
+    def push(batch, durations):
+        nonlocal counter
+        duration = batch_duration(batch, durations)
+        priority = max(job.priority or 0 for job in batch)
+        if duration is not None:
+            key = (-priority, 0, duration)
+        else:
+            key = (-priority, 1, sum(file_size(job.source) for job in batch))
+        # counter keeps equal keys in input order and batches uncompared
+        heapq.heappush(pending, (key, counter, batch, duration))
+        counter += 1
+
+    def read(count):
+        for batch in itertools.islice(batches, max(0, count)):
+            probing.append((batch, [probes.submit(probe_duration, job.source) for job in batch]))
+
+    def collect(wait=0):
+        # Probed batches join the heap in input order: the first wait of them
+        # once their probes finish, the rest only if theirs already have
+        while probing and (wait > 0 or all(future.done() for future in probing[0][1])):
+            batch, futures = probing.popleft()
+            push(batch, {job.source: future.result() for job, future in zip(batch, futures)})
+            wait -= 1
+
+    with ThreadPoolExecutor(max_workers=PROBE_WORKERS) as probes:
+        read(min(window, PROBE_WORKERS))
+        collect(wait=len(probing))
+        while pending:
+            _, _, batch, duration = heapq.heappop(pending)
+            yield batch, duration
+            # Top the window back up, growing it by up to PROBE_WORKERS batches per job
+            read(min(PROBE_WORKERS, window - len(pending) - len(probing)))
+            collect(wait=0 if pending else 1)
+
+
+def parse_deadline(value, now=None):
+    """Return the deadline given by value as a time.time() timestamp.
+
+    Accepts a time of day ("18:30", tomorrow if it has already passed) or a
+    length of time from now ("90m", "2h", "45s", "1h30m"). Raises ValueError
+    for anything else.
+    """
+    now = time.time() if now is None else now
+    value = value.strip().lower()
+    clock = re.fullmatch(r"(\d{1,2}):(\d{2})", value)
+    if clock:
+        hour, minute = int(clock.group(1)), int(clock.group(2))
+        if hour > 23 or minute > 59:
+            raise ValueError(f"not a time of day: {value}")
+        today = datetime.datetime.fromtimestamp(now)
+        target = today.replace(hour=hour, minute=minute, second=0, microsecond=0)
+        if target <= today:
+            target += datetime.timedelta(days=1)
+        return target.timestamp()
+    parts = re.findall(r"(\d+(?:\.\d+)?)([hms])", value)
+    if not parts or "".join(number + unit for number, unit in parts) != value:
+        raise ValueError(f"not a time or duration: {value}")
+    seconds = sum(float(number) * {"h": 3600, "m": 60, "s": 1}[unit] for number, unit in parts)
+    return now + seconds
+
+
+def misses_deadline(deadline, estimate, now=None):
+    """True if work expected to take estimate seconds, started now, would end after deadline.
+
+    Work of unknown length (estimate None) is started; no deadline means never.
+    """
+    if not deadline:
+        return False
+    now = time.time() if now is None else now
+    return now + (estimate or 0) > deadline
+
+
+class TimingModel:
+    """Predicts wall-clock seconds to caption a batch from its media duration.
+
+    The estimate is overhead + factor * duration, fitted by least squares to
+    the last TIMING_SAMPLES finished jobs, given as (media_seconds,
+    wall_seconds) pairs. With too little history to fit a line, the
+    defaults are used and nudged toward what has been seen.
+    """
+
+    def __init__(self, samples=()):
+        self.samples = [tuple(sample) for sample in samples][-TIMING_SAMPLES:]
+        self.fit()
+
+    def fit(self):
+        self.overhead = DEFAULT_OVERHEAD_SECONDS
+        self.factor = DEFAULT_REALTIME_FACTOR
+        if not self.samples:
+            return
+        count = len(self.samples)
+        mean_duration = sum(d for d, _ in self.samples) / count
+        mean_wall = sum(w for _, w in self.samples) / count
+        spread = sum((d - mean_duration) ** 2 for d, _ in self.samples)
+        if spread <= 1e-9 or count < 3:
+            # Too few or all the same length: keep the default overhead, fit the rate
+            self.overhead = min(DEFAULT_OVERHEAD_SECONDS, mean_wall)
+            if mean_duration > 0:
+                self.factor = (mean_wall - self.overhead) / mean_duration
+            return
+        self.factor = sum((d - mean_duration) * (w - mean_wall) for d, w in self.samples) / spread
+        self.overhead = mean_wall - self.factor * mean_duration
+        if self.factor < 0:
+            self.factor, self.overhead = 0.0, mean_wall
+        elif self.overhead < 0:
+            self.overhead = 0.0
+            self.factor = sum(d * w for d, w in self.samples) / sum(d * d for d, _ in self.samples)
+
+    def estimate(self, duration):
+        """Predicted seconds for duration seconds of media (None if unknown)."""
+        if duration is None:
+            return None
+        return self.overhead + self.factor * duration
+
+    def record(self, duration, wall):
+        """Add a finished job and refit."""
+        self.samples.append((round(duration, 3), round(wall, 3)))
+        del self.samples[:-TIMING_SAMPLES]
+        self.fit()
+
+
+class ThroughputModel:
+    """How long each stage of a run takes on this machine, learned from past runs.
+
+    Captioning uses a TimingModel over every finished job, or the one for
+    the job's format once it has MIN_FORMAT_SAMPLES; its overhead is the
+    per-file cost. Conversion speed is the MB/s of the last TIMING_SAMPLES
+    conversions. Built from and saved to a preferences dict.
+    """
+
+    def __init__(self, prefs=None):
+        prefs = prefs or {}
+        self.caption = TimingModel(prefs.get("timing_samples", []))
+        self.by_format = {fmt: TimingModel(samples)
+                          for fmt, samples in prefs.get("timing_samples_by_format", {}).items()}
+        self.conversions = [tuple(sample) for sample in prefs.get("conversion_samples", [])][-TIMING_SAMPLES:]
+
+    def caption_model(self, fmt=None):
+        model = self.by_format.get(fmt)
+        return model if model and len(model.samples) >= MIN_FORMAT_SAMPLES else self.caption
+
+    def estimate(self, duration, fmt=None):
+        """Predicted captioning seconds for duration seconds of fmt media (None if unknown)."""
+        return self.caption_model(fmt).estimate(duration)
+
+    def conversion_rate(self):
+        """Conversion speed in bytes of source per second."""
+        seconds = sum(s for _, s in self.conversions)
+        if not self.conversions or seconds <= 0:
+            return DEFAULT_CONVERSION_MB_PER_SECOND * 1e6
+        return sum(size for size, _ in self.conversions) / seconds
+
+    def estimate_conversion(self, size):
+        """Predicted seconds to convert a size-byte file."""
+        return size / self.conversion_rate()
+
+    def record(self, duration, wall, fmt=None):
+        """Add a finished captioning job and refit."""
+        self.caption.record(duration, wall)
+        if fmt:
+            self.by_format.setdefault(fmt, TimingModel()).record(duration, wall)
+
+    def record_conversion(self, size, seconds):
+        self.conversions.append((int(size), round(seconds, 3)))
+        del self.conversions[:-TIMING_SAMPLES]
+
+    def save(self, prefs):
+        """Write the samples into a preferences dict."""
+        prefs["timing_samples"] = self.caption.samples
+        prefs["timing_samples_by_format"] = {fmt: model.samples for fmt, model in self.by_format.items()}
+        prefs["conversion_samples"] = self.conversions
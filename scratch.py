@@ -0,0 +1,240 @@
+"""
+RAM-backed scratch space for intermediate files (--ram-scratch).
+
+Converted media, --strip-silence proxies and --chunk-minutes / --delta
+clips are written once, read back by Resolve and then never needed again.
+ScratchSpace puts them on a RAM-backed folder (a tmpfs such as /dev/shm)
+instead of the conversion output directory, as long as the bytes in flight
+stay within the budget and the machine keeps RAM_HEADROOM_BYTES of memory
+available; otherwise they go to disk as before.
+
+Each job holds a Lease (see job()) that records where its intermediates
+went, and deletes them, RAM or disk, when the job has finished importing
+and exporting, returning their bytes to the budget. Leases are kept per
+thread, so the per-host pipelines of --hosts each have their own.
+"""
+
+import os
+import re
+import shutil
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+
+# RAM-backed folders to try, in order; a tmpfs temp folder is tried after these
+RAM_DIRS = ("/dev/shm", "/run/shm")
+# Memory to leave available to Resolve and everything else, on top of the files
+RAM_HEADROOM_BYTES = 2 << 30
+SIZE_UNITS = {"": 1, "k": 1 << 10, "m": 1 << 20, "g": 1 << 30, "t": 1 << 40}
+
+
+def parse_size(value):
+    """Return the byte count given by value ("512M", "4G", "1.5g", "800MB").
+
+    A bare number is megabytes. Raises ValueError for anything else.
+    """
+    match = re.fullmatch(r"(\d+(?:\.\d+)?)\s*([kmgt]?)(?:i?b)?", value.strip().lower())
+    if not match:
+        raise ValueError(f"not a size: {value}")
+    number, unit = match.groups()
+    size = int(float(number) * SIZE_UNITS[unit or "m"])
+    if size <= 0:
+        raise ValueError(f"not a size: {value}")
+    return size
+
+
+def tmpfs_mounts():
+    """Mount points of RAM-backed filesystems, from /proc/mounts (empty where there is none)."""
+    try:
+        with open("/proc/mounts", encoding="utf-8") as f:
+            return {fields[1] for fields in (line.split() for line in f)
+                    if len(fields) > 2 and fields[2] in ("tmpfs", "ramfs")}
+    except OSError:
+        return set()
+
+
+def find_ram_dir():
+    """Return a writable RAM-backed folder, or None if this machine has none."""
+    mounts = tmpfs_mounts()
+    candidates = [path for path in RAM_DIRS if path in mounts or (not mounts and os.path.isdir(path))]
+    temp = tempfile.gettempdir()
+    if temp in mounts:
+        candidates.append(temp)
+    for path in candidates:
+        if os.path.isdir(path) and os.access(path, os.W_OK):
+            return path
+    return None
+
+
+def available_memory():
+    """MemAvailable in bytes, or None where /proc/meminfo isn't there."""
+    try:
+        with open("/proc/meminfo", encoding="utf-8") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return None
+
+
+def path_size(path):
+    """Bytes used by a file, or by every file under a folder."""
+    if os.path.isdir(path):
+        return sum(os.path.getsize(os.path.join(folder, name))
+                   for folder, _, names in os.walk(path) for name in names)
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+def remove(path):
+    """Delete a file or folder, logging rather than raising if it can't be."""
+    try:
+        if os.path.isdir(path):
+            shutil.rmtree(path)
+        elif os.path.exists(path):
+            os.remove(path)
+    except OSError as e:
+        logging.warning(f"Couldn't delete intermediate {path}: {e}")
+
+
+class ScratchSpace:
+    """A budget of bytes for intermediates in a RAM-backed folder.
+
+    directory is this run's own folder inside the RAM-backed root, removed
+    by close(). in_ram, on_disk and peak (bytes of written files held at
+    once) count what the run did, for the summary.
+    """
+
+    def __init__(self, budget, root):
+        self.budget = budget
+        self.directory = tempfile.mkdtemp(prefix="resolve-subtitle-scratch-", dir=root)
+        self.lock = threading.Lock()
+        self.in_flight = 0
+        self.peak = 0
+        self.in_ram = 0
+        self.on_disk = 0
+
+    def claim(self, size):
+        """Reserve size bytes in RAM; False if that would go over the budget or leave too little memory."""
+        with self.lock:
+            if self.in_flight + size > self.budget:
+                return False
+            try:
+                if shutil.disk_usage(self.directory).free < size:
+                    return False
+            except OSError:
+                return False
+            available = available_memory()
+            if available is not None and available - size < RAM_HEADROOM_BYTES:
+                return False
+            self.in_flight += size
+            return True
+
+    def release(self, size):
+        with self.lock:
+            self.in_flight = max(0, self.in_flight - size)
+
+    def adjust(self, size):
+        """Correct the bytes in flight once a file's real size is known (size may be negative)."""
+        with self.lock:
+            self.in_flight = max(0, self.in_flight + size)
+            self.peak = max(self.peak, self.in_flight)
+
+    def count(self, in_ram):
+        with self.lock:
+            if in_ram:
+                self.in_ram += 1
+            else:
+                self.on_disk += 1
+
+    def close(self):
+        remove(self.directory)
+
+
+class Lease:
+    """One job's intermediates: where each went and how many RAM bytes it holds."""
+
+    def __init__(self, space, before_delete=None):
+        self.space = space
+        self.before_delete = before_delete
+        self.paths = []  # [path, bytes claimed in RAM or 0]
+        self.pending = []  # bytes claimed by directory() not yet tied to a path
+
+    def directory(self, size, fallback):
+        """Return the folder to write about size bytes to: RAM if the budget allows, else fallback."""
+        if self.space.claim(size):
+            self.pending.append(size)
+            return self.space.directory
+        logging.info(f"Scratch space is full; writing a {size / 1e6:.0f} MB intermediate to {fallback}")
+        return fallback
+
+    def track(self, path):
+        """Delete path with the rest of the job's intermediates, accounting for its real size."""
+        in_ram = os.path.dirname(os.path.abspath(path)) == self.space.directory
+        claimed = self.pending.pop() if in_ram and self.pending else 0
+        if in_ram:
+            actual = path_size(path)
+            self.space.adjust(actual - claimed)
+            claimed = actual
+        self.space.count(in_ram)
+        self.paths.append([path, claimed])
+
+    def release(self):
+        """Delete every tracked intermediate and hand back its bytes."""
+        for path, claimed in self.paths:
+            if self.before_delete:
+                self.before_delete(path)
+            remove(path)
+            self.space.release(claimed)
+        for claimed in self.pending:
+            # Claimed for a file that was never written
+            self.space.release(claimed)
+        self.paths = []
+        self.pending = []
+
+
+class ThreadState(threading.local):
+    lease = None
+
+
+state = ThreadState()
+
+
+@contextmanager
+def job(space, before_delete=None):
+    """Give the calling thread a Lease for one job; its intermediates are deleted on exit.
+
+    before_delete(path) is called for each one first. With space None this
+    does nothing and directory() always returns the fallback.
+    """
+    if space is None:
+        yield None
+        return
+    lease = state.lease = Lease(space, before_delete)
+    try:
+        yield lease
+    finally:
+        state.lease = None
+        lease.release()
+
+
+def active():
+    """True inside a job() with a ScratchSpace."""
+    return state.lease is not None
+
+
+def directory(size, fallback):
+    """Folder for an intermediate of about size bytes: RAM scratch within a job(), else fallback."""
+    if state.lease is None:
+        return fallback
+    return state.lease.directory(size, fallback)
+
+
+def track(path):
+    """Mark path (a file or folder) as an intermediate of the current job(); no-op outside one."""
+    if state.lease is not None:
+        state.lease.track(path)
@@ -0,0 +1,288 @@
+"""
+Subtitle file helpers that don't need DaVinci Resolve.
+"""
+
+import os
+import re
+import sys
+import json
+import secrets
+from html import unescape as html_unescape
+from collections import namedtuple
+from xml.sax.saxutils import escape as xml_escape
+
+from timecode import format_srt_timecode, format_vtt_timecode
+
+# "00:01:02,345 --> 00:01:04,000" (WebVTT-style "." separators are accepted too)
+SRT_TIMING_RE = re.compile(
+    r"(\d+):(\d{2}):(\d{2})[,.](\d{3})\s*-->\s*(\d+):(\d{2}):(\d{2})[,.](\d{3})"
+)
+FORMATTING_TAG_RE = re.compile(r"</?[a-zA-Z][^>]*>")
+
+
+def timecode_to_ms(hours, minutes, seconds, millis):
+    """Convert timecode fields (as strings or ints) to integer milliseconds."""
+    return ((int(hours) * 60 + int(minutes)) * 60 + int(seconds)) * 1000 + int(millis)
+
+
+def parse_srt(text, strip_tags=True):
+    """Parse SRT text into a list of (start_ms, end_ms, lines) tuples.
+
+    Cue numbers are ignored, so files with missing or out-of-order numbering
+    still parse. Formatting tags such as <b> are removed unless strip_tags
+    is False.
+    """
+    cues = []
+    for block in re.split(r"\r?\n\s*\r?\n", text.strip()):
+        lines = block.splitlines()
+        for i, line in enumerate(lines):
+            match = SRT_TIMING_RE.search(line)
+            if match:
+                break
+        else:
+            continue
+        fields = match.groups()
+        start_ms = timecode_to_ms(*fields[:4])
+        end_ms = timecode_to_ms(*fields[4:])
+        body = lines[i + 1:]
+        if strip_tags:
+            body = [FORMATTING_TAG_RE.sub("", line) for line in body]
+        cues.append((start_ms, end_ms, body))
+    return cues
+
+
+# Pass as the output path to stream subtitles to stdout instead of a file.
+STDOUT_PATH = "-"
+
+# Resolve separates caption lines with U+2028 (LINE SEPARATOR).
+RESOLVE_LINE_SEPARATOR = "\u2028"
+
+# Big enough that a typical SRT goes to disk in a single write call.
+WRITE_BUFFER_SIZE = 1 << 20
+
+# Permissions asked for when creating a file; the OS takes the umask off.
+NEW_FILE_MODE = 0o666
+
+
+# One caption: start/end in milliseconds, text with U+2028 between lines.
+Cue = namedtuple("Cue", "start_ms end_ms text")
+
+
+def split_lines(text):
+    """Split caption text on Resolve's line separator (and plain newlines)."""
+    return text.replace("\r\n", "\n").replace(RESOLVE_LINE_SEPARATOR, "\n").split("\n")
+
+
+def format_cue_text(text, bold=True, escape=False):
+    """Format caption text for output: one output line per caption line, wrapped in <b>.
+
+    escape=True turns &, < and > into entities, as WebVTT requires.
+    """
+    lines = split_lines(text)
+    if escape:
+        lines = [xml_escape(line) for line in lines]
+    body = "\n".join(lines)
+    return f"<b>{body}</b>" if bold else body
+
+
+def srt_blocks(cues, bold=True):
+    """Yield one SRT block per cue, numbered from 1."""
+    for number, (start_ms, end_ms, text) in enumerate(cues, 1):
+        yield (f"{number}\n{format_srt_timecode(start_ms)} --> {format_srt_timecode(end_ms)}\n"
+               f"{format_cue_text(text, bold)}\n\n")
+
+
+def vtt_blocks(cues, bold=True):
+    """Yield a WebVTT header and one block per cue."""
+    yield "WEBVTT\n\n"
+    for number, (start_ms, end_ms, text) in enumerate(cues, 1):
+        yield (f"{number}\n{format_vtt_timecode(start_ms)} --> {format_vtt_timecode(end_ms)}\n"
+               f"{format_cue_text(text, bold, escape=True)}\n\n")
+
+
+def format_ass_time(ms):
+    """Format milliseconds as ASS H:MM:SS.cc, rounded to the nearest centisecond."""
+    cs = (int(ms) + 5) // 10
+    return f"{cs // 360000}:{cs // 6000 % 60:02d}:{cs // 100 % 60:02d}.{cs % 100:02d}"
+
+
+ASS_HEADER = """[Script Info]
+ScriptType: v4.00+
+PlayResX: 1920
+PlayResY: 1080
+WrapStyle: 2
+
+[V4+ Styles]
+Format: Name, Fontname, Fontsize, PrimaryColour, SecondaryColour, OutlineColour, BackColour, Bold, Italic, Underline, StrikeOut, ScaleX, ScaleY, Spacing, Angle, BorderStyle, Outline, Shadow, Alignment, MarginL, MarginR, MarginV, Encoding
+Style: Default,Arial,54,&H00FFFFFF,&H000000FF,&H00000000,&H80000000,0,0,0,0,100,100,0,0,1,2,1,2,60,60,50,1
+
+[Events]
+Format: Layer, Start, End, Style, Name, MarginL, MarginR, MarginV, Effect, Text
+"""
+
+
+def ass_blocks(cues, bold=True):
+    """Yield an ASS script header and one Dialogue line per cue."""
+    yield ASS_HEADER
+    for start_ms, end_ms, text in cues:
+        body = "\\N".join(line.replace("{", "(").replace("}", ")") for line in split_lines(text))
+        if bold:
+            body = "{\\b1}" + body + "{\\b0}"
+        yield f"Dialogue: 0,{format_ass_time(start_ms)},{format_ass_time(end_ms)},Default,,0,0,0,,{body}\n"
+
+
+def json_blocks(cues, bold=True):
+    """Yield a JSON array with one object per cue (plain text, for indexing)."""
+    yield "[\n"
+    for number, (start_ms, end_ms, text) in enumerate(cues, 1):
+        lines = split_lines(text)
+        entry = {
+            "index": number,
+            "start_ms": int(start_ms),
+            "end_ms": int(end_ms),
+            "start": format_srt_timecode(start_ms),
+            "end": format_srt_timecode(end_ms),
+            "text": " ".join(lines),
+            "lines": lines,
+        }
+        yield ("  " if number == 1 else ",\n  ") + json.dumps(entry, ensure_ascii=False)
+    yield "\n]\n"
+
+
+def ttml_blocks(cues, bold=True):
+    """Yield a TTML document with one <p> per cue."""
+    yield ('<?xml version="1.0" encoding="utf-8"?>\n'
+           '<tt xmlns="http://www.w3.org/ns/ttml" xmlns:tts="http://www.w3.org/ns/ttml#styling" xml:lang="">\n'
+           '  <body>\n    <div>\n')
+    for start_ms, end_ms, text in cues:
+        body = "<br/>".join(xml_escape(line) for line in split_lines(text))
+        if bold:
+            body = f'<span tts:fontWeight="bold">{body}</span>'
+        yield (f'      <p begin="{format_vtt_timecode(start_ms)}" end="{format_vtt_timecode(end_ms)}">'
+               f'{body}</p>\n')
+    yield "    </div>\n  </body>\n</tt>\n"
+
+
+# Output formats for --formats: name -> (file extension, block generator).
+# To add a format, write a generator taking (cues, bold) and register it here.
+SUBTITLE_FORMATS = {
+    "srt": (".srt", srt_blocks),
+    "vtt": (".vtt", vtt_blocks),
+    "ass": (".ass", ass_blocks),
+    "json": (".json", json_blocks),
+    "ttml": (".ttml", ttml_blocks),
+}
+
+
+def create_temp(directory, prefix, suffix):
+    """Create a new, uniquely named file like tempfile.mkstemp; returns (fd, path).
+
+    Unlike mkstemp's 0600, the file gets the permissions any new file would
+    (NEW_FILE_MODE less the umask), so renaming it into place keeps them.
+    """
+    while True:
+        path = os.path.join(directory, f"{prefix}{secrets.token_hex(4)}{suffix}")
+        try:
+            return os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0),
+                           NEW_FILE_MODE), path
+        except FileExistsError:
+            continue
+
+
+def write_atomic(path, chunks, encoding="utf-8"):
+    """Write an iterable of strings to path so readers never see a partial file.
+
+    Chunks stream through a large write buffer into a temp file in the same
+    directory, which is fsynced and then renamed over path. If anything
+    fails the temp file is removed and the previous file (if any) is left
+    untouched. Passing STDOUT_PATH streams to stdout instead.
+    Returns the number of characters written.
+    """
+    if path == STDOUT_PATH:
+        stream = sys.__stdout__
+        written = 0
+        for chunk in chunks:
+            stream.write(chunk)
+            written += len(chunk)
+        stream.flush()
+        return written
+
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = create_temp(directory, f".{os.path.basename(path)}.", ".tmp")
+    try:
+        written = 0
+        with os.fdopen(fd, "w", encoding=encoding, buffering=WRITE_BUFFER_SIZE) as f:
+            for chunk in chunks:
+                f.write(chunk)
+                written += len(chunk)
+            f.flush()
+            os.fsync(f.fileno())
+        if os.path.exists(path):
+            # Replacing a file keeps its permissions
+            os.chmod(tmp_path, os.stat(path).st_mode & 0o777)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_path)
+        except OSError:
+            pass
+        raise
+    return written
+
+
+def write_subtitles(path, cues, fmt="srt", bold=True):
+    """Write cues in one of SUBTITLE_FORMATS, atomically or to stdout."""
+    _, blocks = SUBTITLE_FORMATS[fmt]
+    return write_atomic(path, blocks(cues, bold))
+
+
+def write_srt(path, cues, bold=True):
+    """Write cues as SRT, atomically or to stdout."""
+    return write_subtitles(path, cues, "srt", bold)
+
+
+def read_cues(path):
+    """Read a subtitle file written by this tool back into a list of Cues.
+
+    Supports SRT and WebVTT (formatting tags stripped, and WebVTT entities
+    decoded) and the JSON format. Caption lines are re-joined with U+2028 so the cues
+    behave exactly like ones extracted from Resolve.
+    """
+    with open(path, "r", encoding="utf-8-sig") as f:
+        content = f.read()
+    if path.lower().endswith(".json"):
+        return [Cue(int(entry["start_ms"]), int(entry["end_ms"]),
+                    RESOLVE_LINE_SEPARATOR.join(entry.get("lines") or [entry["text"]]))
+                for entry in json.loads(content)]
+    is_vtt = path.lower().endswith(".vtt")
+    return [Cue(start_ms, end_ms, RESOLVE_LINE_SEPARATOR.join(html_unescape(line) if is_vtt else line
+                                                              for line in lines))
+            for start_ms, end_ms, lines in parse_srt(content)]
+
+
+def stitch_cues(parts):
+    """Join cues captioned separately for consecutive chunks of one recording.
+
+    parts is a list of (offset_ms, keep_from_ms, keep_to_ms, cues) in order,
+    where cues are relative to the chunk start at offset_ms. Each chunk
+    contributes the cues that start inside its keep span, so speech in the
+    overlap between chunks is taken from one side only. A cue that repeats
+    the previous one's text or falls entirely inside it is dropped as a
+    duplicate from the seam, and overlapping ends are trimmed back.
+    """
+    stitched = []
+    for offset_ms, keep_from_ms, keep_to_ms, cues in parts:
+        for start_ms, end_ms, text in cues:
+            start_ms += offset_ms
+            end_ms += offset_ms
+            if not keep_from_ms <= start_ms < keep_to_ms:
+                continue
+            if stitched:
+                previous = stitched[-1]
+                same_text = " ".join(split_lines(previous.text)).split() == " ".join(split_lines(text)).split()
+                if start_ms < previous.end_ms and (same_text or end_ms <= previous.end_ms):
+                    continue
+                if previous.end_ms > start_ms:
+                    stitched[-1] = previous._replace(end_ms=max(previous.start_ms + 1, start_ms))
+            stitched.append(Cue(start_ms, end_ms, text))
+    return stitched
@@ -0,0 +1,98 @@
+"""
+Exact frame <-> millisecond conversion for subtitle timecodes.
+
+Frame rates are handled as exact rationals, so NTSC rates such as 23.976
+are really 24000/1001 and never accumulate float error. Times are rounded
+to the nearest millisecond (halves round up). Whole arrays of frames can be
+converted in one pass; NumPy is used for that when it is installed.
+"""
+
+from fractions import Fraction
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; the pure-Python path gives identical results
+    np = None
+
+# Nominal integer rates whose broadcast versions run 1000/1001 slower.
+NTSC_BASE_RATES = (24, 30, 48, 60, 120)
+
+
+def parse_framerate(fps):
+    """Return fps as an exact Fraction.
+
+    Accepts numbers or Resolve's setting strings ("24", "23.976", "29.97 DF").
+    Rates within 0.01 of an NTSC rate (e.g. 23.976, 29.97, 59.94) map to
+    N*1000/1001.
+    """
+    if isinstance(fps, Fraction):
+        return fps
+    if isinstance(fps, str):
+        fps = fps.strip().split()[0]
+        value = Fraction(fps)
+    else:
+        value = Fraction(fps).limit_denominator(1000000)
+    if value <= 0:
+        raise ValueError(f"Frame rate must be positive: {fps}")
+    if value.denominator == 1:
+        return value
+    for base in NTSC_BASE_RATES:
+        ntsc = Fraction(base * 1000, 1001)
+        if abs(value - ntsc) < Fraction(1, 100):
+            return ntsc
+    return value
+
+
+def frames_to_ms(frames, fps):
+    """Convert a frame count to integer milliseconds, rounding to nearest."""
+    rate = parse_framerate(fps)
+    return (2000 * frames * rate.denominator + rate.numerator) // (2 * rate.numerator)
+
+
+def ms_to_frames(ms, fps):
+    """Convert integer milliseconds to the nearest frame count."""
+    rate = parse_framerate(fps)
+    return (2 * ms * rate.numerator + 1000 * rate.denominator) // (2000 * rate.denominator)
+
+
+def frames_to_ms_array(frames, fps):
+    """Convert a sequence of frame counts to milliseconds in one pass.
+
+    Returns a NumPy int64 array when NumPy is available, otherwise a list.
+    """
+    rate = parse_framerate(fps)
+    num, den = rate.numerator, rate.denominator
+    if np is not None:
+        values = np.asarray(frames, dtype=np.int64)
+        return (values * (2000 * den) + num) // (2 * num)
+    return [(2000 * f * den + num) // (2 * num) for f in frames]
+
+
+def format_srt_timecode(ms):
+    """Format integer milliseconds as HH:MM:SS,mmm."""
+    ms = int(ms)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d},{ms % 1000:03d}"
+
+
+def format_vtt_timecode(ms):
+    """Format integer milliseconds as HH:MM:SS.mmm."""
+    ms = int(ms)
+    return f"{ms // 3600000:02d}:{ms // 60000 % 60:02d}:{ms // 1000 % 60:02d}.{ms % 1000:03d}"
+
+
+def format_timecodes(ms_values, separator=","):
+    """Format many millisecond values at once.
+
+    The hour/minute/second split is done with array arithmetic when NumPy is
+    available, leaving a single %-format per value.
+    """
+    if np is not None:
+        values = np.asarray(ms_values, dtype=np.int64)
+        hours, rest = np.divmod(values, 3600000)
+        minutes, rest = np.divmod(rest, 60000)
+        seconds, millis = np.divmod(rest, 1000)
+        fields = zip(hours.tolist(), minutes.tolist(), seconds.tolist(), millis.tolist())
+    else:
+        fields = ((ms // 3600000, ms // 60000 % 60, ms // 1000 % 60, ms % 1000) for ms in map(int, ms_values))
+    pattern = f"%02d:%02d:%02d{separator}%03d"
+    return [pattern % f for f in fields]
@@ -0,0 +1,209 @@
+"""
+Watch a directory for new media files and hand each one over once it has
+finished being written.
+
+On Linux the directory tree is watched with inotify (through ctypes, no
+extra packages), so a new file is noticed as soon as it appears. Elsewhere,
+or when inotify isn't available, the tree is rescanned every few seconds.
+Either way a file is only yielded after its size and modification time have
+stayed the same for SETTLE_SECONDS, so half-copied uploads are never picked
+up. Network shares often don't report writes made by other machines to
+inotify, so the tree is also rescanned every RESCAN_SECONDS as a backstop.
+"""
+
+import os
+import sys
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import logging
+
+from discovery import iter_directory
+
+# How long a file's size and mtime must stay unchanged before it's yielded
+SETTLE_SECONDS = 3.0
+# Rescan interval when polling instead of using inotify
+POLL_SECONDS = 2.0
+# Full rescan interval with inotify, for writes it doesn't see (network shares)
+RESCAN_SECONDS = 60.0
+
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_ISDIR = 0x40000000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+EVENT_HEADER = struct.Struct("iIII")
+
+
+class Inotify:
+    """A recursive inotify watch on one directory tree.
+
+    wait() returns the paths that changed since the last call, plus a flag
+    saying events were lost and the caller should rescan.
+    """
+
+    def __init__(self, directory):
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.dirs = {}
+        self.add_tree(directory)
+
+    def add_tree(self, directory):
+        """Watch directory and every non-hidden directory below it."""
+        pending = [directory]
+        while pending:
+            current = pending.pop()
+            wd = self.libc.inotify_add_watch(self.fd, os.fsencode(current), WATCH_MASK)
+            if wd < 0:
+                err = ctypes.get_errno()
+                if err == errno.ENOSPC:
+                    logging.warning("inotify watch limit reached; some folders will only be seen by rescans")
+                    return
+                continue
+            self.dirs[wd] = current
+            try:
+                with os.scandir(current) as entries:
+                    for entry in entries:
+                        if not entry.name.startswith(".") and entry.is_dir(follow_symlinks=False):
+                            pending.append(entry.path)
+            except OSError:
+                continue
+
+    def wait(self, timeout):
+        """Wait up to timeout seconds; return (changed_paths, overflowed)."""
+        changed, overflowed = [], False
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changed, overflowed
+        try:
+            data = os.read(self.fd, 1 << 16)
+        except BlockingIOError:
+            return changed, overflowed
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + name_len].rstrip(b"\0"))
+            offset += name_len
+            if mask & IN_Q_OVERFLOW:
+                overflowed = True
+                continue
+            directory = self.dirs.get(wd)
+            if directory is None or not name or name.startswith("."):
+                continue
+            path = os.path.join(directory, name)
+            if mask & IN_ISDIR:
+                if mask & (IN_CREATE | IN_MOVED_TO):
+                    # Files may land in a new folder before its watch exists
+                    self.add_tree(path)
+                    overflowed = True
+            else:
+                changed.append(path)
+        return changed, overflowed
+
+    def close(self):
+        os.close(self.fd)
+
+
+def open_inotify(directory):
+    """Return an Inotify watch on directory, or None to fall back to polling."""
+    if not sys.platform.startswith("linux"):
+        return None
+    try:
+        return Inotify(directory)
+    except (OSError, AttributeError) as e:
+        logging.info(f"inotify unavailable ({e}); polling {directory} instead")
+        return None
+
+
+def file_signature(path):
+    """Return (size, mtime_ns) for path, or None if it's gone."""
+    try:
+        info = os.stat(path)
+    except OSError:
+        return None
+    return info.st_size, info.st_mtime_ns
+
+
+def watch_directory(directory, extensions, wanted=None, settle=SETTLE_SECONDS,
+                    poll=POLL_SECONDS, rescan=RESCAN_SECONDS):
+    """Yield files under directory with an extension in extensions, forever.
+
+    Files already there when watching starts are yielded too. Each file is
+    yielded once it has been stable for settle seconds, and again if it is
+    later replaced or rewritten. wanted(path) can veto a file (for example
+    one that already has subtitles); it's asked each time the file settles.
+    Files that have gone are forgotten at the next rescan, so a busy drop
+    folder doesn't grow the bookkeeping without limit.
+    """
+    watcher = open_inotify(directory)
+    pending = {}  # path -> (signature, monotonic time it last changed)
+    finished = {}  # path -> signature when it was yielded or vetoed
+
+    def note(path):
+        if os.path.splitext(path)[1].lower() not in extensions:
+            return
+        signature = file_signature(path)
+        if signature is None or finished.get(path) == signature:
+            return
+        previous = pending.get(path)
+        if previous is None or previous[0] != signature:
+            pending[path] = (signature, time.monotonic())
+
+    try:
+        for path in iter_directory(directory, extensions):
+            note(path)
+        last_scan = time.monotonic()
+        while True:
+            now = time.monotonic()
+            for path, (signature, changed_at) in list(pending.items()):
+                current = file_signature(path)
+                if current is None:
+                    del pending[path]
+                elif current != signature:
+                    pending[path] = (current, now)
+                elif now - changed_at >= settle:
+                    if not current[0]:
+                        # Still empty: the upload may not have started yet
+                        pending[path] = (current, now)
+                        continue
+                    del pending[path]
+                    finished[path] = current
+                    if wanted is None or wanted(path):
+                        yield path
+
+            # Sleep until the next file could settle, or the next scan
+            now = time.monotonic()
+            timeout = rescan if watcher else poll
+            if pending:
+                soonest = min(changed_at for _, changed_at in pending.values())
+                timeout = min(timeout, max(0.05, soonest + settle - now))
+            if watcher:
+                changed, overflowed = watcher.wait(timeout)
+                for path in changed:
+                    note(path)
+                scan = overflowed or time.monotonic() - last_scan >= rescan
+            else:
+                time.sleep(timeout)
+                scan = time.monotonic() - last_scan >= poll
+            if scan:
+                seen = set()
+                for path in iter_directory(directory, extensions):
+                    seen.add(path)
+                    note(path)
+                for path in [path for path in finished if path not in seen]:
+                    del finished[path]
+                last_scan = time.monotonic()
+    finally:
+        if watcher:
+            watcher.close()
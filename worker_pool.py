@@ -0,0 +1,128 @@
+"""
+Share one stream of jobs between several Resolve hosts.
+
+run_pool() starts one thread per host. Each thread pulls the next job from
+the shared (lazy) job stream whenever it is free, so faster hosts simply
+take more jobs. A job that fails on one host is put back for a host that
+hasn't tried it yet, up to REQUEUE_ATTEMPTS times, and a host whose jobs
+keep hanging is retired while the others carry on.
+
+Nothing here knows about Resolve; generate_srt supplies the callbacks.
+"""
+
+import threading
+
+# How many extra hosts a failed job is offered to
+REQUEUE_ATTEMPTS = 2
+# Jobs in a row that may hang on one host before it stops taking work
+RETIRE_AFTER = 3
+
+
+class Entry:
+    """One job travelling through the pool, with the hosts that have tried it."""
+
+    def __init__(self, item):
+        self.item = item
+        self.tried = set()
+        self.outcome = None
+        self.final = False
+
+
+def run_pool(items, hosts, process, finish, retry=lambda outcome: False, hung=lambda outcome: False,
+             setup=None, attempts=REQUEUE_ATTEMPTS, retire_after=RETIRE_AFTER):
+    """Run process(host, item) for every item, spread over hosts.
+
+    setup(host)                 — called once in each host's thread first
+    process(host, item)         — runs one job and returns its outcome
+    retry(outcome)              — True to offer the job to another host
+    hung(outcome)               — True if the outcome counts towards retiring the host
+    finish(host, item, outcome) — called once per job with its final outcome
+                                  (from the pool's threads; host is None for a
+                                  job left over when every host was retired)
+
+    Returns the list of hosts that were retired. Items are only read from
+    the stream when a host is free to start them, so anything not yet read
+    when every host retires is never started.
+    """
+    items = iter(items)
+    cond = threading.Condition()
+    feed_lock = threading.Lock()
+    live = set(hosts)
+    retries = []
+    retired = []
+    running = {"in_flight": 0, "exhausted": False}
+
+    def take(host):
+        """Return the next Entry for host (final ones only need finishing), or None when done."""
+        while True:
+            with cond:
+                for entry in retries:
+                    untried = live - entry.tried
+                    if not untried or host in untried:
+                        retries.remove(entry)
+                        entry.final = not untried
+                        if not entry.final:
+                            running["in_flight"] += 1
+                        return entry
+                if running["exhausted"]:
+                    if not running["in_flight"] and not retries:
+                        return None
+                    cond.wait()
+                    continue
+            with feed_lock:
+                if running["exhausted"]:
+                    continue
+                try:
+                    item = next(items)
+                except StopIteration:
+                    with cond:
+                        running["exhausted"] = True
+                        cond.notify_all()
+                    continue
+                with cond:
+                    running["in_flight"] += 1
+                return Entry(item)
+
+    def work(host):
+        if setup:
+            setup(host)
+        in_a_row = 0
+        while True:
+            entry = take(host)
+            if entry is None:
+                return
+            if entry.final:
+                finish(host, entry.item, entry.outcome)
+                continue
+
+            outcome = process(host, entry.item)
+            in_a_row = in_a_row + 1 if hung(outcome) else 0
+            entry.tried.add(host)
+            entry.outcome = outcome
+            with cond:
+                running["in_flight"] -= 1
+                retiring = in_a_row >= retire_after
+                if retiring:
+                    live.discard(host)
+                    retired.append(host)
+                requeue = retry(outcome) and len(entry.tried) <= attempts and live - entry.tried
+                if requeue:
+                    retries.append(entry)
+                cond.notify_all()
+            if not requeue:
+                finish(host, entry.item, outcome)
+            if retiring:
+                return
+
+    threads = [threading.Thread(target=work, args=(host,), name=f"pool-{host}", daemon=True) for host in hosts]
+    for thread in threads:
+        thread.start()
+    # Join with a timeout so Ctrl+C still reaches the main thread
+    for thread in threads:
+        while thread.is_alive():
+            thread.join(0.5)
+
+    # Every host retired: jobs waiting for a retry end with their last outcome
+    for entry in retries:
+        finish(None, entry.item, entry.outcome)
+    return retired